@@ -0,0 +1,114 @@
+"""
+Description
+Measures the memory the CSE machine allocates for its values with tracemalloc. The value stack
+holds native Python values (see cse_machine/runtime.py), so an integer, truth value or string
+result is not wrapped in an element object.
+
+tracemalloc reports the memory that is live, so two measurements are made:
+    deep    - a non-tail recursion (Sum n) is stopped at its deepest call, where every pending
+              call keeps its environment, its marker and its operand on the stack; the blocks
+              and bytes live at that point are reported per step taken to get there.
+    workload - each .rpal workload is run to the end; the peak of the traced memory is
+              reported per step.
+
+Usage
+python benchmarks/allocations.py                    # Sum 20000 and every .rpal workload in this folder
+python benchmarks/allocations.py 50000 fact.rpal    # the given depth and workloads
+"""
+
+import glob
+import os
+import sys
+import tempfile
+import tracemalloc
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARK_DIR), "src"))
+
+from interpreter.interpreter import Evaluator
+from cse_machine.machine import CSEMachine
+
+
+class ProbeMachine(CSEMachine):
+    """
+    A CSE machine that takes a tracemalloc snapshot when the call depth first reaches probe_depth.
+    """
+
+    def __init__(self, probe_depth, **options):
+        super().__init__(**options)
+        self.probe_depth = probe_depth
+        self.probe = None
+        self.probe_steps = None
+
+    def _enter(self, k, env):
+        super()._enter(k, env)
+        if self.probe is None and self.call_depth >= self.probe_depth:
+            self.probe = tracemalloc.take_snapshot()
+            self.probe_steps = self.stats.steps()
+
+
+def deep_program(depth):
+    return f"let rec Sum n = n eq 0 -> 0 | n + Sum (n - 1) in Print (Sum {depth})\n"
+
+
+def measure_deep(file_name, depth):
+    """
+    Run Sum depth and measure the memory live at its deepest call.
+
+    Returns:
+        tuple: The steps taken to the deepest call, and the blocks and bytes live there.
+    """
+    evaluator = Evaluator()
+    evaluator.cse_machine = ProbeMachine(depth, collect_stats=True)
+    tracemalloc.start()
+    baseline = tracemalloc.take_snapshot()
+    evaluator.interpret(file_name)
+    tracemalloc.stop()
+    machine = evaluator.cse_machine
+    blocks = size = 0
+    for statistic in machine.probe.compare_to(baseline, "filename"):
+        blocks += statistic.count_diff
+        size += statistic.size_diff
+    return machine.probe_steps, blocks, size
+
+
+def measure_workload(file_name):
+    """
+    Run a workload and measure the peak of the traced memory.
+
+    Returns:
+        tuple: The steps of the run and the peak traced bytes.
+    """
+    evaluator = Evaluator()
+    evaluator.cse_machine = CSEMachine(collect_stats=True)
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    evaluator.interpret(file_name)
+    peak = tracemalloc.get_traced_memory()[1] - start
+    tracemalloc.stop()
+    return evaluator.cse_machine.stats.steps(), peak
+
+
+def main():
+    args = sys.argv[1:]
+    depths = [int(arg) for arg in args if arg.isdigit()] or [20000]
+    files = [arg for arg in args if not arg.isdigit()] or sorted(glob.glob(os.path.join(BENCHMARK_DIR, "*.rpal")))
+
+    print(f"{'deep':<16} {'steps':>9} {'blocks':>9} {'bytes':>11} {'blocks/step':>12} {'bytes/step':>11}")
+    with tempfile.TemporaryDirectory() as directory:
+        for depth in depths:
+            file_name = os.path.join(directory, f"sum_{depth}.rpal")
+            with open(file_name, "w") as file:
+                file.write(deep_program(depth))
+            steps, blocks, size = measure_deep(file_name, depth)
+            print(f"{'Sum ' + str(depth):<16} {steps:>9} {blocks:>9} {size:>11} {blocks / steps:>12.2f} {size / steps:>11.1f}")
+
+    print()
+    print(f"{'workload':<16} {'steps':>9} {'peak bytes':>11} {'bytes/step':>11}")
+    for file_name in files:
+        steps, peak = measure_workload(file_name)
+        print(f"{os.path.basename(file_name):<16} {steps:>9} {peak:>11} {peak / steps:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Description
+Measures printing large integers. RPAL integers are Python ints of any size, and Print and ItoS
+convert them with int_to_str (see cse_machine/runtime.py): str for integers of a few thousand
+digits, and above that gmpy2 when it is installed or a divide-and-conquer conversion with the
+decimal module. str is quadratic in the number of digits and refuses integers of more than
+sys.get_int_max_str_digits() digits (4300 by default).
+
+For every size an RPAL program computes 3 ** n with about that many digits and prints it; the run
+time is reported with the time of the conversion alone, by int_to_str and by str (with the limit
+of str lifted).
+
+Usage
+python benchmarks/big_integers.py                   # 10000, 100000 and 1000000 digits
+python benchmarks/big_integers.py 50000 200000      # the given numbers of digits
+python benchmarks/big_integers.py -engine bytecode  # another engine (default: cse)
+"""
+
+import io
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARK_DIR), "src"))
+
+from interpreter.interpreter import Evaluator, ENGINES
+from cse_machine.runtime import gmpy2, int_to_str
+
+# digits of 3 ** n per unit of n
+LOG10_3 = 0.47712125471966244
+
+
+def power_program(digits):
+    return f"Print (3 ** {int(digits / LOG10_3)})\n"
+
+
+def run(file_name, engine):
+    """
+    Run the program on an engine.
+
+    Returns:
+        tuple: The output and the run time in seconds.
+    """
+    evaluator = Evaluator()
+    evaluator.cse_machine = ENGINES[engine]()
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        evaluator.interpret(file_name)
+    return evaluator.output, time.perf_counter() - start
+
+
+def conversion_time(convert, value):
+    start = time.perf_counter()
+    convert(value)
+    return time.perf_counter() - start
+
+
+def str_time(value):
+    """
+    Return the time str takes to convert the value, with the digit limit of str lifted.
+    """
+    limit = sys.get_int_max_str_digits()
+    sys.set_int_max_str_digits(0)
+    try:
+        return conversion_time(str, value)
+    finally:
+        sys.set_int_max_str_digits(limit)
+
+
+def main():
+    args = sys.argv[1:]
+    engine = "cse"
+    if "-engine" in args:
+        i = args.index("-engine")
+        engine = args[i + 1]
+        del args[i:i + 2]
+    sizes = [int(arg) for arg in args] or [10000, 100000, 1000000]
+
+    print(f"conversion: {'gmpy2' if gmpy2 is not None else 'decimal'}")
+    print(f"{'digits':>9} {'run (ms)':>10} {'int_to_str (ms)':>16} {'str (ms)':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for digits in sizes:
+            file_name = os.path.join(directory, f"power_{digits}.rpal")
+            with open(file_name, "w") as file:
+                file.write(power_program(digits))
+            output, seconds = run(file_name, engine)
+            value = 3 ** int(digits / LOG10_3)
+            assert output.strip() == int_to_str(value)
+            print(f"{len(output.strip()):>9} {seconds * 1000:>10.1f} "
+                  f"{conversion_time(int_to_str, value) * 1000:>16.1f} {str_time(value) * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Description
+Measures the cost of a call and its return on the CSE machine as the recursion gets deeper. The
+workload is a non-tail recursion that builds up depth live calls, with a value left on the stack
+by every caller, before returning through all of them. Restoring the environment on a return
+(CSE rule 5) takes the top of the environment stack of the machine, so the time per call stays
+flat as the depth grows.
+
+Usage
+python benchmarks/call_depth.py                    # depths 1000, 10000, 100000 and 300000
+python benchmarks/call_depth.py 1000000            # the given depths
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARK_DIR), "src"))
+
+from interpreter.interpreter import Evaluator
+from cse_machine.machine import CSEMachine
+
+
+def deep_program(depth):
+    """
+    Return an RPAL program that sums 1 ... depth with a call that is not in tail position.
+    """
+    return f"let rec Sum n = n eq 0 -> 0 | n + Sum (n - 1) in Print (Sum {depth})\n"
+
+
+def run_cse(file_name, collect_stats=False):
+    """
+    Run a program on the CSE machine.
+
+    Returns:
+        tuple: The run time in seconds and the machine.
+    """
+    evaluator = Evaluator()
+    evaluator.cse_machine = CSEMachine(collect_stats=collect_stats)
+    start = time.perf_counter()
+    evaluator.interpret(file_name)
+    return time.perf_counter() - start, evaluator.cse_machine
+
+
+def main():
+    depths = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000, 300000]
+    print(f"{'depth':>9} {'seconds':>9} {'us/call':>9} {'peak stack':>11}")
+    with tempfile.TemporaryDirectory() as directory:
+        for depth in depths:
+            file_name = os.path.join(directory, f"deep_{depth}.rpal")
+            with open(file_name, "w") as file:
+                file.write(deep_program(depth))
+            seconds = min(run_cse(file_name)[0] for _ in range(3 if depth <= 100000 else 1))
+            stats = run_cse(file_name, collect_stats=True)[1].stats
+            print(f"{depth:>9} {seconds:>9.3f} {seconds / depth * 1e6:>9.2f} {stats.peak_stack_depth:>11}")
+
+
+if __name__ == "__main__":
+    main()
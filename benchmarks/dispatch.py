@@ -0,0 +1,108 @@
+"""
+Description
+Measures the dispatch rate of the CSE machine: the number of rules it applies per second. The
+machine dispatches on the integer tag of the element on top of the control (see
+CSEMachine.execute), and the operators are applied through the module-level tables of
+cse_machine/binop.py and cse_machine/unop.py.
+
+Each workload is run once with statistics on to count its steps, then timed with statistics off
+(the best of a few runs). It is run with the default superinstructions and without them, where
+every leaf and operator is a step of its own. The cost of applying an operator through
+apply_binary_operations and apply_unary_operations is measured on its own as well.
+
+Run the script on two checkouts of the tree to compare them.
+
+Usage
+python benchmarks/dispatch.py                       # every .rpal workload in this folder
+python benchmarks/dispatch.py fact.rpal psum.rpal   # the given workloads
+"""
+
+import glob
+import io
+import os
+import sys
+import time
+import timeit
+from contextlib import redirect_stdout
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARK_DIR), "src"))
+
+from interpreter.interpreter import Evaluator
+from cse_machine.machine import CSEMachine
+from cse_machine.binop import apply_binary_operations
+from cse_machine.unop import apply_unary_operations
+
+RUNS = 5
+CALLS = 200000
+
+# machine options of each column
+CONFIGS = {"fused": dict(), "plain": dict(superinstructions=())}
+
+
+def run(file_name, **options):
+    evaluator = Evaluator()
+    evaluator.cse_machine = CSEMachine(**options)
+    with redirect_stdout(io.StringIO()):
+        evaluator.interpret(file_name)
+    return evaluator.cse_machine
+
+
+def steps_per_second(file_name, options):
+    """
+    Return the steps of a workload and the best rate at which they are applied.
+    """
+    steps = run(file_name, collect_stats=True, **options).stats.steps()
+    best = float("inf")
+    for i in range(RUNS):
+        start = time.perf_counter()
+        run(file_name, **options)
+        best = min(best, time.perf_counter() - start)
+    return steps, steps / best
+
+
+class Machine:
+    """
+    The part of a machine the operator functions use.
+    """
+    _print_queue = []
+
+
+def operator_costs():
+    """
+    Return the time of one call of apply_binary_operations / apply_unary_operations in ns.
+    """
+    machine = Machine()
+    calls = {
+        "+": lambda: apply_binary_operations(machine, 3, 4, "+"),
+        "eq": lambda: apply_binary_operations(machine, 3, 4, "eq"),
+        "Conc": lambda: apply_binary_operations(machine, "ab", "cd", "Conc"),
+        "neg": lambda: apply_unary_operations(machine, 3, "neg"),
+        "Isinteger": lambda: apply_unary_operations(machine, 3, "Isinteger"),
+    }
+    return {name: min(timeit.repeat(call, number=CALLS, repeat=3)) / CALLS * 1e9 for name, call in calls.items()}
+
+
+def main():
+    files = sys.argv[1:] or sorted(glob.glob(os.path.join(BENCHMARK_DIR, "*.rpal")))
+    files = [file if os.path.exists(file) else os.path.join(BENCHMARK_DIR, file) for file in files]
+
+    header = f"{'workload':<20}"
+    for name in CONFIGS:
+        header += f" {name + ' steps':>12} {'steps/s':>11}"
+    print(header)
+    for file_name in files:
+        line = f"{os.path.basename(file_name):<20}"
+        for options in CONFIGS.values():
+            steps, rate = steps_per_second(file_name, options)
+            line += f" {steps:>12} {rate:>11.0f}"
+        print(line)
+
+    print()
+    print(f"{'operator':<20} {'ns/call':>8}")
+    for name, cost in operator_costs().items():
+        print(f"{name:<20} {cost:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Description
+Measures the cost of the environments the CSE machine creates for calls: the time to create a
+frame and bind its parameter, and the memory a frame holds (measured with tracemalloc). The
+slotted Environment of cse_machine/environment.py is compared with a frame laid out like the
+one it replaced (an instance __dict__, a defaultdict of bindings and a two-element list per
+binding). A recursive workload is then run end to end.
+
+Usage
+python benchmarks/environments.py                   # frames of 1 and 3 bindings, fact.rpal-like workload
+python benchmarks/environments.py 1 2 5             # frames of the given numbers of bindings
+"""
+
+import gc
+import os
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+from collections import defaultdict
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARK_DIR), "src"))
+
+from interpreter.interpreter import Evaluator
+from cse_machine.environment import Environment, PRIMITIVE_ENVIRONMENT
+
+FRAMES = 100000
+
+
+class DictEnvironment:
+    """
+    A frame laid out like the environments before they had slots.
+    """
+    index = -1
+
+    def __init__(self):
+        DictEnvironment.index += 1
+        self.index = DictEnvironment.index
+        self._environment = defaultdict(lambda: [None, None])
+        self.parent = None
+        self.shape = None
+
+    def add_var(self, name, type, value):
+        self._environment[name] = [type, value]
+        self.shape = None
+
+
+def make_slotted(bindings, index=1):
+    env = Environment(index)
+    for i in range(bindings):
+        env.add_var(f"x{i}", i)
+    env.parent = PRIMITIVE_ENVIRONMENT
+    return env
+
+
+def make_dict(bindings):
+    env = DictEnvironment()
+    for i in range(bindings):
+        env.add_var(f"x{i}", "INT", i)
+    env.parent = PRIMITIVE_ENVIRONMENT
+    return env
+
+
+def bytes_per_frame(make, bindings):
+    """
+    Measure the memory held by FRAMES frames with tracemalloc.
+
+    Returns:
+        float: The bytes per frame.
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    frames = [make(bindings) for _ in range(FRAMES)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del frames
+    # the list holding the frames is not part of their cost
+    return (after - before) / FRAMES - 8
+
+
+def recursive_program(n):
+    return f"let rec Sum n = n eq 0 -> 0 | n + Sum (n - 1) in Print (Sum {n})\n"
+
+
+def main():
+    binding_counts = [int(arg) for arg in sys.argv[1:]] or [1, 3]
+    print(f"{'frame':<10} {'bindings':>8} {'ns/frame':>9} {'bytes/frame':>12}")
+    for bindings in binding_counts:
+        for name, make in (("dict", make_dict), ("slots", make_slotted)):
+            seconds = min(timeit.repeat(lambda: make(bindings), number=FRAMES, repeat=5))
+            print(f"{name:<10} {bindings:>8} {seconds / FRAMES * 1e9:>9.0f} {bytes_per_frame(make, bindings):>12.0f}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        file_name = os.path.join(directory, "sum.rpal")
+        with open(file_name, "w") as file:
+            file.write(recursive_program(20000))
+        times = []
+        for _ in range(3):
+            start = time.perf_counter()
+            Evaluator().interpret(file_name)
+            times.append(time.perf_counter() - start)
+        print()
+        print(f"Sum 20000 on the CSE machine: {min(times):.3f}s")
+
+
+if __name__ == "__main__":
+    main()
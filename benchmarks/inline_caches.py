@@ -0,0 +1,113 @@
+"""
+Description
+Measures variable lookup in the CSE machine with and without the inline caches of the ID
+elements, on generated programs that nest let (or where) definitions to a given depth and then
+look up the outermost variable in a loop. The closures are measured both flat and as full
+environment chains, where the lookup has to walk the whole nesting. A second table measures the
+cost of a single lookup of the outermost variable from the innermost frame of such a nesting.
+
+Usage
+python benchmarks/inline_caches.py                 # depths 1, 10, 40 and 80
+python benchmarks/inline_caches.py 100 400         # the given depths
+"""
+
+import os
+import sys
+import tempfile
+import time
+import timeit
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARK_DIR), "src"))
+
+from interpreter.interpreter import Evaluator
+from cse_machine.machine import CSEMachine
+from cse_machine.environment import Environment
+from cse_machine.utils import var_lookup
+from utils.control_structure_element import ControlStructureElement
+
+LOOP_CALLS = 200
+
+
+def nested_program(depth, where=False):
+    """
+    Return an RPAL program that defines x1 ... x<depth>, each inside the previous one, and then
+    adds x1 up in a recursive loop.
+    """
+    loop = "Loop n = n eq 0 -> 0 | x1 + Loop (n - 1)"
+    if where:
+        # the definitions of a where take in a following where, so each level is parenthesized
+        lines = [f"Print (Loop {LOOP_CALLS}) where rec {loop}"]
+        for i in range(depth, 0, -1):
+            lines = ["("] + lines + [f") where x{i} = {i}"]
+    else:
+        lines = [f"let x{i} = {i} in" for i in range(1, depth + 1)]
+        lines.append(f"let rec {loop} in Print (Loop {LOOP_CALLS})")
+    return "\n".join(lines) + "\n"
+
+
+def run_cse(file_name, flat_closures, inline_caches, collect_stats=False):
+    """
+    Run a program on the CSE machine.
+
+    Returns:
+        tuple: The run time in seconds and the machine.
+    """
+    evaluator = Evaluator()
+    evaluator.cse_machine = CSEMachine(flat_closures=flat_closures, inline_caches=inline_caches,
+                                       collect_stats=collect_stats)
+    start = time.perf_counter()
+    evaluator.interpret(file_name)
+    return time.perf_counter() - start, evaluator.cse_machine
+
+
+def lookup_cost(depth, number=100000):
+    """
+    Measure a lookup of x1 from the innermost of depth nested frames, without and with the
+    inline cache of its ID element.
+
+    Returns:
+        tuple: The nanoseconds per lookup without and with the cache.
+    """
+    machine = CSEMachine(inline_caches=True)
+    env = machine.primitive_environment
+    for i in range(1, depth + 1):
+        frame = Environment(i)
+        frame.add_var(f"x{i}", i)
+        frame.parent = env
+        env = frame
+    machine.current_enviroment = env
+    machine.lookup_caches = [None]
+    site = ControlStructureElement("ID", "x1", site=0)
+    search = timeit.timeit(lambda: var_lookup(machine, "x1"), number=number)
+    cached = timeit.timeit(lambda: var_lookup(machine, "x1", site), number=number)
+    return search / number * 1e9, cached / number * 1e9
+
+
+def main():
+    depths = [int(arg) for arg in sys.argv[1:]] or [1, 10, 40, 80]
+    print(f"{'program':<10} {'closures':<9} {'caches':<7} {'seconds':>9} {'hits':>7} {'misses':>7} {'hops/lookup':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        for depth in depths:
+            for where in (False, True):
+                name = f"{'where' if where else 'let'} {depth}"
+                file_name = os.path.join(directory, f"nested_{depth}.rpal")
+                with open(file_name, "w") as file:
+                    file.write(nested_program(depth, where))
+                for flat_closures in (True, False):
+                    for inline_caches in (False, True):
+                        seconds = min(run_cse(file_name, flat_closures, inline_caches)[0] for _ in range(3))
+                        stats = run_cse(file_name, flat_closures, inline_caches, collect_stats=True)[1].stats
+                        lookups = stats.lookup_hits + stats.lookup_misses
+                        hops = f"{stats.lookup_hops / lookups:.2f}" if lookups else "-"
+                        print(f"{name:<10} {'flat' if flat_closures else 'chain':<9} {'on' if inline_caches else 'off':<7} "
+                              f"{seconds:>9.4f} {stats.lookup_hits:>7} {stats.lookup_misses:>7} {hops:>12}")
+    print()
+    print(f"{'depth':<10} {'search ns':>10} {'cached ns':>10}")
+    for depth in depths:
+        search, cached = lookup_cost(depth)
+        print(f"{depth:<10} {search:>10.0f} {cached:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Description
+Measures the memo store of the CSE machine (see cse_machine/memo_store.py): the workloads of
+benchmarks/memoization.py are run without memoization, then twice with a memo store in a new
+SQLite file. The first run computes the results and writes them; the second is a later run of the
+same program, which finds the result of the call it makes in the file. The output must be the
+same, and the results read from and written to the file are reported.
+
+Usage
+python benchmarks/memo_store.py
+"""
+
+import io
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARK_DIR), "src"))
+
+from interpreter.interpreter import Evaluator
+from cse_machine.machine import CSEMachine
+from cse_machine.memo_store import MemoStore
+from memoization import WORKLOADS
+
+
+def run(file_name, **options):
+    """
+    Run the program on the CSE machine.
+
+    Returns:
+        tuple: The machine, the output and the run time in seconds.
+    """
+    evaluator = Evaluator()
+    evaluator.cse_machine = CSEMachine(**options)
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        evaluator.interpret(file_name)
+    return evaluator.cse_machine, evaluator.output, time.perf_counter() - start
+
+
+def main():
+    print(f"{'workload':<10} {'plain (ms)':>11} {'first (ms)':>11} {'written':>8} {'second (ms)':>12} {'read':>5}  output")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, program in WORKLOADS.items():
+            file_name = os.path.join(directory, f"{name}.rpal")
+            with open(file_name, "w") as file:
+                file.write(program)
+            store_name = os.path.join(directory, f"{name}.sqlite")
+            machine, plain_output, plain = run(file_name)
+
+            store = MemoStore(store_name)
+            machine, output, first = run(file_name, memo_store=store)
+            assert output == plain_output
+            written = store.writes
+            store.close()
+
+            store = MemoStore(store_name)
+            machine, output, second = run(file_name, memo_store=store)
+            assert output == plain_output
+            read = store.reads
+            store.close()
+            print(f"{name:<10} {plain * 1000:>11.1f} {first * 1000:>11.1f} {written:>8} {second * 1000:>12.1f} "
+                  f"{read:>5}  {output.strip()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Description
+Measures the memo table of the CSE machine (see cse_machine/memo.py) on naive recursive
+definitions that make the same calls over and over:
+    fib      - rec Fib n = Fib (n - 1) + Fib (n - 2), exponential without memoization
+    binomial - rec C (n, k) = C (n - 1, k - 1) + C (n - 1, k), a tuple argument
+    paths    - rec P r c = P (r - 1) c + P r (c - 1), a curried definition
+
+Each workload is run without memoization and with a memo table of the given size; the output
+must be the same, and the hits and misses of the table are reported.
+
+Usage
+python benchmarks/memoization.py                    # memo table of 100000 results
+python benchmarks/memoization.py 16                 # a small table, to see the evictions
+"""
+
+import io
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARK_DIR), "src"))
+
+from interpreter.interpreter import Evaluator
+from cse_machine.machine import CSEMachine
+
+WORKLOADS = {
+    "fib": "let rec Fib n = n ls 2 -> n | Fib (n - 1) + Fib (n - 2) in Print (Fib 22)\n",
+    "binomial": ("let rec C (n, k) = k eq 0 or k eq n -> 1 | C (n - 1, k - 1) + C (n - 1, k) in\n"
+                 "Print (C (18, 9))\n"),
+    "paths": ("let rec P r c = r eq 0 or c eq 0 -> 1 | P (r - 1) c + P r (c - 1) in\n"
+              "Print (P 9 9)\n"),
+}
+
+
+def run(file_name, **options):
+    """
+    Run the program on the CSE machine.
+
+    Returns:
+        tuple: The machine, the output and the run time in seconds.
+    """
+    evaluator = Evaluator()
+    evaluator.cse_machine = CSEMachine(**options)
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        evaluator.interpret(file_name)
+    return evaluator.cse_machine, evaluator.output, time.perf_counter() - start
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    print(f"{'workload':<10} {'plain (ms)':>11} {'memo (ms)':>10} {'hits':>7} {'misses':>7} {'evicted':>8}  output")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, program in WORKLOADS.items():
+            file_name = os.path.join(directory, f"{name}.rpal")
+            with open(file_name, "w") as file:
+                file.write(program)
+            machine, plain_output, plain = run(file_name)
+            machine, output, memoized = run(file_name, memo_size=size)
+            assert output == plain_output
+            memo = machine.memo
+            print(f"{name:<10} {plain * 1000:>11.1f} {memoized * 1000:>10.1f} {memo.hits:>7} {memo.misses:>7} "
+                  f"{memo.evictions:>8}  {output.strip()}")
+
+
+if __name__ == "__main__":
+    main()
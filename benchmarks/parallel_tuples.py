@@ -0,0 +1,78 @@
+"""
+Description
+Measures the parallel evaluation of the components of tuples by the CSE machine (see
+cse_machine/parallel.py) on a tuple of independent, expensive calls:
+    let rec Fib n = ... in Print (Fib n, Fib n, ...)        one component per worker
+
+The program is run serially and with 1, 2, 4, ... worker processes up to the number of CPUs; the
+output must be the same. The speedup over the serial run is reported, with the tuples evaluated
+in parallel and those that fell back to serial evaluation. On a single CPU there is no speedup to
+see, only the cost of starting the workers and sending them the program.
+
+Usage
+python benchmarks/parallel_tuples.py                # Fib 22 in every component
+python benchmarks/parallel_tuples.py 25             # Fib 25
+"""
+
+import io
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARK_DIR), "src"))
+
+from interpreter.interpreter import Evaluator
+from cse_machine.machine import CSEMachine
+
+
+def fib_program(n, components):
+    calls = ", ".join(f"Fib {n}" for _ in range(components))
+    return f"let rec Fib n = n ls 2 -> n | Fib (n - 1) + Fib (n - 2) in\nPrint ({calls})\n"
+
+
+def run(file_name, **options):
+    """
+    Run the program on the CSE machine.
+
+    Returns:
+        tuple: The machine, the output and the run time in seconds.
+    """
+    evaluator = Evaluator()
+    evaluator.cse_machine = CSEMachine(**options)
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        evaluator.interpret(file_name)
+    return evaluator.cse_machine, evaluator.output, time.perf_counter() - start
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 22
+    cpus = os.cpu_count() or 1
+    workers = [1]
+    while workers[-1] * 2 <= cpus:
+        workers.append(workers[-1] * 2)
+    if workers[-1] != cpus:
+        workers.append(cpus)
+    components = max(workers[-1], 2)
+
+    print(f"cpus: {cpus}, tuple of {components} x Fib {n}")
+    print(f"{'workers':>8} {'time (ms)':>10} {'speedup':>8} {'parallel':>9} {'serial':>7}")
+    with tempfile.TemporaryDirectory() as directory:
+        file_name = os.path.join(directory, "fib_tuple.rpal")
+        with open(file_name, "w") as file:
+            file.write(fib_program(n, components))
+        machine, serial_output, serial = run(file_name)
+        print(f"{'-':>8} {serial * 1000:>10.1f} {1:>8.2f} {0:>9} {0:>7}")
+        for count in workers:
+            machine, output, seconds = run(file_name, parallel=count)
+            assert output == serial_output
+            tuples = machine.parallel_tuples
+            print(f"{count:>8} {seconds * 1000:>10.1f} {serial / seconds:>8.2f} {tuples.tuples:>9} "
+                  f"{tuples.fallbacks:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Description
+Prints the rule sequence histogram of the CSE machine for RPAL workloads, the data the
+superinstructions of the linearizer (SUPERINSTRUCTIONS in cse_machine/stlinearizer.py) are
+picked from. The workloads run without superinstructions, then once with each candidate pattern
+fused, to show how many steps that pattern saves.
+
+Usage
+python benchmarks/rule_sequences.py                   # every .rpal workload in this folder
+python benchmarks/rule_sequences.py file.rpal ...     # the given workloads
+"""
+
+import glob
+import os
+import sys
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARK_DIR), "src"))
+
+from interpreter.interpreter import Evaluator
+from cse_machine.machine import CSEMachine
+from cse_machine.stlinearizer import SUPERINSTRUCTIONS
+
+
+def run_cse(file_name, superinstructions, collect_stats=True):
+    """
+    Run a workload on the CSE machine with the given superinstructions.
+
+    Returns:
+        tuple: The run time in seconds and the statistics of the run.
+    """
+    evaluator = Evaluator()
+    evaluator.cse_machine = CSEMachine(collect_stats=collect_stats, superinstructions=superinstructions)
+    start = time.perf_counter()
+    evaluator.interpret(file_name)
+    return time.perf_counter() - start, evaluator.cse_machine.stats
+
+
+def best_time(file_name, superinstructions, repeat=3):
+    return min(run_cse(file_name, superinstructions, collect_stats=False)[0] for _ in range(repeat))
+
+
+def main():
+    files = sys.argv[1:] or sorted(glob.glob(os.path.join(BENCHMARK_DIR, "*.rpal")))
+    for file_name in files:
+        _, stats = run_cse(file_name, ())
+        print(f"{os.path.basename(file_name)}: {stats.steps()} steps without superinstructions")
+        for length in (2, 3):
+            for sequence, count in stats.frequent_sequences(length):
+                print(f"  {' '.join(sequence):<12} {count:>8}")
+        for pattern in SUPERINSTRUCTIONS:
+            _, fused = run_cse(file_name, (pattern,))
+            print(f"  fuse {pattern:<12} saves {stats.steps() - fused.steps():>8} steps")
+        plain = best_time(file_name, ())
+        fused = best_time(file_name, SUPERINSTRUCTIONS)
+        print(f"  time {plain:.4f}s -> {fused:.4f}s with {', '.join(SUPERINSTRUCTIONS)}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
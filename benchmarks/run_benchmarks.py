@@ -0,0 +1,66 @@
+"""
+Description
+Runs RPAL workloads through the interpreter and reports the run time and the CSE machine statistics.
+
+Usage
+python benchmarks/run_benchmarks.py                   # every .rpal workload in this folder
+python benchmarks/run_benchmarks.py file.rpal ...     # the given workloads
+python benchmarks/run_benchmarks.py -engine bytecode  # run with another engine (default: every engine)
+"""
+
+import glob
+import os
+import sys
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARK_DIR), "src"))
+
+from interpreter.interpreter import Evaluator, ENGINES
+
+
+def run_workload(file_name, engine, repeat=3):
+    """
+    Run a workload and measure it.
+
+    Args:
+        file_name (str): The RPAL file to run.
+        engine (str): The execution engine.
+        repeat (int): The number of runs; the fastest one is reported.
+
+    Returns:
+        tuple: The best time in seconds, the statistics of a separate run and its output.
+    """
+    best = None
+    for _ in range(repeat):
+        evaluator = Evaluator(engine=engine)
+        start = time.perf_counter()
+        evaluator.interpret(file_name)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    # collecting statistics slows the engines down, so they come from a run that is not timed
+    evaluator = Evaluator(engine=engine, collect_stats=True)
+    evaluator.interpret(file_name)
+    return best, evaluator.cse_machine.stats, evaluator.get_output()
+
+
+def main():
+    args = sys.argv[1:]
+    engines = list(ENGINES)
+    if args[:1] == ["-engine"]:
+        engines = [args[1]]
+        args = args[2:]
+    files = args or sorted(glob.glob(os.path.join(BENCHMARK_DIR, "*.rpal")))
+    print(f"{'workload':<24} {'engine':<9} {'seconds':>9} {'steps':>9} {'envs':>7} {'peak envs':>10}  output")
+    for file_name in files:
+        for engine in engines:
+            seconds, stats, output = run_workload(file_name, engine)
+            output = (output or "").strip()
+            if len(output) > 30:
+                output = output[:27] + "..."
+            print(f"{os.path.basename(file_name):<24} {engine:<9} {seconds:>9.4f} {stats.steps():>9} "
+                  f"{stats.environments_created:>7} {stats.peak_live_environments:>10}  {output}")
+
+
+if __name__ == "__main__":
+    main()
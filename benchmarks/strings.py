@@ -0,0 +1,99 @@
+"""
+Description
+Measures string processing with Stern, Stem and Conc. Long strings made by Stern are views into
+the string they come from, and long strings made by Conc link their parts until the characters
+are needed (see Rope in cse_machine/runtime.py), so walking or building an n-character string
+takes O(n) time.
+
+The workloads are run on strings of the given sizes:
+    reverse - reverse a string with a tail-recursive loop of Stern, Stem and Conc
+    append  - build a string by appending 64-character chunks with Conc, then compare it with
+              the same string built by doubling (Conc s s)
+
+Usage
+python benchmarks/strings.py                        # strings of 1 MB (1048576 characters)
+python benchmarks/strings.py 16384 65536            # strings of the given numbers of characters
+python benchmarks/strings.py -engine bytecode       # another engine (default: cse)
+"""
+
+import io
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARK_DIR), "src"))
+
+from interpreter.interpreter import Evaluator, ENGINES
+
+CHUNK = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ-+"
+
+# Builds a string of 64 * 2 ** n characters by doubling the chunk
+DOUBLE = f"let rec Double n s = n eq 0 -> s | Double (n - 1) (Conc s s) in\n"
+
+
+def doublings(size):
+    return max(0, (size // len(CHUNK)).bit_length() - 1)
+
+
+def reverse_program(size):
+    return (DOUBLE +
+            "let rec Rev s acc = s eq '' -> acc | Rev (Stern s) (Conc (Stem s) acc) in\n"
+            f"let S = Double {doublings(size)} '{CHUNK}' in\n"
+            "let R = Rev S '' in\n"
+            "Print (Stem R, Stem (Stern R), Stem S)\n")
+
+
+def append_program(size):
+    return (DOUBLE +
+            f"let C = '{CHUNK}' in\n"
+            "let rec Append n s = n eq 0 -> s | Append (n - 1) (Conc s C) in\n"
+            f"let n = {doublings(size)} in\n"
+            "let rec Pow n = n eq 0 -> 1 | 2 * Pow (n - 1) in\n"
+            "let S = Append (Pow n) '' in\n"
+            "Print (S eq Double n C, Stem S)\n")
+
+
+WORKLOADS = {"reverse": reverse_program, "append": append_program}
+
+
+def run(file_name, engine):
+    """
+    Run the program on an engine.
+
+    Returns:
+        tuple: The output and the run time in seconds.
+    """
+    evaluator = Evaluator()
+    evaluator.cse_machine = ENGINES[engine]()
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        evaluator.interpret(file_name)
+    return evaluator.output, time.perf_counter() - start
+
+
+def main():
+    args = sys.argv[1:]
+    engine = "cse"
+    if "-engine" in args:
+        i = args.index("-engine")
+        engine = args[i + 1]
+        del args[i:i + 2]
+    sizes = [int(arg) for arg in args] or [1 << 20]
+
+    print(f"{'workload':<10} {'characters':>10} {'time (ms)':>10} {'us/char':>8}  output")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            characters = len(CHUNK) << doublings(size)
+            for name, program in WORKLOADS.items():
+                file_name = os.path.join(directory, f"{name}_{size}.rpal")
+                with open(file_name, "w") as file:
+                    file.write(program(size))
+                output, seconds = run(file_name, engine)
+                print(f"{name:<10} {characters:>10} {seconds * 1000:>10.1f} {seconds / characters * 1e6:>8.2f}  {output.strip()}")
+
+
+if __name__ == "__main__":
+    main()
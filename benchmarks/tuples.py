@@ -0,0 +1,96 @@
+"""
+Description
+Measures building a tuple with the RPAL loop T aug x. A tuple is a view of the first length items
+of a buffer that longer tuples share (see Tuple in cse_machine/runtime.py), so an aug that extends
+the whole buffer appends to it instead of copying the tuple: building an n-tuple takes O(n) time,
+and the time per aug stays flat as n grows.
+
+Every size is run on the engines that keep their calls on the heap (the closure and python
+engines nest a Python call for every RPAL call and stop at their recursion limit).
+
+The memory a component takes is measured with tracemalloc on tuples built with aug: a tuple of
+integers keeps them in an array('q'), and a tuple that also holds a string keeps them in a list of
+int objects.
+
+Usage
+python benchmarks/tuples.py                         # 1000, 10000 and 100000 components
+python benchmarks/tuples.py 20000 50000             # the given sizes
+"""
+
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARK_DIR), "src"))
+
+from interpreter.interpreter import Evaluator, ENGINES
+from cse_machine.runtime import Tuple
+
+ENGINE_NAMES = ("cse", "bytecode")
+
+
+def build_program(n):
+    return (f"let rec Build n T = n eq 0 -> T | Build (n - 1) (T aug n) in\n"
+            f"let T = Build {n} nil in Print (Order T, T 1, T {n})\n")
+
+
+def run(file_name, engine):
+    """
+    Run the program on an engine.
+
+    Returns:
+        tuple: The output and the run time in seconds.
+    """
+    evaluator = Evaluator()
+    evaluator.cse_machine = ENGINES[engine]()
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        evaluator.interpret(file_name)
+    return evaluator.output, time.perf_counter() - start
+
+
+def memory_per_component(n, first):
+    """
+    Build a tuple of first and n large integers with aug and measure the memory it holds.
+
+    Returns:
+        tuple: The storage of the tuple and its bytes per component.
+    """
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    tuple_ = Tuple([first])
+    for i in range(n):
+        tuple_ = tuple_.aug(1000000 + i)
+    size = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return type(tuple_.items).__name__, size / (n + 1)
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000]
+
+    print(f"{'components':>10} {'engine':<10} {'time (ms)':>10} {'us/aug':>8}  output")
+    with tempfile.TemporaryDirectory() as directory:
+        for n in sizes:
+            file_name = os.path.join(directory, f"build_{n}.rpal")
+            with open(file_name, "w") as file:
+                file.write(build_program(n))
+            for engine in ENGINE_NAMES:
+                output, seconds = run(file_name, engine)
+                print(f"{n:>10} {engine:<10} {seconds * 1000:>10.1f} {seconds / n * 1e6:>8.2f}  {output.strip()}")
+
+    print()
+    print(f"{'components':>10} {'tuple':<10} {'storage':<8} {'bytes/component':>16}")
+    for n in sizes:
+        for name, first in (("integers", 0), ("mixed", "x")):
+            storage, size = memory_per_component(n, first)
+            print(f"{n:>10} {name:<10} {storage:<8} {size:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+Description
+This module contains static analyses over the Standardized Tree (ST) used by the linearizer
+to annotate control structure elements.
+
+Usage
+>>> from cse_machine.analysis import free_variables
+>>> free = free_variables(st_tree)
+>>> free[id(lambda_node)]   # names referenced by the lambda but bound outside it
+>>> lambda_indices(st_tree)[id(lambda_node)]   # the control structure index of its body
+>>> infer_types(st_tree).get(id(node))          # "INT", "bool", "STR", ... when proven
+"""
+
+from cse_machine.environment import Environment
+
+# Result types of the operators whatever their operands are: an operator fails unless its
+# operands fit, and the arithmetic operators give an integer even for truth values (** fails on
+# a negative exponent).
+OPERATOR_TYPES = {
+    "+": "INT", "-": "INT", "*": "INT", "/": "INT", "**": "INT", "neg": "INT",
+    "eq": "bool", "ne": "bool", "gr": "bool", "ge": "bool", "ls": "bool", "le": "bool",
+    "or": "bool", "&": "bool", "not": "bool",
+}
+
+# Result types of the inbuilt functions (Print gives the string "dummy")
+INBUILT_TYPES = {
+    "Print": "STR", "Isstring": "bool", "Isinteger": "bool", "Istruthvalue": "bool",
+    "Isfunction": "bool", "Null": "bool", "Istuple": "bool", "Order": "INT",
+    "Stern": "STR", "Stem": "STR", "ItoS": "STR",
+}
+
+
+def identifier_name(token):
+    """
+    Return the variable name of an identifier token, or None for any other token.
+
+    Inbuilt functions (Print, Conc, ...) are not variables and are not returned.
+
+    Args:
+        token (str): The node data, e.g. "<ID:x>".
+
+    Returns:
+        str: The variable name, or None.
+    """
+    if token.startswith("<ID:"):
+        name = token[4:-1]
+        if name not in Environment.INITIAL_VARIABLES:
+            return name
+    return None
+
+
+def bound_names(binder):
+    """
+    Return the names bound by the binder (first child) of a lambda node.
+
+    Args:
+        binder (Node): The binder node, either an identifier or a "," node.
+
+    Returns:
+        list[str]: The bound variable names.
+    """
+    if binder.data == ",":
+        nodes = binder.children
+    else:
+        nodes = [binder]
+    return [name for name in (identifier_name(node.data) for node in nodes) if name is not None]
+
+
+def free_variables(st_tree):
+    """
+    Compute the free variables of every lambda in the standardized tree.
+
+    Args:
+        st_tree (Node): The root of the standardized tree.
+
+    Returns:
+        dict: Maps id(lambda node) to a sorted tuple of the names the lambda references
+        but does not bind itself.
+    """
+    lambdas = dict()
+
+    def traverse(node):
+        if not node.children:
+            name = identifier_name(node.data)
+            return {name} if name is not None else set()
+
+        if node.data == "lambda":
+            free = traverse(node.children[1]) - set(bound_names(node.children[0]))
+            lambdas[id(node)] = tuple(sorted(free))
+            return free
+
+        free = set()
+        for child in node.children:
+            free |= traverse(child)
+        return free
+
+    traverse(st_tree)
+    return lambdas
+
+
+def lambda_indices(st_tree):
+    """
+    Number the lambdas of the standardized tree the way the linearizer numbers their control
+    structures, so that engines working on the tree print closures like the CSE machine does.
+
+    Args:
+        st_tree (Node): The root of the standardized tree.
+
+    Returns:
+        dict: Maps id(lambda node) to the control structure index of its body.
+    """
+    indices = dict()
+    count = 1
+
+    def traverse(node):
+        nonlocal count
+        if not node.children:
+            return
+        if node.data == "lambda":
+            indices[id(node)] = count
+            count += 1
+            traverse(node.children[1])
+        elif node.data == "->":
+            # the then and else branches get control structures, the condition does not
+            count += 1
+            traverse(node.children[1])
+            count += 1
+            traverse(node.children[2])
+            traverse(node.children[0])
+        else:
+            for child in node.children:
+                traverse(child)
+
+    traverse(st_tree)
+    return indices
+
+
+def parallel_component(node):
+    """
+    Examine a component of a tuple for evaluation apart from the other components (see
+    cse_machine/parallel.py). It must hold no Print, and no lambda either: a closure prints with
+    the number of the control structure of its body, which would depend on where it was made.
+
+    Args:
+        node (Node): The component.
+
+    Returns:
+        tuple: The number of calls of variables the component makes, a static estimate of its
+        cost, and its free variables (a sorted tuple), or None when it cannot be evaluated apart.
+    """
+    calls = 0
+    names = set()
+    nodes = [node]
+    while nodes:
+        node = nodes.pop()
+        if node.data == "lambda" or node.data == "<ID:Print>":
+            return None
+        if not node.children:
+            name = identifier_name(node.data)
+            if name is not None:
+                names.add(name)
+            continue
+        if node.data == "gamma" and identifier_name(node.children[0].data) is not None:
+            calls += 1
+        nodes.extend(node.children)
+    return calls, tuple(sorted(names))
+
+
+def literal_type(token):
+    """
+    Return the type of a literal token, or None for any other token.
+
+    Args:
+        token (str): The node data, e.g. "<INT:3>".
+
+    Returns:
+        str: "INT", "STR", "bool", "nil", "dummy" or None.
+    """
+    if token.startswith("<INT:"):
+        return "INT"
+    if token.startswith("<STR:"):
+        return "STR"
+    if token in ("<true>", "<false>"):
+        return "bool"
+    if token in ("<nil>", "<dummy>"):
+        return token[1:-1]
+    return None
+
+
+def infer_types(st_tree):
+    """
+    Infer the types of the expressions of the standardized tree that can be proven locally:
+    literals, the results of operators and inbuilt functions, tuples, conditionals whose arms
+    agree, and variables bound by let or where (a lambda applied directly to its argument) to
+    an expression of a proven type. Lambda parameters, the results of calls and recursive
+    definitions are not known.
+
+    Args:
+        st_tree (Node): The root of the standardized tree.
+
+    Returns:
+        dict: Maps id(node) to the proven type of the node ("INT", "bool", "STR", "tuple",
+        "nil" or "dummy"). Nodes of unknown type are left out.
+    """
+    types = dict()
+
+    def bind(scope, binder, rand):
+        inner = dict(scope)
+        names = bound_names(binder)
+        for name in names:
+            inner[name] = None
+        if binder.data == "," and rand is not None and rand.data == "tau" and len(rand.children) == len(binder.children):
+            for node, component in zip(binder.children, rand.children):
+                name = identifier_name(node.data)
+                if name is not None:
+                    inner[name] = types.get(id(component))
+        elif binder.data != "," and rand is not None and names:
+            inner[names[0]] = types.get(id(rand))
+        return inner
+
+    def traverse(node, scope):
+        if not node.children:
+            name = identifier_name(node.data)
+            result = scope.get(name) if name is not None else literal_type(node.data)
+
+        elif node.data == "lambda":
+            traverse(node.children[1], bind(scope, node.children[0], None))
+            result = None
+
+        elif node.data == "gamma":
+            rator, rand = node.children
+            traverse(rand, scope)
+            if rator.data == "lambda":
+                # let and where: the bound variables get the types of the argument
+                result = traverse(rator.children[1], bind(scope, rator.children[0], rand))
+            else:
+                traverse(rator, scope)
+                result = None
+                if not rator.children and rator.data[4:-1] in INBUILT_TYPES and rator.data.startswith("<ID:"):
+                    result = INBUILT_TYPES[rator.data[4:-1]]
+                elif rator.data == "gamma" and rator.children[0].data == "<ID:Conc>":
+                    result = "STR"
+
+        elif node.data == "->":
+            then_type = traverse(node.children[1], scope)
+            else_type = traverse(node.children[2], scope)
+            traverse(node.children[0], scope)
+            result = then_type if then_type == else_type else None
+
+        elif node.data == "tau":
+            for child in node.children:
+                traverse(child, scope)
+            result = "tuple"
+
+        else:
+            operand_types = [traverse(child, scope) for child in node.children]
+            if node.data == "aug":
+                result = "tuple" if operand_types[0] in ("tuple", "nil") else None
+            else:
+                result = OPERATOR_TYPES.get(node.data)
+
+        if result is not None:
+            types[id(node)] = result
+        return result
+
+    traverse(st_tree, dict())
+    return types
@@ -9,7 +9,12 @@
 from src.utils.control_structure_element import ControlStructureElement
 """
 
-from utils.control_structure_element import ControlStructureElement
+import operator
+
+from cse_machine.runtime import Rope, Tuple, concat, equal_values, is_string
+
+# Types of the values aug can put in a tuple
+AUGMENTABLE_TYPES = {Tuple, int, str, Rope, bool}
 
 def apply_binary_operations(cse_machine, rator, rand, binop):
     """
@@ -37,27 +42,8 @@ def apply_binary_operations(cse_machine, rator, rand, binop):
         If the binary operator is not recognized.
     """
 
-    # Dictionary mapping binary operators to their corresponding functions
-    binary_operators = {
-            "aug" : lambda cse_machine, rator, rand : apply_aug(cse_machine, rator, rand),
-            "or"  : lambda cse_machine, rator, rand : apply_or(cse_machine, rator, rand),
-            "&"   : lambda cse_machine, rator, rand : apply_and(cse_machine, rator, rand),
-            "+"   : lambda cse_machine, rator, rand : apply_arithmetic(cse_machine, rator, rand, lambda a, b: a + b),
-            "-"   : lambda cse_machine, rator, rand : apply_arithmetic(cse_machine, rator, rand, lambda a, b: a - b),
-            "*"   : lambda cse_machine, rator, rand : apply_arithmetic(cse_machine, rator, rand, lambda a, b: a * b),
-            "/"   : lambda cse_machine, rator, rand : apply_arithmetic(cse_machine, rator, rand, lambda a, b: a // b),
-            "**"  : lambda cse_machine, rator, rand : apply_arithmetic(cse_machine, rator, rand, lambda a, b: a ** b),
-            "gr"  : lambda cse_machine, rator, rand : apply_comparison(cse_machine, rator, rand, lambda a, b: a > b),
-            "ge"  : lambda cse_machine, rator, rand : apply_comparison(cse_machine, rator, rand, lambda a, b: a >= b),
-            "ls"  : lambda cse_machine, rator, rand : apply_comparison(cse_machine, rator, rand, lambda a, b: a < b),
-            "le"  : lambda cse_machine, rator, rand : apply_comparison(cse_machine, rator, rand, lambda a, b: a <= b),
-            "eq"  : lambda cse_machine, rator, rand : apply_eq(cse_machine, rator, rand),
-            "ne"  : lambda cse_machine, rator, rand : apply_ne(cse_machine, rator, rand),
-            "Conc": lambda cse_machine, rator, rand : apply_conc(cse_machine, rator, rand)
-                    }
-
     # Get the operation function corresponding to the binary operator
-    operation_function = binary_operators.get(binop)
+    operation_function = BINARY_OPERATIONS.get(binop)
     if operation_function:
         # Apply the operation function with the provided operands
         return operation_function(cse_machine, rator, rand)
@@ -90,23 +76,20 @@ def apply_aug(cse_machine, rator, rand):
         If the binary operator is not recognized.
     """
     
-    if rator.type == "nil" :
-        return ControlStructureElement("tuple", [rand])
-    elif rand.type == "nil":
-        if rator.type == "tuple":
-            # If the right operand is "nil", return the left operand
-            rator.value.append(rand)
-            return rator
+    if rator is None :
+        return Tuple([rand])
+    elif rand is None:
+        if type(rator) is Tuple:
+            # If the right operand is "nil", append it to the tuple
+            return rator.aug(rand)
         return rator
-    elif rator.type in ["tuple","ID","INT","STR","bool"] and rand.type in ["tuple","ID","INT","STR","bool"]:
-        if isinstance(rator.value, list) :
-            ls = rator.value.copy()
-            ls.append(rand)
-            res = ControlStructureElement("tuple", ls)
-            return res
-        return ControlStructureElement("tuple", [rator, rand])
+    elif type(rator) in AUGMENTABLE_TYPES and type(rand) in AUGMENTABLE_TYPES:
+        if type(rator) is Tuple:
+            # The tuple shares its buffer with the result (see Tuple in cse_machine/runtime.py)
+            return rator.aug(rand)
+        return Tuple([rator, rand])
     else:
-        return cse_machine._error_handling.handle_error("Cannot augment a non tuple (2).")
+        return cse_machine._error_handler.handle_error("Cannot augment a non tuple (2).")
 
 # Function to handle the 'or' binary operator
 def apply_or(cse_machine, rator, rand):
@@ -137,7 +120,7 @@ def apply_or(cse_machine, rator, rand):
         return rator or rand
     else:
         # Otherwise, raise an error
-        raise cse_machine._error_handling.handle_error("Invalid value used in logical expression 'or'")
+        raise cse_machine._error_handler.handle_error("Invalid value used in logical expression 'or'")
 
 # Function to handle the 'and' binary operator
 def apply_and(cse_machine, rator, rand):
@@ -194,12 +177,12 @@ def apply_eq(cse_machine, rator, rand):
     ValueError
         If the binary operator is not recognized.
     """
-    if type(rator) == type(rand):
-        # If the types of both operands are the same, return whether they are equal
-        return rator == rand
-    else:
+    # Values of the same type (or both strings) are compared, tuples component by component
+    equal = equal_values(rator, rand)
+    if equal is None:
         # Otherwise, raise an error
-        raise cse_machine._error_handling.handle_error("Illegal Operands for 'eq'")
+        raise cse_machine._error_handler.handle_error("Illegal Operands for 'eq'")
+    return equal
 
 # Function to handle the 'ne' binary operator
 def apply_ne(cse_machine, rator, rand):
@@ -225,12 +208,12 @@ def apply_ne(cse_machine, rator, rand):
     ValueError
         If the binary operator is not recognized.
     """
-    if type(rator) == type(rand):
-        # If the types of both operands are the same, return whether they are not equal
-        return rator != rand
-    else:
+    # Values of the same type (or both strings) are compared, tuples component by component
+    equal = equal_values(rator, rand)
+    if equal is None:
         # Otherwise, raise an error
-        raise cse_machine._error_handling.handle_error("Illegal Operands for 'ne'")
+        raise cse_machine._error_handler.handle_error("Illegal Operands for 'ne'")
+    return not equal
 
 # Function to handle arithmetic operations
 def apply_arithmetic(cse_machine, rator, rand, operation):
@@ -265,6 +248,29 @@ def apply_arithmetic(cse_machine, rator, rand, operation):
         # Otherwise, raise an error
         raise cse_machine._error_handler.handle_error("Illegal Operands for Arithmetic Operation")
 
+def apply_power(cse_machine, rator, rand):
+    """
+    This function raises an integer to an integer power. RPAL has integers only, so a negative
+    exponent, which gives a fraction, is an error.
+
+    Parameters
+    ----------
+    cse_machine : CSEMachine
+        The CSE machine used to evaluate the expression.
+    rator : object
+        The base.
+    rand : object
+        The exponent.
+
+    Returns
+    -------
+    int
+        The power.
+    """
+    if type(rand) is int and rand < 0 and isinstance(rator, int):
+        return cse_machine._error_handler.handle_error("CSE : Negative exponent")
+    return apply_arithmetic(cse_machine, rator, rand, operator.pow)
+
 def apply_conc(cse_machine,rator,rand):
     """
     This function applies a binary operation to two operands, based on the specified binary operator.
@@ -283,8 +289,8 @@ def apply_conc(cse_machine,rator,rand):
     ValueError
     """
     
-    if isinstance(rator, str) and isinstance(rand, str):
-        return rator + rand
+    if is_string(rator) and is_string(rand):
+        return concat(rator, rand)
     else:
         raise cse_machine._error_handler.handle_error("Non-strings used in conc call")
     
@@ -314,9 +320,68 @@ def apply_comparison(cse_machine, rator, rand, operation):
     ValueError
         If the operands are not integers or the operation is not a function.
     """
-    if (isinstance(rator, int) and isinstance(rand, int)) or (isinstance(rator, str) and isinstance(rand, str)):
+    if (isinstance(rator, int) and isinstance(rand, int)) or (is_string(rator) and is_string(rand)):
         # If both operands are integers, apply the specified comparison operation
         return operation(rator, rand)
     else:
         # Otherwise, raise an error
-        raise cse_machine._error_handler.handle_error("Illegal Operands for 'gr'")
\ No newline at end of file
+        raise cse_machine._error_handler.handle_error("Illegal Operands for 'gr'")
+
+def arithmetic(operation):
+    """
+    Return the function that applies an arithmetic operation with apply_arithmetic.
+    """
+    def apply(cse_machine, rator, rand):
+        return apply_arithmetic(cse_machine, rator, rand, operation)
+    return apply
+
+def comparison(operation):
+    """
+    Return the function that applies a comparison operation with apply_comparison.
+    """
+    def apply(cse_machine, rator, rand):
+        return apply_comparison(cse_machine, rator, rand, operation)
+    return apply
+
+# Binary operators and the functions that apply them, as called by apply_binary_operations:
+# function(cse_machine, rator, rand)
+BINARY_OPERATIONS = {
+        "aug" : apply_aug,
+        "or"  : apply_or,
+        "&"   : apply_and,
+        "+"   : arithmetic(operator.add),
+        "-"   : arithmetic(operator.sub),
+        "*"   : arithmetic(operator.mul),
+        "/"   : arithmetic(operator.floordiv),
+        "**"  : apply_power,
+        "gr"  : comparison(operator.gt),
+        "ge"  : comparison(operator.ge),
+        "ls"  : comparison(operator.lt),
+        "le"  : comparison(operator.le),
+        "eq"  : apply_eq,
+        "ne"  : apply_ne,
+        "Conc": apply_conc,
+    }
+
+# Operations specialized by type inference (see infer_types in cse_machine/analysis.py). Both
+# operands are proven to have the operand type, so the function is applied without the checks
+# of apply_binary_operations. ** is left out: its exponent must also be checked (apply_power).
+# element type: (operator, operand type, function, result type)
+SPECIALIZED_BINARY_OPERATIONS = {
+        "INT_ADD" : ("+",  "INT",  lambda a, b: a + b,  "INT"),
+        "INT_SUB" : ("-",  "INT",  lambda a, b: a - b,  "INT"),
+        "INT_MUL" : ("*",  "INT",  lambda a, b: a * b,  "INT"),
+        "INT_DIV" : ("/",  "INT",  lambda a, b: a // b, "INT"),
+        "INT_EQ"  : ("eq", "INT",  lambda a, b: a == b, "bool"),
+        "INT_NE"  : ("ne", "INT",  lambda a, b: a != b, "bool"),
+        "INT_GR"  : ("gr", "INT",  lambda a, b: a > b,  "bool"),
+        "INT_GE"  : ("ge", "INT",  lambda a, b: a >= b, "bool"),
+        "INT_LS"  : ("ls", "INT",  lambda a, b: a < b,  "bool"),
+        "INT_LE"  : ("le", "INT",  lambda a, b: a <= b, "bool"),
+        "STR_EQ"  : ("eq", "STR",  lambda a, b: a == b, "bool"),
+        "STR_NE"  : ("ne", "STR",  lambda a, b: a != b, "bool"),
+        "BOOL_EQ" : ("eq", "bool", lambda a, b: a == b, "bool"),
+        "BOOL_NE" : ("ne", "bool", lambda a, b: a != b, "bool"),
+        "BOOL_OR" : ("or", "bool", lambda a, b: a or b, "bool"),
+        "BOOL_AND": ("&",  "bool", lambda a, b: a and b, "bool"),
+    }
@@ -0,0 +1,262 @@
+"""
+Description
+This module compiles the linearized control structures of the CSE machine into bytecode for the
+virtual machine in cse_machine/vm.py.
+
+Every control structure that is the body of a lambda (and control structure 0, the program) becomes
+a Code object: a tuple of integer opcodes and a parallel tuple of operands, in execution order. The
+δ structures of a conditional are compiled inline behind JUMP_IF_FALSE/JUMP instead of being pushed
+onto a control stack by rule 8. The fused elements of the linearizer (superinstructions) are
+expanded back into their instructions.
+
+Usage
+>>> compiler = BytecodeCompiler()
+>>> codes = compiler.compile(control_structures, uncurried)
+>>> print(codes[0].disassemble())
+"""
+
+import time
+
+from cse_machine.runtime import format_value
+from cse_machine.utils import literal_value
+
+# Opcodes
+LOAD_CONST = 0          # push the value of a literal (INT, STR, bool, nil, dummy, Y*)
+LOAD_NAME = 1           # push the value of a variable
+MAKE_CLOSURE = 2        # push a closure for the lambda element
+BUILD_TUPLE = 3         # pop n values and push them as a tuple
+APPLY = 4               # apply the value on top of the stack (gamma)
+BINARY = 5              # apply a binary operator
+UNARY = 6               # apply a unary operator or inbuilt function
+CONC = 7                # apply Conc to the two values on top of the stack
+JUMP_IF_FALSE = 8       # pop a truth value and jump when it is false
+JUMP = 9                # jump unconditionally
+MAKE_REC_CLOSURE = 10   # push the closure of a recursive definition (rec_lambda)
+
+OPNAMES = ["LOAD_CONST", "LOAD_NAME", "MAKE_CLOSURE", "BUILD_TUPLE", "APPLY", "BINARY", "UNARY",
+           "CONC", "JUMP_IF_FALSE", "JUMP", "MAKE_REC_CLOSURE"]
+
+# Operators of the control structures that are compiled to BINARY
+BINARY_OPERATORS = {"+", "-", "/", "*", "**", "eq", "ne", "gr", "ge", "le", "ls",
+                    ">", "<", ">=", "<=", "or", "&", "aug"}
+
+# Operators and inbuilt functions of the control structures that are compiled to UNARY
+UNARY_OPERATORS = {"neg", "not", "Print", "Isstring", "Isinteger", "Istruthvalue", "Isfunction",
+                   "Null", "Istuple", "Order", "Stern", "Stem", "ItoS"}
+
+# Inbuilt functions consume the gamma that applies them
+INBUILT_FUNCTIONS = UNARY_OPERATORS - {"neg", "not"}
+
+
+class Code:
+    """
+    The bytecode of one control structure.
+
+    Attributes:
+        index (int): Index of the control structure the code was compiled from.
+        ops (tuple): The opcodes, in execution order.
+        args (tuple): The operand of each opcode.
+    """
+
+    def __init__(self, index, ops, args):
+        self.index = index
+        self.ops = ops
+        self.args = args
+
+    def disassemble(self):
+        """
+        Render the code as text, one instruction per line.
+
+        Returns:
+            str: The disassembly.
+        """
+        lines = [f"code δ_{self.index}:"]
+        for pc, (op, arg) in enumerate(zip(self.ops, self.args)):
+            if op == LOAD_CONST:
+                operand = format_value(arg)
+            elif op == MAKE_CLOSURE:
+                operand = f"λ_{arg.control_structure}{arg.bounded_variable}"
+            elif op == MAKE_REC_CLOSURE:
+                operand = f"rec λ_{arg.operands[0].control_structure}{arg.operands[0].bounded_variable}"
+            elif op == APPLY:
+                operand = "" if arg == (None, None) else f"spine={arg[0]} arity={arg[1]}"
+            else:
+                operand = arg
+            lines.append(f"  {pc:>4}  {OPNAMES[op]:<14}{'' if operand is None else operand}")
+        return "\n".join(lines)
+
+
+class CodeCache(dict):
+    """
+    Maps control structure indexes to their Code, compiling each one the first time it is needed.
+
+    Attributes:
+        compiler (BytecodeCompiler): The compiler.
+        control_structures (list[ControlStructure]): The output of the linearizer.
+        stats (MachineStatistics): Statistics that record the compile time, or None.
+    """
+
+    def __init__(self, compiler, control_structures, stats=None):
+        super().__init__()
+        self.compiler = compiler
+        self.control_structures = control_structures
+        self.stats = stats
+
+    def __missing__(self, k):
+        return self.compile(k)
+
+    def compile(self, k):
+        """
+        Return the Code of control structure k, compiling it unless it already is: the first time
+        it runs, or ahead of that (a hot body, see CSEMachine._tier_up).
+        """
+        code = self.get(k)
+        if code is None:
+            start = time.perf_counter()
+            code = self[k] = self.compiler.compile_structure(self.control_structures, k)
+            if self.stats:
+                self.stats.record_compile(k, time.perf_counter() - start)
+        return code
+
+
+class BytecodeCompiler:
+    """
+    Compiles linearized control structures into Code objects.
+    """
+
+    def compile(self, control_structures, uncurried):
+        """
+        Compile the program and the body of every lambda.
+
+        Args:
+            control_structures (list[ControlStructure]): The output of the linearizer.
+            uncurried (dict): The uncurried lambdas found by the linearizer.
+
+        Returns:
+            dict: Maps the control structure index to its Code.
+        """
+        self.control_structures = control_structures
+        bodies = {0}
+        for structure in control_structures:
+            for element in structure.elements:
+                if element.type == "lambda":
+                    bodies.add(element.control_structure)
+                elif element.type == "rec_lambda":
+                    bodies.add(element.operands[1].control_structure)
+        for params, k in uncurried.values():
+            bodies.add(k)
+
+        codes = dict()
+        for k in sorted(bodies):
+            codes[k] = self.compile_structure(control_structures, k)
+        return codes
+
+    def compile_structure(self, control_structures, k):
+        """
+        Compile a single control structure.
+
+        Args:
+            control_structures (list[ControlStructure]): The output of the linearizer.
+            k (int): The index of the control structure.
+
+        Returns:
+            Code: The compiled control structure.
+        """
+        self.control_structures = control_structures
+        ops, args = [], []
+        self._compile_structure(k, ops, args)
+        return Code(k, tuple(ops), tuple(args))
+
+    def _compile_structure(self, k, ops, args):
+        """
+        Append the instructions of control structure k in execution order (right to left).
+        """
+        elements = self.control_structures[k].elements
+        i = len(elements) - 1
+        while i >= 0:
+            element = elements[i]
+            kind = element.type
+
+            if kind in ("INT", "STR", "bool", "nil", "dummy", "Y*", "ID"):
+                self._compile_leaf(element, ops, args)
+            elif kind == "fused_binop":
+                left, right = element.operands
+                self._compile_leaf(right, ops, args)
+                self._compile_leaf(left, ops, args)
+                ops.append(BINARY)
+                args.append(element.value)
+            elif kind == "fused_inbuilt":
+                for operand in element.operands:
+                    self._compile_leaf(operand, ops, args)
+                ops.append(UNARY)
+                args.append(element.value)
+            elif kind == "fused_beta":
+                self._compile_conditional(*element.operands, ops, args)
+            elif kind == "lambda":
+                ops.append(MAKE_CLOSURE)
+                args.append(element)
+            elif kind == "rec_lambda":
+                ops.append(MAKE_REC_CLOSURE)
+                args.append(element)
+            elif kind == "tau":
+                ops.append(BUILD_TUPLE)
+                args.append(element.value)
+            elif kind == "gamma":
+                ops.append(APPLY)
+                args.append((element.spine, element.arity))
+            elif kind == "beta":
+                # elements[i-1] and elements[i-2] are the δ of the else and then branches
+                self._compile_conditional(elements[i - 2], elements[i - 1], ops, args)
+                i -= 2
+            elif kind == "Conc":
+                # Conc consumes the gammas that apply it, like CSE rule 6 does
+                gammas = self._count_gammas(elements, i)
+                ops.append(CONC)
+                args.append(gammas)
+                i -= gammas
+            elif element.value in BINARY_OPERATORS:
+                ops.append(BINARY)
+                args.append(element.value)
+            elif element.value in UNARY_OPERATORS:
+                ops.append(UNARY)
+                args.append(element.value)
+                if element.value in INBUILT_FUNCTIONS and self._count_gammas(elements, i):
+                    i -= 1
+            else:
+                raise ValueError(f"Cannot compile control structure element: {element.value}")
+            i -= 1
+
+    def _compile_leaf(self, element, ops, args):
+        """
+        Append the instruction that pushes a leaf element (a variable or a literal).
+        """
+        if element.type == "ID":
+            ops.append(LOAD_NAME)
+            args.append(element.value)
+        else:
+            ops.append(LOAD_CONST)
+            args.append(literal_value(element))
+
+    def _compile_conditional(self, then_delta, else_delta, ops, args):
+        """
+        Append the jumps and the inlined arms of a conditional.
+        """
+        ops.append(JUMP_IF_FALSE)
+        args.append(None)
+        jump_if_false = len(ops) - 1
+        self._compile_structure(then_delta.control_structure, ops, args)
+        ops.append(JUMP)
+        args.append(None)
+        jump = len(ops) - 1
+        args[jump_if_false] = len(ops)
+        self._compile_structure(else_delta.control_structure, ops, args)
+        args[jump] = len(ops)
+
+    def _count_gammas(self, elements, i):
+        """
+        Count the gammas (at most two) executed right after elements[i].
+        """
+        count = 0
+        while count < 2 and i - count - 1 >= 0 and elements[i - count - 1].type == "gamma":
+            count += 1
+        return count
@@ -0,0 +1,638 @@
+"""
+Closure-Compiling Engine for Executing RPAL Programs.
+
+Description:
+This file contains the ClosureMachine class, an alternative execution engine to the CSEMachine. The
+Standardized Tree (ST) is compiled once into nested Python closures, one specialized closure per
+node (literal, variable, apply, lambda, conditional, tau, operators), and running the program is a
+call of the closure of the root. There is no control stack and no rule dispatch at run time.
+
+Variables are resolved when compiling: an environment is a list [parent, value1, value2, ...] and
+every variable becomes a (hops, slot) address into the chain. Values are the native values of
+cse_machine/runtime.py.
+
+The closures evaluate in the order of the CSE machine: the rand of an application before the
+rator, the right operand of an operator before the left one and the components of a tuple from
+last to first, so Print output comes out in the same order.
+
+Every RPAL call nests Python calls, so the Python recursion limit is raised while the program
+runs to allow max_call_depth live calls (see cse_machine/limits.py). Inbuilt functions are not
+values: Print, Conc, ... fail when they are not applied, as on the CSE machine.
+
+Example Usage:
+   machine = ClosureMachine()
+   machine.execute(st_tree)
+   print(machine._generate_output())
+"""
+
+import operator
+import sys
+
+from cse_machine.binop import apply_binary_operations
+from cse_machine.error_handler import CseErrorHandler
+from cse_machine.limits import (DEFAULT_MAX_CALL_DEPTH, DEFAULT_MAX_DIGITS, DEFAULT_MAX_FRAMES, call_depth_error,
+                                frame_limit, frame_limit_error, python_recursion_limit, recursion_limit_error)
+from cse_machine.runtime import (DUMMY, Y_STAR, Closure, Eta, YStar, ConcPartial, Tuple, UNARY_OPERATIONS,
+                                 apply_aug, concat, is_string)
+from cse_machine.stats import MachineStatistics
+from cse_machine.stlinearizer import Linearizer
+from cse_machine.utils import BINDABLE_TYPES, raw
+
+# Operators with an integer fast path
+INTEGER_OPERATORS = {
+    "+"  : operator.add,
+    "-"  : operator.sub,
+    "*"  : operator.mul,
+    "/"  : operator.floordiv,
+    "gr" : operator.gt,
+    "ge" : operator.ge,
+    "ls" : operator.lt,
+    "le" : operator.le,
+}
+
+# Operators that are left to cse_machine/binop.py (** checks its exponent)
+OTHER_BINARY_OPERATORS = {"eq", "ne", "or", "&", "**"}
+
+
+class Frame(list):
+    """
+    An environment that can be tracked by weak reference, used when statistics are collected.
+    """
+
+
+class ClosureCompiler:
+    """
+    Compiles a Standardized Tree into nested Python closures.
+
+    Every compiled node is a function of the environment it runs in.
+
+    Attributes:
+        machine (ClosureMachine): The engine the compiled program runs on.
+        frames (int): The number of environments created so far.
+        max_frames (float): The limit on frames (math.inf for no limit).
+        depth (int): The number of live calls.
+        max_call_depth (int): The limit on depth.
+        listing (list[str]): A description of the compiled nodes, for the CSE table option.
+    """
+
+    def __init__(self, machine):
+        self.machine = machine
+        self._linearizer = Linearizer()  # decodes the tokens of the tree
+        self._next_index = 1
+        self.frames = 0
+        self.max_frames = frame_limit(DEFAULT_MAX_FRAMES)
+        self.depth = 0
+        self.max_call_depth = DEFAULT_MAX_CALL_DEPTH
+        self.listing = list()
+
+    def compile(self, st_tree):
+        """
+        Compile the Standardized Tree.
+
+        Args:
+            st_tree (Node): The root of the Standardized Tree.
+
+        Returns:
+            function: The compiled program, a function of the environment.
+        """
+        self._next_index = 1
+        self.listing = list()
+        return self._compile(st_tree, [], 0)
+
+    def call(self, rator, rand):
+        """
+        Apply a value to an argument (CSE rules 4, 10, 11, 12 and 13).
+        """
+        kind = type(rator)
+        if kind is Closure:
+            params = rator.params
+            if len(params) == 1:
+                if type(rand) not in BINDABLE_TYPES:
+                    return self.machine._error_handler.handle_error("CSE : Invalid type")
+                env = [rator.env, rand]
+            elif type(rand) is Tuple and rand.length == len(params):
+                # the components of a tuple are bound as they are (CSErule11)
+                env = [rator.env, *rand]
+            else:
+                return self.machine._error_handler.handle_error("CSE : Invalid number of arguments")
+            # inlined in _compile_let
+            if self.frames >= self.max_frames:
+                return self.machine._error_handler.handle_error(frame_limit_error(self.max_frames))
+            if self.depth >= self.max_call_depth:
+                return self.machine._error_handler.handle_error(call_depth_error(self.max_call_depth))
+            self.frames += 1
+            if self.machine.stats:
+                env = Frame(env)
+                self.machine.stats.track_environment(env)
+            self.depth += 1
+            value = rator.body(env)
+            self.depth -= 1
+            return value
+        if kind is Tuple:
+            if type(rand) is not int or not 0 < rand <= rator.length:
+                return self.machine._error_handler.handle_error("CSE : Invalid index")
+            return rator.items[rand - 1]
+        if kind is Eta:
+            # rule 13: apply the lambda of the eta to the eta, then apply the result
+            return self.call(self.unfold(rator), rand)
+        if kind is ConcPartial:
+            if not is_string(rand):
+                return self.machine._error_handler.handle_error("CSE : Invalid type for concatenation")
+            return concat(rator.value, rand)
+        if kind is YStar:
+            if type(rand) is not Closure:
+                return self.machine._error_handler.handle_error("CSE : expected lambda")
+            return Eta(rand.body, rand.env, rand.params, rand.index, rand.uncurried)
+        return self.machine._error_handler.handle_error("CSE : Invalid control structure")
+
+    def unfold(self, eta):
+        """
+        Apply the lambda of an eta to the eta itself (CSE rule 13).
+        """
+        return self.call(Closure(eta.body, eta.env, eta.params, eta.index, eta.uncurried), eta)
+
+    ################################################################################################
+    # node compilers
+    ################################################################################################
+
+    def _compile(self, node, scopes, depth):
+        """
+        Compile a node in the given scopes (the bound variables of the enclosing lambdas,
+        innermost last).
+        """
+        if not node.children:
+            compiled = self._compile_leaf(node, scopes, depth)
+        elif node.data == "lambda":
+            compiled = self._compile_lambda(node, scopes, depth)
+        elif node.data == "gamma":
+            compiled = self._compile_gamma(node, scopes, depth)
+        elif node.data == "->":
+            compiled = self._compile_conditional(node, scopes, depth)
+        elif node.data == "tau":
+            compiled = self._compile_tau(node, scopes, depth)
+        elif len(node.children) == 1:
+            compiled = self._compile_unary(node, scopes, depth)
+        else:
+            compiled = self._compile_binary(node, scopes, depth)
+
+        if self.machine.stats:
+            compiled = self._counted(node.data if node.children else "leaf", compiled)
+        return compiled
+
+    def _compile_leaf(self, node, scopes, depth):
+        kind, value = self._linearizer.filter(node.data)
+        if kind == "ID":
+            return self._compile_variable(value, scopes, depth)
+        if kind in UNARY_OPERATIONS or kind == "Conc":
+            self._list(depth, f"inbuilt {kind}")
+            return self._inbuilt(kind)
+        if kind == "Y*":
+            constant = Y_STAR
+        elif kind == "dummy":
+            constant = DUMMY
+        elif kind in ("INT", "STR", "bool", "nil"):
+            constant = value
+        else:
+            return self.machine._error_handler.handle_error(f"CSE : Invalid token {node.data}")
+        self._list(depth, f"const {value}")
+        return lambda env: constant
+
+    def _compile_variable(self, name, scopes, depth):
+        error = self.machine._error_handler.handle_error
+        for hops, scope in enumerate(reversed(scopes)):
+            if name in scope:
+                # the last binding of a repeated name wins, as in Environment.add_var
+                slot = len(scope) - scope[::-1].index(name)
+                break
+        else:
+            self._list(depth, f"name {name} (unbound)")
+
+            def unbound(env):
+                return error(f"CSE : Variable [{name}] not found in the environment")
+            return unbound
+
+        self._list(depth, f"name {name} @ ({hops}, {slot})")
+        if hops == 0:
+            return lambda env: env[slot]
+        if hops == 1:
+            return lambda env: env[0][slot]
+        if hops == 2:
+            return lambda env: env[0][0][slot]
+
+        def lookup(env):
+            for i in range(hops):
+                env = env[0]
+            return env[slot]
+        return lookup
+
+    def _compile_lambda(self, node, scopes, depth):
+        params, index, body = self._compile_body(node, scopes, depth)
+        uncurried = self._compile_uncurried(node, scopes)
+        return lambda env: Closure(body, env, params, index, uncurried)
+
+    def _compile_uncurried(self, node, scopes):
+        """
+        Compile the body E of a curried lambda (lambda a. lambda b. ... E) a second time, with all
+        the parameters bound in one environment, for saturated calls (see CSErule4_uncurried).
+
+        Returns:
+            tuple: The number of parameters and the compiled E, or None if the lambda is not curried.
+        """
+        params = []
+        while node.data == "lambda" and node.children[0].data != ",":
+            params.append(self._linearizer.filter(node.children[0].data)[1])
+            node = node.children[1]
+        if len(params) < 2:
+            return None
+        # the lambdas were numbered and listed by the first compilation
+        next_index, listing = self._next_index, self.listing
+        self.listing = list()
+        body = self._compile(node, scopes + [params], 0)
+        self._next_index, self.listing = next_index, listing
+        return len(params), body
+
+    def _compile_body(self, node, scopes, depth):
+        """
+        Compile the body of a lambda node.
+
+        Returns:
+            tuple: The bound variables, the control structure index of the body and the body.
+        """
+        binder = node.children[0]
+        if binder.data == ",":
+            params = [self._linearizer.filter(child.data)[1] for child in binder.children]
+        else:
+            params = [self._linearizer.filter(binder.data)[1]]
+        index = self._next_index
+        self._next_index += 1
+        self._list(depth, f"lambda {index}{params}")
+        body = self._compile(node.children[1], scopes + [params], depth + 1)
+        return params, index, body
+
+    def _compile_gamma(self, node, scopes, depth):
+        rator, rand = node.children
+        call = self.call
+        error = self.machine._error_handler.handle_error
+        machine = self.machine
+
+        if not rator.children:
+            kind = self._linearizer.filter(rator.data)[0]
+            if kind in UNARY_OPERATIONS:
+                # an inbuilt function applied to its argument
+                self._list(depth, f"apply {kind}")
+                operation = UNARY_OPERATIONS[kind]
+                argument = self._compile(rand, scopes, depth + 1)
+                return lambda env: operation(machine, argument(env))
+            if kind == "Y*":
+                self._list(depth, "apply Y*")
+                argument = self._compile(rand, scopes, depth + 1)
+
+                def fixed_point(env):
+                    lambda_ = argument(env)
+                    if type(lambda_) is not Closure:
+                        return error("CSE : expected lambda")
+                    return Eta(lambda_.body, lambda_.env, lambda_.params, lambda_.index, lambda_.uncurried)
+                return fixed_point
+            if kind == "Conc":
+                # Conc applied to one argument (see CSErule6)
+                self._list(depth, "apply Conc partially")
+                argument = self._compile(rand, scopes, depth + 1)
+
+                def conc_partial(env):
+                    value = argument(env)
+                    if not is_string(value):
+                        return error("CSE : Invalid type for concatenation")
+                    return ConcPartial(value)
+                return conc_partial
+
+        elif rator.data == "gamma" and not rator.children[0].children \
+                and self._linearizer.filter(rator.children[0].data)[0] == "Conc":
+            # Conc applied to both of its arguments
+            self._list(depth, "apply Conc")
+            left = self._compile(rator.children[1], scopes, depth + 1)
+            right = self._compile(rand, scopes, depth + 1)
+
+            def conc(env):
+                b = right(env)
+                a = left(env)
+                if is_string(a) and is_string(b):
+                    return concat(a, b)
+                return error("CSE : Invalid type for concatenation")
+            return conc
+
+        elif rator.data == "lambda":
+            return self._compile_let(rator, rand, scopes, depth)
+
+        elif rator.data == "gamma" and not self._inbuilt_spine(rator):
+            return self._compile_spine(node, scopes, depth)
+
+        self._list(depth, "apply")
+        function = self._compile(rator, scopes, depth + 1)
+
+        if rand.data == "tau" and len(rand.children) > 1:
+            # a tuple argument is bound directly when the function has as many parameters
+            components = [self._compile(child, scopes, depth + 1) for child in rand.children][::-1]
+            n = len(components)
+
+            def apply_tuple(env):
+                values = [component(env) for component in components]
+                values.reverse()
+                rator = function(env)
+                if type(rator) is Closure and len(rator.params) == n and not machine.stats \
+                        and self.frames < self.max_frames and self.depth < self.max_call_depth:
+                    self.frames += 1
+                    values.insert(0, rator.env)
+                    self.depth += 1
+                    value = rator.body(values)
+                    self.depth -= 1
+                    return value
+                return call(rator, Tuple(values))
+            return apply_tuple
+
+        argument = self._compile(rand, scopes, depth + 1)
+
+        def apply(env):
+            rand = argument(env)
+            return call(function(env), rand)
+        return apply
+
+    def _compile_spine(self, node, scopes, depth):
+        """
+        Compile an application spine (f a b c). When f turns out to be a curried lambda with no
+        more parameters than there are arguments, they are bound in a single environment.
+        """
+        error = self.machine._error_handler.handle_error
+        machine = self.machine
+        call = self.call
+        unfold = self.unfold
+
+        nodes = []
+        while node.data == "gamma":
+            nodes.append(node.children[1])
+            node = node.children[0]
+        self._list(depth, f"apply {len(nodes)}")
+        function = self._compile(node, scopes, depth + 1)
+        # nodes holds the arguments from last to first, which is the evaluation order
+        arguments = [self._compile(rand, scopes, depth + 1) for rand in reversed(nodes)][::-1]
+        n = len(arguments)
+
+        def apply_spine(env):
+            values = [argument(env) for argument in arguments]
+            values.reverse()
+            rator = function(env)
+            if type(rator) is Eta:
+                rator = unfold(rator)
+            i = 0
+            if type(rator) is Closure and rator.uncurried and rator.uncurried[0] <= n:
+                m, body = rator.uncurried
+                if not BINDABLE_TYPES.issuperset(map(type, values[:m])):
+                    return error("CSE : Invalid type")
+                if self.frames >= self.max_frames:
+                    return error(frame_limit_error(self.max_frames))
+                if self.depth >= self.max_call_depth:
+                    return error(call_depth_error(self.max_call_depth))
+                self.frames += 1
+                env = [rator.env, *values[:m]]
+                if machine.stats:
+                    env = Frame(env)
+                    machine.stats.track_environment(env)
+                self.depth += 1
+                rator = body(env)
+                self.depth -= 1
+                i = m
+            while i < n:
+                rator = call(rator, values[i])
+                i += 1
+            return rator
+        return apply_spine
+
+    def _compile_let(self, lambda_, rand, scopes, depth):
+        """
+        Compile a lambda applied on the spot (let and where): the environment is made without
+        making the closure.
+        """
+        error = self.machine._error_handler.handle_error
+        machine = self.machine
+        self._list(depth, "let")
+        params, index, body = self._compile_body(lambda_, scopes, depth + 1)
+        argument = self._compile(rand, scopes, depth + 1)
+        n = len(params)
+
+        def let(env):
+            value = argument(env)
+            if n == 1:
+                if type(value) not in BINDABLE_TYPES:
+                    return error("CSE : Invalid type")
+                env = [env, value]
+            elif type(value) is Tuple and value.length == n:
+                env = [env, *value]
+            else:
+                return error("CSE : Invalid number of arguments")
+            if self.frames >= self.max_frames:
+                return error(frame_limit_error(self.max_frames))
+            if self.depth >= self.max_call_depth:
+                return error(call_depth_error(self.max_call_depth))
+            self.frames += 1
+            if machine.stats:
+                env = Frame(env)
+                machine.stats.track_environment(env)
+            self.depth += 1
+            value = body(env)
+            self.depth -= 1
+            return value
+        return let
+
+    def _compile_conditional(self, node, scopes, depth):
+        error = self.machine._error_handler.handle_error
+        self._list(depth, "->")
+        # numbered like the linearizer: the then branch, the else branch, then the condition
+        self._next_index += 1
+        then = self._compile(node.children[1], scopes, depth + 1)
+        self._next_index += 1
+        else_ = self._compile(node.children[2], scopes, depth + 1)
+        condition = self._compile(node.children[0], scopes, depth + 1)
+
+        def conditional(env):
+            value = condition(env)
+            if value is True:
+                return then(env)
+            if value is False:
+                return else_(env)
+            # the CSE machine compares with == (CSErule8)
+            if value == True:
+                return then(env)
+            if value == False:
+                return else_(env)
+            return error("CSE : Invalid type for condition")
+        return conditional
+
+    def _compile_tau(self, node, scopes, depth):
+        self._list(depth, f"tau {len(node.children)}")
+        components = [self._compile(child, scopes, depth + 1) for child in node.children][::-1]
+        if len(components) == 2:
+            second, first = components
+
+            def pair(env):
+                b = second(env)
+                return Tuple([first(env), b])
+            return pair
+
+        def tau(env):
+            values = [component(env) for component in components]
+            values.reverse()
+            return Tuple(values)
+        return tau
+
+    def _compile_unary(self, node, scopes, depth):
+        op = node.data
+        if op not in UNARY_OPERATIONS:
+            return self.machine._error_handler.handle_error(f"CSE : Invalid unary operation {op}")
+        self._list(depth, op)
+        machine = self.machine
+        operation = UNARY_OPERATIONS[op]
+        operand = self._compile(node.children[0], scopes, depth + 1)
+        return lambda env: operation(machine, operand(env))
+
+    def _compile_binary(self, node, scopes, depth):
+        op = node.data
+        machine = self.machine
+        self._list(depth, op)
+        left = self._compile(node.children[0], scopes, depth + 1)
+        right = self._compile(node.children[1], scopes, depth + 1)
+
+        if op in INTEGER_OPERATORS:
+            function = INTEGER_OPERATORS[op]
+
+            def integer_operation(env):
+                b = right(env)
+                a = left(env)
+                if type(a) is int and type(b) is int:
+                    return function(a, b)
+                return apply_binary_operations(machine, a, b, op)
+            return integer_operation
+
+        if op == "aug":
+            def aug(env):
+                b = right(env)
+                return apply_aug(machine, left(env), b)
+            return aug
+
+        if op in OTHER_BINARY_OPERATORS:
+            def binary_operation(env):
+                b = right(env)
+                return apply_binary_operations(machine, left(env), b, op)
+            return binary_operation
+
+        return machine._error_handler.handle_error(f"CSE : Invalid binary operation {op}")
+
+    ################################################################################################
+    # helper functions
+    ################################################################################################
+
+    def _inbuilt(self, name):
+        """
+        Compile an inbuilt function that is not applied. The CSE machine has no such values: the
+        inbuilt function takes what is on the stack as its operand and fails, with an error that
+        depends on what it took. It fails here with the one given when it is passed to a function.
+        """
+        error = self.machine._error_handler.handle_error
+        return lambda env: error("CSE : Invalid control structure")
+
+    def _inbuilt_spine(self, node):
+        """
+        Return whether an application spine starts with an inbuilt function, which is applied to
+        its first argument and not called like a lambda.
+        """
+        while node.data == "gamma":
+            node = node.children[0]
+        if node.children:
+            return False
+        kind = self._linearizer.filter(node.data)[0]
+        return kind in UNARY_OPERATIONS or kind == "Conc"
+
+    def _counted(self, kind, compiled):
+        """
+        Wrap a compiled node so that its evaluations are counted in the statistics.
+        """
+        count_rule = self.machine.stats.count_rule
+
+        def counted(env):
+            count_rule(kind)
+            return compiled(env)
+        return counted
+
+    def _list(self, depth, text):
+        self.listing.append("  " * depth + text)
+
+
+class ClosureMachine:
+    """
+    Closure-compiling engine for executing RPAL programs.
+
+    Attributes:
+        _error_handler (CseErrorHandler): Error handler instance for managing errors during execution.
+        _compiler (ClosureCompiler): The compiler of the Standardized Tree.
+        program (function): The compiled program.
+        _print_queue (list): List to store the print data as queue generated during execution.
+        trace (bool): Whether the compiled nodes are printed when an error occurs.
+        stats (MachineStatistics): Run statistics, or None when statistics are not collected.
+        max_digits (int): The limit on the digits of an integer converted to text.
+    """
+
+    def __init__(self, trace=False, flat_closures=True, collect_stats=False, max_call_depth=DEFAULT_MAX_CALL_DEPTH,
+                 max_frames=DEFAULT_MAX_FRAMES, max_digits=DEFAULT_MAX_DIGITS):
+        """
+        Initialize the ClosureMachine.
+
+        Args:
+            trace (bool): Print the compiled nodes when an error occurs.
+            flat_closures (bool): Unused; environments are always addressed lexically.
+            collect_stats (bool): Collect run statistics (node counts instead of rule counts).
+            max_call_depth (int): The largest number of live calls (see cse_machine/limits.py).
+            max_frames (int): The largest number of environments created by calls, or None.
+            max_digits (int): The largest number of digits of an integer printed or converted
+                by ItoS.
+        """
+        self._error_handler = CseErrorHandler(self)
+        self._compiler = ClosureCompiler(self)
+        self._compiler.max_frames = frame_limit(max_frames)
+        self._compiler.max_call_depth = max_call_depth
+        self.program = None
+        self._print_queue = list()
+        self.trace = trace
+        self.stats = MachineStatistics() if collect_stats else None
+        self.max_digits = max_digits
+
+    def execute(self, st_tree):
+        """
+        Compile and execute the given Standardized Tree (ST).
+
+        Args:
+            st_tree (Node): The root node of the Standardized Tree (ST) to execute.
+        """
+        self.program = self._compiler.compile(st_tree)
+        self._compiler.depth = 0
+        limit = sys.getrecursionlimit()
+        recursion_limit = python_recursion_limit(self._compiler.max_call_depth)
+        sys.setrecursionlimit(recursion_limit)
+        try:
+            self.program([None])
+        except RecursionError:
+            self._error_handler.handle_error(recursion_limit_error(recursion_limit))
+        finally:
+            sys.setrecursionlimit(limit)
+
+    ##############################################################################################################
+    # helper functions
+    ##############################################################################################################
+
+    def _print_cse_table(self):
+        print()
+        print("Compiled Nodes", end="\n\n")
+        print("\n".join(self._compiler.listing), end="\n\n")
+
+    def _generate_output(self):
+        return "".join(self._print_queue)+"\n"
+
+    def _generate_raw_output(self):
+        return raw(self._generate_output())
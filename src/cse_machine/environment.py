@@ -1,10 +1,20 @@
 """Environment class for managing variable scopes and hierarchies in a CSE machine.
 """
 
-from collections import defaultdict
+from types import MappingProxyType
+
+# Layout id of the primitive environment, the same in every layout table
+PRIMITIVE_LAYOUT = 0
 
 class Environment:
-    index = -1
+    """
+    A frame of variable bindings, from names to values (see cse_machine/runtime.py).
+
+    Environments are numbered by the machine that creates them; the primitive environment is
+    number 0 and is shared, read-only, by every machine (see PRIMITIVE_ENVIRONMENT).
+    """
+
+    __slots__ = ("index", "_environment", "parent", "shape", "__weakref__")
 
     # List of initial variables
     INITIAL_VARIABLES = [
@@ -13,39 +23,81 @@ class Environment:
                             "Stem", "ItoS", "neg", "not", "Conc"
                          ]
 
-    def __init__(self, parent=None):
+    def __init__(self, index, parent=None):
         """
         Initialize a new environment.
 
         Args:
+            index (int): The number of the environment.
             parent (Environment, optional): The parent environment. Defaults to None.
         """
-        Environment.index += 1
-        self.index = Environment.index
-        self._environment = defaultdict(lambda: [None, None])  # name: [type, value]
+        self.index = index
+        self._environment = {}  # name: value
         self.parent = parent
+        self.shape = None  # layout id, see layout()
 
-        # Initialize initial variables if this is the root environment
-        if self.index == 0:
-            self._initialize_initial_vars()
+    def __reduce__(self):
+        # an environment sent to another process (see cse_machine/parallel.py) is rebuilt there
+        # without its layout id, which is only meaningful in the run that made it, and the
+        # primitive environment stays the one of the process
+        if self is PRIMITIVE_ENVIRONMENT:
+            return "PRIMITIVE_ENVIRONMENT"
+        return Environment, (self.index,), (None, {"_environment": self._environment, "parent": self.parent})
 
-    def _initialize_initial_vars(self):
+    def add_var(self, name, value):
         """
-        Initialize initial variables.
+        Add a variable to the environment.
+
+        Args:
+            name (str): The name of the variable.
+            value (any): The value of the variable.
         """
-        initial_vars = {var: ["inbuilt-functions",None] for var in self.INITIAL_VARIABLES}
-        self._environment.update(initial_vars)
+        self._environment[name] = value
+        self.shape = None
 
-    def add_var(self, name, type, value):
+    def layout(self, layouts):
         """
-        Add a variable to the environment.
+        Return the layout id of the environment. Two environments have the same layout id when
+        their frames bind the same names, in the same order, all the way up the parent chain, so
+        a variable is found the same number of parent hops away in both.
+
+        Args:
+            layouts (dict): The layout ids of the machine that made the environment, by (names
+                bound in a frame, layout id of its parent frame). Each run has its own table, so
+                that machines running at once do not share one and it does not outgrow the run.
+
+        Returns:
+            int: The layout id.
+        """
+        if self.shape is None:
+            frames = []
+            env = self
+            while env and env.shape is None:
+                frames.append(env)
+                env = env.parent
+            shape = env.shape if env else -1
+            for env in reversed(frames):
+                key = (tuple(env._environment), shape)
+                shape = env.shape = layouts.setdefault(key, len(layouts) + 1)
+        return self.shape
+
+    def lookup(self, name, default=None):
+        """
+        Find a variable in this environment or one of its ancestors.
 
         Args:
             name (str): The name of the variable.
-            type (str): The type of the variable.
-            value (any): The value of the variable.
+            default (any, optional): The result when the variable is not bound. Defaults to None.
+
+        Returns:
+            any: The value of the variable, or default if it is not bound.
         """
-        self._environment[name] = [type, value]
+        env = self
+        while env:
+            if name in env._environment:
+                return env._environment[name]
+            env = env.parent
+        return default
 
     def add_child(self, branch):
         """
@@ -67,8 +119,16 @@ class Environment:
         # Update the parent reference in the _environment dictionary
         self._environment['__parent__'] = parent._environment if parent else None
 
-    def reset_index(self):
-        """
-        Reset the index of the environment.
-        """
-        Environment.index = -1
\ No newline at end of file
+
+def _primitive_environment():
+    """
+    Build the primitive environment (e0), which binds the inbuilt functions. Its bindings are
+    read-only.
+    """
+    env = Environment(0)
+    env._environment = MappingProxyType({var: "inbuilt-functions" for var in Environment.INITIAL_VARIABLES})
+    env.shape = PRIMITIVE_LAYOUT
+    return env
+
+# The primitive environment, built once and shared by every run
+PRIMITIVE_ENVIRONMENT = _primitive_environment()
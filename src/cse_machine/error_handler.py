@@ -12,9 +12,11 @@ class CseErrorHandler:
     def handle_error(self,message):
         """
         This method raises an exception with the given message.
+        The CSE table is printed first when the machine records it.
 
         Args:
             message (str): The error message.
         """
-        self.cse_machine._print_cse_table()
+        if self.cse_machine.trace:
+            self.cse_machine._print_cse_table()
         raise Exception(message)
\ No newline at end of file
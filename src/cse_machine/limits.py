@@ -0,0 +1,85 @@
+"""
+Description
+This module defines the limits on the resources an RPAL program may use while it runs. They are
+shared by the execution engines:
+
+    call depth - the number of calls that are live at once (entered and not yet returned). The
+                 CSE machine and the virtual machine keep their calls on the heap, so the default
+                 allows millions of nested calls. The closure and python engines nest Python
+                 calls for every RPAL call; they raise the Python recursion limit to match (see
+                 python_recursion_limit), whose frames are on the heap, so they reach the same
+                 depths with more memory. They have no tail calls: every call counts.
+    frames     - the total number of environments created by calls during the run. Unlimited
+                 by default; set it to stop programs that loop forever.
+    digits     - the number of digits of an integer that Print or ItoS converts to text (see
+                 int_to_str in cse_machine/runtime.py). Integers are unbounded, so a program can
+                 compute one whose text would take a long time and a lot of memory to produce.
+
+Usage
+>>> machine = CSEMachine(max_call_depth=100000, max_frames=10000000, max_digits=100000)
+"""
+
+import math
+import sys
+
+# Default number of live calls
+DEFAULT_MAX_CALL_DEPTH = 5000000
+
+# Python frames allowed for every live call on the engines that nest Python calls: one for each
+# node on the way from the body of a lambda down to the call it makes
+PYTHON_FRAMES_PER_CALL = 10
+
+# Default number of environments created by calls (None: unlimited)
+DEFAULT_MAX_FRAMES = None
+
+# Default number of digits of an integer converted to text
+DEFAULT_MAX_DIGITS = 10000000
+
+
+def frame_limit(max_frames):
+    """
+    Return the frame limit as a number that can be compared with a counter.
+
+    Args:
+        max_frames (int): The limit, or None for no limit.
+
+    Returns:
+        float: The limit.
+    """
+    return math.inf if max_frames is None else max_frames
+
+
+def python_recursion_limit(max_call_depth):
+    """
+    Return the Python recursion limit that lets an engine nesting Python calls for RPAL calls
+    reach max_call_depth live calls.
+
+    Args:
+        max_call_depth (int): The limit on live calls.
+
+    Returns:
+        int: The recursion limit.
+    """
+    return sys.getrecursionlimit() + PYTHON_FRAMES_PER_CALL * max_call_depth
+
+
+def call_depth_error(max_call_depth):
+    """
+    Return the error message for a program that exceeds the call depth limit.
+    """
+    return f"CSE : Call depth limit exceeded (more than {max_call_depth} nested calls)"
+
+
+def frame_limit_error(max_frames):
+    """
+    Return the error message for a program that exceeds the frame limit.
+    """
+    return f"CSE : Frame limit exceeded (more than {max_frames} environments created)"
+
+
+def recursion_limit_error(recursion_limit):
+    """
+    Return the error message for a program that runs out of Python stack on an engine that nests
+    a Python call for every RPAL call.
+    """
+    return f"CSE : Call depth limit exceeded (Python recursion limit of {recursion_limit} reached)"
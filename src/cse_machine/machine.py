@@ -24,14 +24,65 @@ Example Usage:
 """
 
 
+import itertools
+import math
+from collections import Counter
+
 from cse_machine.error_handler import CseErrorHandler
-from cse_machine.environment import Environment
+from cse_machine.environment import Environment, PRIMITIVE_ENVIRONMENT
+from cse_machine.limits import (DEFAULT_MAX_CALL_DEPTH, DEFAULT_MAX_FRAMES, DEFAULT_MAX_DIGITS, frame_limit,
+                                 call_depth_error, frame_limit_error)
 from cse_machine.stack import Stack
-from cse_machine.stlinearizer import Linearizer
-from cse_machine.utils import add_table_data, print_cse_table , var_lookup , raw , add_table_data_decorator 
-from cse_machine.binop import apply_binary_operations
-from cse_machine.unop import apply_unary_operations
-from utils.control_structure_element import ControlStructureElement
+from cse_machine.stats import MachineStatistics
+from cse_machine.stlinearizer import Linearizer, SUPERINSTRUCTIONS
+from cse_machine.utils import add_table_data, print_cse_table , var_lookup , raw , add_table_data_decorator , bind_variable , capture_free_variables , recursive_closure , literal_value
+from cse_machine.binop import apply_binary_operations, apply_aug, SPECIALIZED_BINARY_OPERATIONS
+from cse_machine.unop import apply_unary_operations, SPECIALIZED_UNARY_OPERATIONS
+from cse_machine.vm import VirtualMachine
+from cse_machine.runtime import Closure, Eta, RecursiveClosure, YStar, ConcPartial, Tuple, is_string
+from cse_machine.memo import DEFAULT_MEMO_SIZE, MISSING, MemoTable
+from cse_machine.parallel import ParallelTuples
+from utils.control_structure_element import (ControlStructureElement, EnvironmentMarker, MemoMarker, TAG_COUNT,
+                                             TAG_LEAF, TAG_LAMBDA, TAG_ENV_MARKER, TAG_BINOP, TAG_UNOP, TAG_BETA,
+                                             TAG_TAU, TAG_GAMMA, TAG_REC_LAMBDA, TAG_FUSED_BINOP, TAG_FUSED_INBUILT,
+                                             TAG_FUSED_BETA, TAG_SPECIALIZED_BINOP, TAG_SPECIALIZED_UNOP, TAG_MEMO,
+                                             TAG_PAR_TAU)
+
+# Types of the values that are applied by CSE rules 4 and 11
+CLOSURE_TYPES = (Closure, RecursiveClosure)
+
+# The gamma pushed by CSE rule 13
+GAMMA = ControlStructureElement("gamma","gamma",tag=TAG_GAMMA)
+
+# The rule methods that handle each element tag (gamma is dispatched again by CSEMachine._apply)
+TAG_RULES = {
+    TAG_LEAF: "CSErule1",
+    TAG_LAMBDA: "CSErule2",
+    TAG_ENV_MARKER: "CSErule5",
+    TAG_BINOP: "CSErule6",
+    TAG_UNOP: "CSErule7",
+    TAG_BETA: "CSErule8",
+    TAG_TAU: "CSErule9",
+    TAG_GAMMA: "_apply",
+    TAG_REC_LAMBDA: "CSErule12_direct",
+    TAG_FUSED_BINOP: "CSErule6_fused",
+    TAG_FUSED_INBUILT: "CSErule7_fused",
+    TAG_FUSED_BETA: "CSErule8_fused",
+    TAG_SPECIALIZED_BINOP: "CSErule6_specialized",
+    TAG_SPECIALIZED_UNOP: "CSErule7_specialized",
+    TAG_MEMO: "CSErule5_memo",
+    TAG_PAR_TAU: "CSErule9_parallel",
+}
+
+# The rule methods that apply each type of value to its argument (a gamma on the control)
+APPLY_RULES = {
+    Tuple: "CSErule10",
+    YStar: "CSErule12",
+    Eta: "CSErule13",
+    Closure: "_apply_closure",
+    RecursiveClosure: "_apply_closure",
+    ConcPartial: "Concpartial",
+}
 
 class CSEMachine:
     """
@@ -42,66 +93,129 @@ class CSEMachine:
         control_structures (list): List of control structures extracted from the Standardized Tree (ST).
         environment_tree (Environment): Environment tree representing the current execution environment.
         current_enviroment (Environment): Reference to the current environment in the environment tree.
-        stack (Stack): Stack for managing the execution stack.
+        environment_ids (itertools.count): The numbers of the environments created by the machine.
+        stack (Stack): Stack for managing the execution stack: native values (see cse_machine/runtime.py) and environment markers.
         control (Stack): Stack for managing the control structures during execution.
+        environments (list): The environments of the environment markers on the stack, innermost last.
         _linearizer (Linearizer): Linearizer instance for converting the ST to linear form.
-        binary_operator (set): Set of binary operators supported by the RPAL language.
-        unary_operators (set): Set of unary operators supported by the RPAL language.
+        inbuilt_functions (set): The inbuilt functions, which consume the gamma that applies them.
         _print_queue (list): List to store the print data as queue generated during execution.
         table_data (list): List to store data for generating the execution table.
+        trace (bool): Whether the execution table is recorded (needed for the -ct switch).
+        flat_closures (bool): Whether closures capture only their free variables instead of the whole environment chain.
+        stats (MachineStatistics): Run statistics, or None when statistics are not collected.
+        tier_threshold (int): Number of calls after which a lambda body is compiled to bytecode, or None.
+        call_counts (Counter): Number of calls of each lambda body, by control structure index.
+        inline_caches (bool): Whether variable lookups use the inline caches of their ID elements.
+        call_depth (int): The number of live calls (environment markers on the control).
+        frames_created (int): The number of environments created by calls.
+        max_call_depth (int): The limit on call_depth.
+        max_frames (float): The limit on frames_created (math.inf for no limit).
+        max_digits (int): The limit on the digits of an integer converted to text.
+        memo_size (int): The size of the memo table, or None when calls are not memoized.
+        memo (MemoTable): The memoized results of the run, or None.
+        memo_store (MemoStore): The memo store the results are kept in across runs, or None.
+        parallel (int): The number of worker processes for the components of tuples, or None.
+        parallel_tuples (ParallelTuples): The worker processes of the run, or None.
     """
 
-    def __init__(self):
+    def __init__(self, trace=False, flat_closures=True, collect_stats=False, tier_threshold=None,
+                 superinstructions=SUPERINSTRUCTIONS, inline_caches=None, type_inference=True,
+                 direct_recursion=True, max_call_depth=DEFAULT_MAX_CALL_DEPTH, max_frames=DEFAULT_MAX_FRAMES,
+                 max_digits=DEFAULT_MAX_DIGITS, memo_size=None, memo_store=None,
+                 parallel=None):
         """
         Initialize the CSEMachine with necessary components.
+
+        Args:
+            trace (bool): Record the execution table for every rule applied.
+            flat_closures (bool): Build flat closures from the free variables of each lambda.
+            collect_stats (bool): Collect run statistics.
+            tier_threshold (int): Compile a lambda body to bytecode after this many calls and
+                run it on the virtual machine from then on. None disables tiering. Tiering is
+                off while the execution table is recorded.
+            superinstructions (tuple): The element patterns the linearizer fuses into single
+                elements (see cse_machine/stlinearizer.py). An empty tuple disables fusion.
+            inline_caches (bool): Cache the environment depth of the variable lookup of each ID
+                element (see var_lookup in cse_machine/utils.py). None enables the caches when
+                closures are not flat: flat closures keep lookups within a hop or two, where
+                checking the cache costs more than searching.
+            type_inference (bool): Let the linearizer emit specialized elements (INT_ADD,
+                INT_EQ, ...) for operations whose operand types are proven.
+            direct_recursion (bool): Build the closures of recursive definitions of lambdas
+                directly, instead of applying Y* and unfolding an eta on every call.
+            max_call_depth (int): The largest number of live calls (see cse_machine/limits.py).
+            max_frames (int): The largest number of environments created by calls, or None.
+            max_digits (int): The largest number of digits of an integer printed or converted
+                by ItoS.
+            memo_size (int): Memoize the calls of pure recursive functions, keeping this many
+                results (see cse_machine/memo.py). None disables memoization. Tiering is off
+                while calls are memoized.
+            memo_store (MemoStore): Keep the memoized results in this memo store as well, and
+                look calls up in it (see cse_machine/memo_store.py). Calls are memoized with a
+                table of DEFAULT_MEMO_SIZE results when memo_size is None.
+            parallel (int): Evaluate the components of the tuples that call functions and cannot
+                reach Print in this many worker processes (see cse_machine/parallel.py). None
+                evaluates them in turn. Parallel tuples and tiering are off while the execution
+                table is recorded, and tiering is off while tuples are parallel.
         """
         # Initialize the error handler
         self._error_handler = CseErrorHandler(self)
 
+        # Parallel evaluation of the components of tuples
+        self.parallel = None if trace else parallel
+        self.parallel_tuples = None
+
         # Initialize the linearizer for converting the ST to linear form
-        self._linearizer = Linearizer()
+        self._linearizer = Linearizer(superinstructions, type_inference, direct_recursion, bool(self.parallel))
 
-        # Initialize the primitive environment (e0) for the machine
-        self.primitive_environment = Environment()
+        # The primitive environment (e0) is shared; the environments of calls are numbered from 1
+        self.primitive_environment = PRIMITIVE_ENVIRONMENT
+        self.environment_ids = itertools.count(1)
 
-        # Initialize the control structures, environment, and stacks
+        # Initialize the program, control structures, environment, and stacks
+        self.program = None
         self.control_structures = None
+        self.uncurried = dict()
         self.current_enviroment = self.primitive_environment
         self.stack = Stack()
         self.control = Stack()
+        # the environments of the environment markers on the stack, innermost last
+        self.environments = list()
         
         # Initialize print queue and table data
         self._print_queue = list()
         self.table_data = list()
+        self.trace = trace
+
+        # Closure representation and run statistics
+        self.flat_closures = flat_closures
+        self.stats = MachineStatistics() if collect_stats else None
+        self.inline_caches = not flat_closures if inline_caches is None else inline_caches
+        # the inline caches of the variable lookups of the program, by site number
+        self.lookup_caches = list()
+        # the layout ids of the environments of the run (see Environment.layout)
+        self.layouts = dict()
+
+        # Resource limits
+        self.call_depth = 0
+        self.frames_created = 0
+        self.max_call_depth = max_call_depth
+        self.max_frames = frame_limit(max_frames)
+        self.max_digits = max_digits
+
+        # Memoized calls of pure recursive functions
+        if memo_store is not None and memo_size is None:
+            memo_size = DEFAULT_MEMO_SIZE
+        self.memo_size = memo_size
+        self.memo_store = memo_store
+        self.memo = None
+
+        # Tiered execution: hot lambda bodies run as bytecode
+        self.tier_threshold = None if trace or memo_size or self.parallel else tier_threshold
+        self.call_counts = Counter()
+        self._vm = None
 
-        # binary operators supported by RPAL and inbuilt functions(Conc)
-
-        self.binary_operator = {
-                                # Arithmetic operators
-                                "+", "-", "/", "*", "**", 
-                                # Operators for comparison and logical operations
-                                "eq", "ne", "gr", "ge", "le","ls",
-                                # Relational operators 
-                                ">", "<", ">=", "<=", 
-                                # Logical operators 
-                                "or", "&", "aug",  
-                                # Operators for string concatenation (RPAL inbuilt function)
-                                "Conc"
-                                }
-        
-        # unary operators supported by RPAL and inbuilt functions
-
-        self.unary_operators =  {
-                                # Unary operators
-                                "neg", "not",
-                                # print inbuilt functions
-                                "Print", 
-                                # type checking inbuilt functions
-                                "Isstring", "Isinteger", "Istruthvalue", "Isfunction", "Null","Istuple",
-                                # String manipulation inbuilt functions
-                                "Order", "Stern", "Stem", "ItoS", "$ConcPartial"
-                                }
-        
         # inbuilt functions support by RPAL 
 
         self.inbuilt_functions = {
@@ -112,29 +226,76 @@ class CSEMachine:
                                 # String manipulation inbuilt functions
                                 "Order", "Stern", "Stem", "ItoS", "$ConcPartial"
                                 }
-    def initialize(self):
+    def initialize(self, k=0, env=None):
         """
-        Initialize the CSEMachine with necessary components.
+        Initialize the CSEMachine with necessary components: the state of a run of the program
+        is reset, so that a machine can run programs one after the other.
+
+        Args:
+            k (int): The control structure run: the program (0), or a component of a tuple
+                (see evaluate).
+            env (Environment): The environment it is run in, or None for the primitive one.
 
          :return: None
         """
+
+        # Reset the state of the previous run
+        self.environment_ids = itertools.count(1)
+        self.current_enviroment = self.primitive_environment
+        self.stack = Stack()
+        self.control = Stack()
+        self.environments = list()
+        self._print_queue = list()
+        self.table_data = list()
+        self.call_depth = 0
+        self.frames_created = 0
+        self.call_counts = Counter()
+        self._vm = None
+        self.lookup_caches = [None] * self.program.sites
+        self.layouts = dict()
+        if self.stats is not None:
+            self.stats = MachineStatistics()
+        if self.memo_size:
+            self.memo = MemoTable(self.program, self.memo_size, self.memo_store)
+            if self.stats is not None:
+                self.stats.memo = self.memo
+        if self.parallel:
+            self.parallel_tuples = ParallelTuples(self.program, self.parallel, self._worker_options())
+            if self.stats is not None:
+                self.stats.parallel = self.parallel_tuples
     
         # Create the primitive environment as element
-        primitive_enviroment = ControlStructureElement("env_marker", "env_marker", None, None, self.current_enviroment)
+        primitive_enviroment = EnvironmentMarker(self.current_enviroment)
 
         # Push the primitive environment onto both the stack and control stack
         self.stack.push(primitive_enviroment)
         self.control.push(primitive_enviroment)
+        self.environments.append(self.current_enviroment)
+
+        if env is not None:
+            self.current_enviroment = env
 
         # Push elements from the first control structure onto the control stack
         if self.control_structures:
-            elements = self.control_structures[0].elements
+            elements = self.control_structures[k].elements
             for element in elements:
                 self.control.push(element)
         else:
             # Handle the case when control_structures is empty
             self._error_handler.handle_error("Control structures are empty")
 
+    def compile(self, st_tree):
+        """
+        Compile the given Standardized Tree (ST) into a program (see cse_machine/program.py).
+
+        Args:
+            st_tree (Node): The root node of the Standardized Tree (ST).
+
+        Returns:
+            Program: The read-only program, which execute_program runs.
+        """
+        return self._linearizer.compile(st_tree)
+
     def execute(self, st_tree):
         """
         Execute the given Standardized Tree (ST).
@@ -142,52 +303,68 @@ class CSEMachine:
         Args:
             st_tree (Node): The root node of the Standardized Tree (ST) to execute.
         """
-        
-        # Get the linearized control structures from the ST
-        self.control_structures = self._linearizer.linearize(st_tree)
+        self.execute_program(self.compile(st_tree))
+
+    def execute_program(self, program):
+        """
+        Execute a compiled program. The program is only read, so it can be executed again, and by
+        other machines at the same time.
+
+        Args:
+            program (Program): The program, compiled by this machine or another CSE machine.
+        """
+        self.program = program
+        self.control_structures = program.control_structures
+        self.uncurried = program.uncurried
         
         # Initialize the CSE machine
         self.initialize()
-        
-        # Execute the ST
-        while not self.control.is_empty():
-
-            # get the top of the control stack
-            control_top = self.control.peek()
-            # get the top of the stack
-            stack_top = self.stack.peek()
-
-            # check the type of the control structure and apply the corresponding rule
-
-            if control_top.type in ['ID','STR','INT','bool','tuple','Y*','nil','dummy']:
-                self.CSErule1()
-            elif control_top.type == "lambda":
-                self.CSErule2()
-            elif control_top.type == "env_marker":
-                self.CSErule5()
-            elif control_top.value in self.binary_operator and self.stack.size() >= 2:
-                self.CSErule6()
-            elif control_top.value in self.unary_operators and self.stack.size() >= 1:
-                self.CSErule7()
-            elif control_top.type == "beta" and self.stack.size() >= 1:
-                self.CSErule8()
-            elif control_top.type == "tau":
-                self.CSErule9()
-            elif control_top.type == "gamma" and stack_top.type == "tuple":
-                self.CSErule10()
-            elif control_top.type == "gamma" and stack_top.type == "Y*":
-                self.CSErule12()
-            elif control_top.type == "gamma" and stack_top.type == "eta":
-                self.CSErule13()
-            elif control_top.type == "gamma"  and stack_top.type == "lambda":
-                    if len(stack_top.bounded_variable) > 1:
-                        self.CSErule11()
-                    else:
-                        self.CSErule4()
-            elif control_top.type == "gamma" and stack_top.type == "ConcPartial":
-                self.Concpartial()
-            else:
-                self._error_handler.handle_error("CSE : Invalid control structure")
+        self._run()
+
+    def evaluate(self, program, k, env, call_depth=0):
+        """
+        Evaluate a control structure of a compiled program in an environment: a component of a
+        tuple, in a worker process (see cse_machine/parallel.py).
+
+        Args:
+            program (Program): The program.
+            k (int): The control structure.
+            env (Environment): The environment.
+            call_depth (int): The number of calls already live.
+
+        Returns:
+            The value.
+        """
+        self.program = program
+        self.control_structures = program.control_structures
+        self.uncurried = program.uncurried
+        self.initialize(k, env)
+        self.call_depth = call_depth
+        self._run()
+        return self.stack.pop()
+
+    def _run(self):
+        """
+        Apply the rules until the control is empty.
+        """
+        # The handlers of the rules, by element tag
+        rules = self._rules = self._rule_table()
+        self._apply_rules = {kind: self._rule(name) for kind, name in APPLY_RULES.items()}
+
+        # Execute the ST: apply the rule of the element on top of the control
+        control = self.control.items
+        try:
+            while control:
+                rules[control[-1].tag]()
+        except IndexError:
+            # an inbuilt function used as a value took more operands than the stack holds
+            self._error_handler.handle_error("CSE : Missing operand")
+        finally:
+            # the results kept before an error are still results
+            if self.memo_store is not None:
+                self.memo_store.flush()
+            if self.parallel_tuples is not None:
+                self.parallel_tuples.close()
 
     @add_table_data_decorator("1")
     def CSErule1(self):
@@ -198,27 +375,27 @@ class CSEMachine:
         look up its value in the environment and push it onto the stack. If it is a
         lambda expression, push it onto the stack.
         """
-        control_top = self.control.peek()
-        if control_top.type in ['STR','INT','bool','tuple','Y*','nil','dummy']:
-            self.stack.push(self.control.pop())
+        item = self.control.pop()
+        if item.type == "ID":
+            self.stack.push(self._var_lookup(item.value, item))
         else :
-            item = self.control.pop()
-            var_name = item.value
-            var = self._var_lookup(var_name)
-            if var[0] == "eta" or var[0] == "lambda":
-                self.stack.push(var[1])
-            else :
-                self.stack.push(ControlStructureElement(var[0],var[1]))
+            self.stack.push(literal_value(item))
         
     @add_table_data_decorator("2") 
     def CSErule2(self):
         """
         CSE rule 2: If the top of the control stack is a lambda expression,
-        push it onto the stack. Set the environment of the lambda expression to the current environment.
+        push a closure for it onto the stack. The closure is a new element so that the
+        lambda in the control structure is left untouched. With flat closures its
+        environment holds only the free variables of the lambda, otherwise it is the
+        current environment.
         """
         lambda_ = self.control.pop()
-        lambda_.env = self.current_enviroment
-        self.stack.push(lambda_)
+        if self.flat_closures and lambda_.free_variables is not None:
+            env = self._capture_free_variables(lambda_.free_variables)
+        else:
+            env = self.current_enviroment
+        self.stack.push(Closure(None, env, lambda_.bounded_variable, lambda_.control_structure))
         
     @add_table_data_decorator("3")
     def CSErule3(self):
@@ -231,43 +408,47 @@ class CSEMachine:
         push it onto the stack. Set the environment of the lambda expression to the current environment.
         """
 
-        # for avoiding infinite loop 
-        if self.current_enviroment.index >= 2000:
-            self._error_handler.handle_error("CSE : Environment limit exceeded")
-            return
-
         self.control.pop()
         lambda_ = self.stack.pop()
         rand = self.stack.pop()
-        new_enviroment = Environment()
-        if rand.type  == "eta" or rand.type == "lambda":
-            new_enviroment.add_var(lambda_.bounded_variable[0],rand.type,rand)
-        elif rand.type in ["tuple","INT","bool","STR","nil"]:
-            new_enviroment.add_var(lambda_.bounded_variable[0],rand.type,rand.value)
-        else:
-            self._error_handler.handle_error("CSE : Invalid type")
+        new_enviroment = Environment(next(self.environment_ids))
+        self._bind_variable(new_enviroment, lambda_.params[0], rand)
         new_enviroment.parent = lambda_.env
+        if self.stats:
+            self.stats.track_environment(new_enviroment)
 
-        self.current_enviroment = new_enviroment
-        
-        new_enviroment_element = ControlStructureElement("env_marker","env_marker",None,None,new_enviroment)
-        
-        self.control.push(new_enviroment_element) 
-        
-        for element in self.control_structures[lambda_.control_structure].elements:
-            self.control.push(element)
-            
-        self.stack.push(new_enviroment_element)
+        self._enter(lambda_.index, new_enviroment)
         
+    @add_table_data_decorator("4u")
+    def CSErule4_uncurried(self):
+        """
+        CSE rule 4 for a saturated call of a curried lambda (f a b c): the innermost gamma of the
+        application spine has a curried lambda on the stack with no more parameters than the
+        spine has arguments. Instead of applying the lambdas one at a time, pop one gamma per
+        parameter, bind all the parameters in a single new environment and push the body of the
+        innermost lambda behind a single environment marker.
+        """
+
+        lambda_ = self.stack.pop()
+        params, k = self.uncurried[lambda_.index]
+        new_enviroment = Environment(next(self.environment_ids))
+        for name in params:
+            self.control.pop()
+            self._bind_variable(new_enviroment, name, self.stack.pop())
+        new_enviroment.parent = lambda_.env
+        if self.stats:
+            self.stats.track_environment(new_enviroment)
+
+        self._enter(k, new_enviroment)
+
     @add_table_data_decorator("5")
     def CSErule5(self):
         """
         CSE rule 5: If the top of the control stack is an environment marker,
         pop it off the stack and set the current environment to the environment
         it represents. Then, pop the value off the stack and push it back on.
-        Finally, iterate over the entire stack, starting from the bottom, and
-        check if the current element is an environment marker. If it is, set the
-        current environment to the environment it represents and break out of the loop.
+        Finally, restore the environment of the nearest environment marker left on
+        the stack, which is the top of the environment stack.
         If the environments do not match, raise an error.
 
         Parameters:
@@ -280,15 +461,25 @@ class CSEMachine:
             CseError: If the environments do not match
         """
         env = self.control.pop().env
+        if env is not self.primitive_environment:
+            self.call_depth -= 1
         value = self.stack.pop()
         if env == self.stack.pop().env:
             self.stack.push(value)
-            for element in reversed(self.stack.whole_stack()):
-                if element.type == "env_marker":
-                    self.current_enviroment = element.env
-                    break
+            environments = self.environments
+            environments.pop()
+            if environments:
+                self.current_enviroment = environments[-1]
         else:
             self._error_handler.handle_error("CSE : Invalid environment")
+
+    @add_table_data_decorator("5m")
+    def CSErule5_memo(self):
+        """
+        CSE rule 5 for the memo marker below the environment marker of a memoized call: the call
+        has returned, and the value on top of the stack is kept in the memo table as its result.
+        """
+        self.memo.store(self.control.pop().key, self.stack.peek())
                 
     @add_table_data_decorator("6")
     def CSErule6(self):
@@ -300,38 +491,63 @@ class CSEMachine:
         apply the addition operator to the two popped elements, and push the result back onto the stack.
         If the top of the control stack is "Conc", pop two elements from the stack,
         check if both elements are of type "STR", and if so, concatenate the two strings and push the result back onto the stack.
-        If one of the two elements is not of type "STR", replace the element with type "ConcPartial" and push the other element back onto the stack.
+        If only the first element is of type "STR", push the other element back onto the stack, then Conc partially applied to the first (ConcPartial).
         If both elements are not of type "STR", raise an error.
         """
         binop = self.control.pop().value
         rator = self.stack.pop()
         rand = self.stack.pop()
-        if binop == "aug":
-            self.stack.push(self._apply_binary(rator,rand,binop))
-        elif binop == "Conc":
-            if rator.type == "STR" and rand.type == "STR":
-                result =self._apply_binary(rator.value,rand.value,binop)
-                self.stack.push(ControlStructureElement("STR",result))
+        if binop == "Conc":
+            if is_string(rator) and is_string(rand):
+                self.stack.push(self._apply_binary(rator,rand,binop))
                 self.remove_gamma()
                 self.remove_gamma()
-            elif rator.type == "STR":
-                rator.type = "ConcPartial"
+            elif is_string(rator):
                 self.stack.push(rand)
-                self.stack.push(rator)
+                self.stack.push(ConcPartial(rator))
                 self.remove_gamma()
             else:
                 self._error_handler.handle_error("CSE : Invalid type for concatenation")
         else:
-            rator = rator.value
-            rand = rand.value
-            result = self._apply_binary(rator,rand,binop)
-            typ  = None
-            if type(result) == bool:
-                typ = "bool"
-            else:
-                typ = "INT"
-            self.stack.push(ControlStructureElement(typ,result))
+            self.stack.push(self._apply_binary(rator,rand,binop))
         
+    @add_table_data_decorator("6f")
+    def CSErule6_fused(self):
+        """
+        CSE rules 1, 1 and 6 in one step, for a binary operator applied to two leaves (a fused
+        element made by the linearizer). The operands are looked up right to left, as rule 1
+        would push them, and the operator is applied to them.
+        """
+        binop = self.control.pop()
+        left, right = binop.operands
+        rand = self._operand(right)
+        rator = self._operand(left)
+        if binop.operator is not None:
+            operator, operand_type, function, result_type = SPECIALIZED_BINARY_OPERATIONS[binop.operator]
+            self.stack.push(function(rator,rand))
+        else:
+            self.stack.push(self._apply_binary(rator,rand,binop.value))
+
+    @add_table_data_decorator("6t")
+    def CSErule6_specialized(self):
+        """
+        CSE rule 6 for an operation whose operand types were proven by type inference (INT_ADD,
+        INT_EQ, ...): the operation is applied without checking the operands, and the type of
+        the result is known.
+        """
+        operator, operand_type, function, result_type = SPECIALIZED_BINARY_OPERATIONS[self.control.pop().type]
+        rator = self.stack.pop()
+        rand = self.stack.pop()
+        self.stack.push(function(rator,rand))
+
+    @add_table_data_decorator("7t")
+    def CSErule7_specialized(self):
+        """
+        CSE rule 7 for neg or not on an operand whose type was proven by type inference.
+        """
+        operator, operand_type, function, result_type = SPECIALIZED_UNARY_OPERATIONS[self.control.pop().type]
+        self.stack.push(function(self.stack.pop()))
+
     @add_table_data_decorator("7")    
     def CSErule7(self):
         """
@@ -345,17 +561,20 @@ class CSEMachine:
         unop = self.control.pop().value
         rator_e = self.stack.pop()
         result = self._apply_unary(rator_e,unop)
-        res_type = None
-        if type(result) == bool:
-            res_type = "bool"
-        elif type(result) == str:
-            res_type = "STR"
-        else :
-            res_type = "INT"
         if unop in self.inbuilt_functions:
             self.remove_gamma()
-        self.stack.push(ControlStructureElement(res_type,result))
+        self.stack.push(result)
                     
+    @add_table_data_decorator("7f")
+    def CSErule7_fused(self):
+        """
+        CSE rule 7 for an inbuilt function fused with the gamma that applies it (and with its
+        argument when that is a leaf, which saves the rule 1 step as well).
+        """
+        inbuilt = self.control.pop()
+        rand = self._operand(inbuilt.operands[0]) if inbuilt.operands else self.stack.pop()
+        self.stack.push(self._apply_unary(rand,inbuilt.value))
+
     @add_table_data_decorator("8")
     def CSErule8(self):
         """
@@ -370,7 +589,7 @@ class CSEMachine:
         with the elements from the control structure. Then, pop the second element off the stack
         and push it back on. If the first element is not a control structure, raise an error.
         """
-        val = self.stack.pop().value
+        val = self.stack.pop()
         if val == True :
             self.control.pop()
             self.control.pop()
@@ -386,6 +605,23 @@ class CSEMachine:
         else:
             self._error_handler.handle_error("CSE : Invalid type for condition")
 
+    @add_table_data_decorator("8f")
+    def CSErule8_fused(self):
+        """
+        CSE rule 8 for a conditional whose delta delta beta elements were fused by the linearizer:
+        the fused element holds both deltas, so only the chosen arm is pushed onto the control.
+        """
+        then_delta, else_delta = self.control.pop().operands
+        val = self.stack.pop()
+        if val == True :
+            delta = then_delta
+        elif val == False:
+            delta = else_delta
+        else:
+            self._error_handler.handle_error("CSE : Invalid type for condition")
+        for element in self.control_structures[delta.control_structure].elements:
+            self.control.push(element)
+
     @add_table_data_decorator("9")
     def CSErule9(self):
         """
@@ -398,7 +634,45 @@ class CSEMachine:
         tup = []
         for i in range(n):
             tup.append(self.stack.pop())
-        self.stack.push(ControlStructureElement("tuple",tup))
+        self.stack.push(Tuple(tup))
+
+    @add_table_data_decorator("9p")
+    def CSErule9_parallel(self):
+        """
+        CSE rule 9 for a par_tau element: the components of the tuple are evaluated in the worker
+        processes and the tuple of their values is pushed onto the stack. When they are not (see
+        cse_machine/parallel.py), the tau element and the components are pushed onto the
+        control, in line as the linearizer lays them out without parallel tuples, and the tuple
+        is made by rule 9.
+        """
+        par_tau = self.control.pop()
+        values = None
+        if self.parallel_tuples is not None:
+            values = self.parallel_tuples.evaluate(self, par_tau)
+        if values is not None:
+            self.stack.push(Tuple(values))
+            return
+        self.control.push(ControlStructureElement("tau", par_tau.value, tag=TAG_TAU))
+        for component in par_tau.operands:
+            for element in self.control_structures[component.control_structure].elements:
+                self.control.push(element)
+
+    @add_table_data_decorator("9")
+    def CSErule9_spread(self):
+        """
+        CSE rule 9 for a call whose tuple argument was left on the stack (see CSErule11_spread)
+        when the function turns out not to be a lambda with that many parameters. The tuple is
+        built from the values below the function after all, and the gamma is replaced by a
+        plain gamma so that the call continues as usual.
+        """
+        gamma = self.control.pop()
+        rator = self.stack.pop()
+        tup = []
+        for i in range(gamma.arity):
+            tup.append(self.stack.pop())
+        self.stack.push(Tuple(tup))
+        self.stack.push(rator)
+        self.control.push(ControlStructureElement("gamma","gamma",spine=gamma.spine,tag=TAG_GAMMA))
 
     @add_table_data_decorator("10")   
     def CSErule10(self):
@@ -410,10 +684,9 @@ class CSEMachine:
         self.control.pop()
         l = self.stack.pop()
         index = self.stack.pop()
-        if index.type != "INT":
+        if type(index) is not int or not 0 < index <= l.length:
             self._error_handler.handle_error("CSE : Invalid index")
-        index  = index.value-1
-        self.stack.push(l.value[index])
+        self.stack.push(l.items[index-1])
                 
     @add_table_data_decorator("11")
     def CSErule11(self):
@@ -429,30 +702,44 @@ class CSEMachine:
         """
         self.control.pop()
         lambda_ = self.stack.pop()
-        var_list = lambda_.bounded_variable
-        k = lambda_.control_structure
+        var_list = lambda_.params
+        k = lambda_.index
         c = lambda_.env
         
-        new_env = Environment()
+        new_env = Environment(next(self.environment_ids))
         rand = self.stack.pop()
         
-        if len(var_list) != len(rand.value):
+        if type(rand) is not Tuple or len(var_list) != rand.length:
             self._error_handler.handle_error("CSE : Invalid number of arguments")
             
+        items = rand.items
         for i in range(len(var_list)):
-            if rand.value[i].type == "eta" or rand.value[i].type == "lambda":
-                new_env.add_var(var_list[i],rand.value[i].type,rand.value[i])
-            else:
-                new_env.add_var(var_list[i],rand.value[i].type,rand.value[i].value)
+            new_env.add_var(var_list[i],items[i])
         
         new_env.parent = c
-        self.current_enviroment = new_env
-        env_marker = ControlStructureElement("env_marker","env_marker",None,None,new_env)
-        self.stack.push(env_marker)
-        self.control.push(env_marker)
-        
-        for element in self.control_structures[k].elements:
-            self.control.push(element)
+        if self.stats:
+            self.stats.track_environment(new_env)
+        self._enter(k, new_env)
+
+    @add_table_data_decorator("11s")
+    def CSErule11_spread(self):
+        """
+        CSE rule 11 for a call with a literal tuple argument, f (a, b). The linearizer leaves the
+        tau out, so the arguments are still separate values below the lambda on the stack. When
+        the lambda has as many parameters as the call has arguments, they are bound directly
+        from the stack without building the tuple.
+        """
+        self.control.pop()
+        lambda_ = self.stack.pop()
+
+        new_env = Environment(next(self.environment_ids))
+        for var in lambda_.params:
+            new_env.add_var(var,self.stack.pop())
+
+        new_env.parent = lambda_.env
+        if self.stats:
+            self.stats.track_environment(new_env)
+        self._enter(lambda_.index, new_env)
 
     @add_table_data_decorator("12")       
     def CSErule12(self):
@@ -464,11 +751,21 @@ class CSEMachine:
         self.control.pop()
         self.stack.pop()
         lambda_ = self.stack.pop()
-        if lambda_.type != "lambda":
+        if type(lambda_) not in CLOSURE_TYPES:
             self._error_handler.handle_error("CSE : expected lambda")
-        eta = ControlStructureElement("eta","eta",lambda_.bounded_variable,lambda_.control_structure,lambda_.env)
-        self.stack.push(eta)
+        self.stack.push(Eta(None,lambda_.env,lambda_.params,lambda_.index))
         
+    @add_table_data_decorator("12r")
+    def CSErule12_direct(self):
+        """
+        CSE rules 2 and 12 for a recursive definition of a lambda (rec f = lambda x. E, a
+        rec_lambda element made by the linearizer): push the closure of lambda x. E, whose
+        environment binds f to the closure itself. Calling it is an ordinary rule 4, with no
+        eta to unfold by rule 13 on every recursive call.
+        """
+        definition, lambda_ = self.control.pop().operands
+        self.stack.push(self._recursive_closure(definition, lambda_))
+
     @add_table_data_decorator("13")
     def CSErule13(self):
         """
@@ -476,29 +773,215 @@ class CSEMachine:
         pop it off the stack and create a new tuple with the next "n" elements
         on the stack. Push the tuple back onto the stack.
         """
-        self.control.push(ControlStructureElement("gamma","gamma"))
+        self.control.push(GAMMA)
         eta = self.stack.peek()
-        self.stack.push(ControlStructureElement("lambda","lambda",eta.bounded_variable,eta.control_structure,eta.env))
+        self.stack.push(Closure(None,eta.env,eta.params,eta.index))
     
     def Concpartial(self):
         rator = self.stack.pop()
         rand = self.stack.pop()
-        if rand.type == "STR":
-            result = self._apply_binary(rator.value,rand.value,"Conc")
-            self.stack.push(ControlStructureElement("STR",result))
+        if is_string(rand):
+            self.stack.push(self._apply_binary(rator.value,rand,"Conc"))
             self.remove_gamma()
         else:
             self._error_handler.handle_error("CSE : Invalid type for concatenation")
 
             
+    def _apply(self):
+        """
+        Apply the value on top of the stack, for a gamma on top of the control: the rule depends
+        on the type of the value (see APPLY_RULES). A gamma whose tuple argument was left on the
+        stack (arity) is handled by rule 11s, or rule 9s when the value is not a lambda with
+        that many parameters.
+        """
+        gamma = self.control.peek()
+        rator = self.stack.peek()
+        kind = type(rator)
+        if gamma.arity and kind is not Eta:
+            if kind in CLOSURE_TYPES and len(rator.params) == gamma.arity:
+                self._call_rules["11s"]()
+            else:
+                self._call_rules["9s"]()
+            return
+        rule = self._apply_rules.get(kind)
+        if rule is None:
+            self._error_handler.handle_error("CSE : Invalid control structure")
+        rule()
+
+    def _apply_closure(self):
+        """
+        Apply the closure on top of the stack: rule 11 for a lambda of several parameters, rule
+        4u for a saturated call of a curried lambda, and rule 4 otherwise.
+        """
+        gamma = self.control.peek()
+        lambda_ = self.stack.peek()
+        if len(lambda_.params) > 1:
+            self._call_rules["11"]()
+        elif gamma.spine and lambda_.index in self.uncurried \
+                and len(self.uncurried[lambda_.index][0]) <= gamma.spine:
+            self._call_rules["4u"]()
+        else:
+            self._call_rules["4"]()
+
+    def _invalid_control(self):
+        self._error_handler.handle_error("CSE : Invalid control structure")
+
     ##############################################################################################################
     # helper functions
     ##############################################################################################################
+
+    def _rule_table(self):
+        """
+        Build the table of the rule handlers, indexed by element tag (see TAG_RULES), and the
+        rules of the calls made by _apply and _apply_closure.
+
+        Returns:
+            list: The handler of each tag.
+        """
+        rules = [self._invalid_control] * TAG_COUNT
+        for tag, name in TAG_RULES.items():
+            rules[tag] = self._rule(name)
+        self._call_rules = {"4": self._rule("CSErule4"), "4u": self._rule("CSErule4_uncurried"),
+                            "11": self._rule("CSErule11"), "11s": self._rule("CSErule11_spread"),
+                            "9s": self._rule("CSErule9_spread")}
+        return rules
+
+    def _rule(self, name):
+        """
+        Return the bound method of a rule. The rules are wrapped by add_table_data_decorator to
+        record the execution table and count the rule; when neither is on, the method is
+        returned without the wrapper.
+        """
+        method = getattr(self, name)
+        if self.trace or self.stats:
+            return method
+        function = getattr(method.__func__, "__wrapped__", method.__func__)
+        return function.__get__(self)
+
+    def _enter(self, k, env):
+        """
+        Enter the lambda body k in the new environment env (the end of CSE rules 4 and 11).
+
+        The body is pushed onto the control behind an environment marker. When the call is the
+        last thing the current body does (the environment marker of the current body is on top
+        of both the control and the stack), that marker is dropped first, so tail-recursive loops
+        run with a bounded control, stack and number of live environments. With tiering on, the
+        calls of every body are counted, and once a body is hot it is run on the virtual machine
+        instead and its value is pushed onto the stack; a hot body called in tail position drops
+        the marker of its caller first, as the virtual machine drops the frames of its own tail
+        calls.
+
+        With memoization on, a call of a pure recursive function whose result is in the memo table
+        pushes the result instead of entering the body. Otherwise a memo marker is pushed below
+        the environment marker, to keep the result once the body returns (rule 5m), unless the
+        call is in tail position: its markers would pile up on the control as the loop runs.
+        """
+        memo_key = None
+        if self.memo is not None and k in self.memo.memoizable:
+            memo_key = self.memo.key(k, env)
+            if memo_key is not None:
+                value = self.memo.lookup(memo_key)
+                if value is not MISSING:
+                    self.stack.push(value)
+                    return
+
+        self.frames_created += 1
+        if self.frames_created > self.max_frames:
+            self._error_handler.handle_error(frame_limit_error(self.max_frames))
+
+        # a call in tail position: the current body has nothing left to do but return the value
+        # of this call, so its environment marker is dropped instead of nesting another one
+        marker = self.control.peek()
+        tail = marker.type == "env_marker" and self.stack.peek() is marker and marker.env is not self.primitive_environment
+        if tail:
+            self.control.pop()
+            self.stack.pop()
+            self.environments.pop()
+            self.call_depth -= 1
+            if self.stats:
+                self.stats.tail_calls += 1
+            if memo_key is not None:
+                self.memo.skip(memo_key)
+        elif memo_key is not None:
+            self.control.push(MemoMarker(memo_key))
+
+        if self.tier_threshold is not None:
+            calls = self.call_counts[k] = self.call_counts[k] + 1
+            if calls >= self.tier_threshold:
+                if calls == self.tier_threshold:
+                    self._tier_up(k, calls)
+                if self.call_depth >= self.max_call_depth:
+                    self._error_handler.handle_error(call_depth_error(self.max_call_depth))
+                vm = self._vm
+                vm.current_enviroment = env
+                vm.call_depth = self.call_depth + 1
+                vm.frames_created = self.frames_created
+                vm.run(vm.codes[k])
+                self.frames_created = vm.frames_created
+                self.stack.push(vm.stack.pop())
+                if tail:
+                    # the value returns to the body below the dropped marker, as rule 5 would
+                    self.current_enviroment = self.environments[-1]
+                return
+
+        if self.call_depth >= self.max_call_depth:
+            self._error_handler.handle_error(call_depth_error(self.max_call_depth))
+        self.call_depth += 1
+
+        if self.stats:
+            self.stats.track_depth(self.control.size(), self.stack.size())
+        self.current_enviroment = env
+        env_marker = EnvironmentMarker(env)
+        self.stack.push(env_marker)
+        self.control.push(env_marker)
+        self.environments.append(env)
+        for element in self.control_structures[k].elements:
+            self.control.push(element)
+
+    def _worker_options(self):
+        """
+        Return the options of the CSE machines that evaluate the components of tuples.
+        """
+        return dict(flat_closures=self.flat_closures, inline_caches=self.inline_caches,
+                    max_call_depth=self.max_call_depth, max_digits=self.max_digits,
+                    collect_stats=self.stats is not None)
+
+    def _tier_up(self, k, calls):
+        """
+        Compile the hot lambda body k to bytecode.
+        """
+        if self._vm is None:
+            self._vm = VirtualMachine(flat_closures=self.flat_closures, max_call_depth=self.max_call_depth,
+                                      max_frames=None if self.max_frames == math.inf else self.max_frames,
+                                      max_digits=self.max_digits)
+            self._vm.attach(self)
+        if self.stats:
+            self.stats.record_tier_up(k, calls)
+        self._vm.codes.compile(k)
     
-    def _var_lookup(self , var_name):
-        return var_lookup(self, var_name)
+    def _operand(self, leaf):
+        """
+        Return the value rule 1 would push for the leaf element of a fused element.
+        """
+        if leaf.type != "ID":
+            return literal_value(leaf)
+        return self._var_lookup(leaf.value, leaf)
+
+    def _var_lookup(self , var_name, site=None):
+        return var_lookup(self, var_name, site if self.inline_caches else None)
+
+    def _bind_variable(self, env, name, rand):
+        bind_variable(self, env, name, rand)
+
+    def _recursive_closure(self, definition, lambda_):
+        return recursive_closure(self, definition, lambda_)
+
+    def _capture_free_variables(self, names):
+        return capture_free_variables(self, names)
             
     def _apply_binary(self , rator , rand , binop):
+        if binop == "aug":
+            return apply_aug(self, rator, rand)
         return apply_binary_operations(self, rator, rand, binop)
                 
     def _apply_unary(self , rator , unop):
@@ -508,7 +991,7 @@ class CSEMachine:
         add_table_data(self, rule)
 
     def _print_cse_table(self):
-        self._linearizer.print_control_structures()
+        self._linearizer.print_control_structures(self.control_structures)
         print_cse_table(self)
 
     def _generate_output(self):
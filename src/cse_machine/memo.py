@@ -0,0 +1,356 @@
+"""
+Description
+This module defines the memo table of the CSE machine: an LRU cache of the results of calls of
+pure recursive functions, for programs such as a naive Fibonacci that make the same calls over
+and over.
+
+A call is memoized when all of the following hold:
+    - it enters the body of a recursive definition rec f = lambda x. E (a rec_lambda element, or
+      the innermost body of a curried one, rec f a b = E, called with all its arguments);
+    - the body cannot reach Print: no control structure nested in it holds a Print element (see
+      Linearizer.find_pure_lambdas);
+    - the free variables of the lambda are bound to data (integers, strings, truth values,
+      tuples of them, nil) or to closures of lambdas that are pure in the same way;
+    - the arguments are data.
+The result of such a call depends only on the lambda, the environment of its closure and the
+arguments, so it is kept under the key (body index, closure environment, parameter names,
+memo_key of the arguments). A call that fails is not kept.
+
+With a memo store (see cse_machine/memo_store.py) the results are also kept from one run to the
+next. Neither the body index nor the environment means anything in another run, so a call is
+found there under its persistent key: the code hash of the body, which hashes the contents of its
+control structures and of those nested in it, the values of the free variables of the lambda (a
+closure by the code hash of its body and the values of its own free variables), the names of the
+parameters in order and the arguments: the same body binding (b, a) instead of (a, b) gives
+another result for the same arguments.
+
+Usage
+>>> machine = CSEMachine(memo_size=100000)
+>>> machine.execute(st_tree)
+>>> machine.memo.hits, machine.memo.misses
+"""
+
+import hashlib
+import json
+from collections import OrderedDict
+
+from cse_machine.memo_store import decode_value, encode_value
+from cse_machine.runtime import DUMMY, Y_STAR, Closure, ConcPartial, Rope, Tuple
+
+# Result of MemoTable.lookup for a call that is not in the table (nil is None)
+MISSING = object()
+
+# Default number of results kept
+DEFAULT_MEMO_SIZE = 100000
+
+# Number of purity decisions kept before they are all dropped
+MAX_DECISIONS = 100000
+
+
+def memo_key(value):
+    """
+    Return a key for a data value: equal values (as eq compares them) get equal keys, and values
+    of different types get different keys (1 and true are equal in Python).
+
+    Args:
+        value: The value.
+
+    Returns:
+        The key, or None when the value is not data (a function, dummy, ...).
+    """
+    kind = type(value)
+    if kind is int:
+        return value
+    if kind is str:
+        return (str, value)
+    if kind is Rope:
+        return (str, str(value))
+    if kind is bool or value is None:
+        return (kind, value)
+    if kind is Tuple:
+        if type(value.items) is not list:
+            # the components of an array buffer are all integers
+            return (Tuple,) + tuple(value)
+        keys = [Tuple]
+        for item in value:
+            key = memo_key(item)
+            if key is None:
+                return None
+            keys.append(key)
+        return tuple(keys)
+    return None
+
+
+class MemoTable:
+    """
+    The results of the memoized calls of a run, with the least recently used dropped first.
+
+    Attributes:
+        pure_lambdas (Mapping): The free variables of the lambdas whose bodies cannot reach
+            Print, by the control structure index of the body.
+        memoizable (frozenset): The bodies whose calls are memoized.
+        size (int): The largest number of results kept.
+        results (OrderedDict): The results, by key, least recently used first.
+        hits (int): Calls answered from the table.
+        misses (int): Memoizable calls that were run and their results kept.
+        evictions (int): Results dropped to keep the table within its size.
+        purity (Purity): The closures found pure or not.
+        memo_store (MemoStore): The memo store the results are also kept in, or None.
+    """
+
+    def __init__(self, program, size=DEFAULT_MEMO_SIZE, memo_store=None):
+        """
+        Args:
+            program (Program): The program run.
+            size (int): The largest number of results kept.
+            memo_store (MemoStore): Keep the results in this memo store as well.
+        """
+        self.control_structures = program.control_structures
+        self.pure_lambdas = program.pure_lambdas
+        self.memoizable = program.memoizable
+        self.size = size
+        self.results = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.purity = Purity(program.pure_lambdas)
+        self.memo_store = memo_store
+        # the code hashes of the bodies, by index, and the persistent keys of the calls running
+        self._code_hashes = dict()
+        self._persistent_keys = dict()
+
+    def key(self, k, env):
+        """
+        Return the key of a call entering body k with the new environment env, which binds the
+        arguments and whose parent is the environment of the closure.
+
+        Returns:
+            tuple: The key, or None when the call is not memoized.
+        """
+        parent = env.parent
+        pure = self.purity.decided.get((k, parent))
+        if pure is None:
+            pure = self.purity.closure(k, parent, env._environment)
+        if not pure:
+            return None
+        keys = []
+        for value in env._environment.values():
+            key = memo_key(value)
+            if key is None:
+                return None
+            keys.append(key)
+        return (k, parent, tuple(env._environment), tuple(keys))
+
+    def lookup(self, key):
+        """
+        Return the result of a call, or MISSING.
+        """
+        results = self.results
+        value = results.get(key, MISSING)
+        if value is not MISSING:
+            results.move_to_end(key)
+            self.hits += 1
+        elif self.memo_store is not None:
+            persistent_key = self.persistent_key(key)
+            data = self.memo_store.get(persistent_key)
+            if data is None:
+                self._persistent_keys[key] = persistent_key
+            else:
+                value = results[key] = decode_value(data)
+                self.hits += 1
+        return value
+
+    def store(self, key, value):
+        """
+        Keep the result of a call, dropping the least recently used result when the table is
+        full.
+        """
+        results = self.results
+        results[key] = value
+        self.misses += 1
+        if len(results) > self.size:
+            results.popitem(last=False)
+            self.evictions += 1
+        if self.memo_store is not None:
+            persistent_key = self._persistent_keys.pop(key, None)
+            data = encode_value(value)
+            if persistent_key is not None and data is not None:
+                self.memo_store.put(persistent_key, self.code_hash(key[0]), data)
+
+    def skip(self, key):
+        """
+        Forget a call that was not found by lookup and whose result is not kept (a call in tail
+        position).
+        """
+        if self.memo_store is not None:
+            self._persistent_keys.pop(key, None)
+
+    def persistent_key(self, key):
+        """
+        Return the persistent key of a call: the SHA-256 of the code hash of the body, the values
+        of the free variables of the lambda, the names of the parameters and the arguments.
+
+        Args:
+            key (tuple): The key of the call (see key).
+
+        Returns:
+            str: The hexadecimal digest.
+        """
+        k, env, names, arguments = key
+        data = [self.code_hash(k), self._environment_data(k, env, [(k, env)]), list(names),
+                [self._key_data(argument) for argument in arguments]]
+        return hashlib.sha256(json.dumps(data, separators=(",", ":")).encode()).hexdigest()
+
+    def code_hash(self, k):
+        """
+        Return the code hash of a lambda body: the SHA-256 of its elements, with the lambdas in
+        it by the code hashes of their bodies, so that equal code gets equal hashes in any
+        program.
+
+        Args:
+            k (int): The control structure index of the body.
+
+        Returns:
+            str: The hexadecimal digest.
+        """
+        code = self._code_hashes.get(k)
+        if code is None:
+            data = [self._element_data(element) for element in self.control_structures[k].elements]
+            code = self._code_hashes[k] = hashlib.sha256(json.dumps(data, separators=(",", ":")).encode()).hexdigest()
+        return code
+
+    def _element_data(self, element):
+        data = [element.type, _plain(element.value), _plain(element.bounded_variable), element.operator,
+                element.spine, element.arity]
+        if element.control_structure is not None:
+            data.append(self.code_hash(element.control_structure))
+        if element.operands is not None:
+            data.append([self._element_data(operand) for operand in element.operands])
+        return data
+
+    def _environment_data(self, k, env, active):
+        """
+        Return the values of the free variables of the lambda with body k in env as JSON data.
+
+        Args:
+            active (list): The closures being encoded, (body, env) outermost first: a closure
+                found again among them is encoded by its position, as recursion makes cycles.
+        """
+        data = []
+        for name in sorted(self.pure_lambdas[k]):
+            value = env.lookup(name, MISSING)
+            if isinstance(value, Closure):
+                closure = (value.index, value.env)
+                if closure in active:
+                    data.append([name, "r", active.index(closure)])
+                else:
+                    active.append(closure)
+                    data.append([name, type(value).__name__, self.code_hash(value.index),
+                                 self._environment_data(value.index, value.env, active)])
+                    active.pop()
+            elif value is MISSING or value is DUMMY or value is Y_STAR:
+                data.append([name, "unbound" if value is MISSING else str(value)])
+            elif type(value) is ConcPartial:
+                data.append([name, "Conc", str(value.value)])
+            else:
+                data.append([name, encode_value(value)])
+        return data
+
+    def _key_data(self, key):
+        """
+        Return a memo_key as JSON data.
+        """
+        if type(key) is int:
+            return ["i", hex(key)]
+        kind = key[0]
+        if kind is Tuple:
+            return ["t", [self._key_data(item) for item in key[1:]]]
+        if kind is str:
+            return ["s", key[1]]
+        if kind is bool:
+            return ["b", key[1]]
+        return ["n"]
+
+
+class Purity:
+    """
+    Decides whether values cannot reach Print when they are used, from the lambdas found by
+    Linearizer.find_pure_lambdas and the values their closures capture.
+
+    Attributes:
+        pure_lambdas (Mapping): The free variables of the lambdas whose bodies cannot reach
+            Print, by the control structure index of the body.
+        size (int): The number of decisions kept before they are all dropped.
+        decided (dict): Whether the closures of a lambda body made in an environment are pure,
+            by (body, env).
+        checking (set): The closures being checked, (body, env), assumed pure meanwhile.
+    """
+
+    def __init__(self, pure_lambdas, size=MAX_DECISIONS):
+        """
+        Args:
+            pure_lambdas (Mapping): The free variables of the pure lambdas, by body index.
+            size (int): The number of decisions kept.
+        """
+        self.pure_lambdas = pure_lambdas
+        self.size = size
+        self.decided = dict()
+        self.checking = set()
+
+    def closure(self, k, env, bound=()):
+        """
+        Decide whether the closures of the lambda with body k made in env cannot reach Print.
+
+        Args:
+            k (int): The control structure index of the body.
+            env (Environment): The environment of the closures.
+            bound (dict): Names bound by the call itself, which are not looked up in env.
+
+        Returns:
+            bool: Whether they are pure.
+        """
+        names = self.pure_lambdas.get(k, False)
+        if names is False:
+            return False
+        closure = (k, env)
+        checking = self.checking
+        if closure in checking:
+            # a recursive closure is found again among its own free variables: assume it is pure
+            # while its free variables are checked
+            return True
+        if not checking and len(self.decided) >= self.size:
+            # only between checks, as the decisions made during one may rely on the assumptions
+            self.decided.clear()
+        checking.add(closure)
+        try:
+            pure = names is not None and all(self.value(env.lookup(name, MISSING))
+                                             for name in names if name not in bound)
+        finally:
+            checking.discard(closure)
+        if not pure:
+            # closures checked meanwhile may have relied on the assumption
+            self.decided.clear()
+        self.decided[closure] = pure
+        return pure
+
+    def value(self, value):
+        """
+        Decide whether a value bound to a free variable cannot reach Print when it is used. A
+        variable that is not bound fails when it is looked up, before it could print.
+        """
+        if isinstance(value, Closure):
+            pure = self.decided.get((value.index, value.env))
+            return self.closure(value.index, value.env) if pure is None else pure
+        return (value is MISSING or value is DUMMY or value is Y_STAR or type(value) is ConcPartial
+                or memo_key(value) is not None)
+
+
+def _plain(value):
+    """
+    Return the value or names of an element as JSON data.
+    """
+    if type(value) is int:
+        return ["i", hex(value)]
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    return value
@@ -0,0 +1,206 @@
+"""
+Description
+This module defines MemoStore, a persistent memo store: an SQLite file that keeps the results of
+memoized calls (see cse_machine/memo.py) from one run to the next, so that a program that makes
+an expensive call of a pure function made by an earlier run gets its result from the file.
+
+A result is kept under the SHA-256 of the code hash of the lambda body (the contents of its
+control structures, not their numbers), the values of its free variables and the arguments (see
+MemoTable.persistent_key). Changing the function changes the code hash, so the results of the old
+code are no longer found; they are dropped with the results that have not been used for max_age
+seconds, and the least recently used results are dropped once the store holds more than
+max_entries. Only results that are data (integers, strings, truth values, nil and tuples of them)
+are kept; they are stored as JSON (see encode_value).
+
+The store only saves work: when the file cannot be opened, read or written (not a database, a
+directory that cannot be written, ...), a warning is printed once and the run goes on without it.
+
+Usage
+>>> store = MemoStore("memo.sqlite")
+>>> machine = CSEMachine(memo_size=100000, memo_store=store)
+>>> machine.execute(st_tree)      # results are written at the end of the run
+"""
+
+import json
+import sqlite3
+import sys
+import time
+
+from cse_machine.runtime import Rope, Tuple
+
+# Default number of results kept in a store
+DEFAULT_MAX_ENTRIES = 1000000
+
+# Default time a result is kept without being used, in seconds (30 days)
+DEFAULT_MAX_AGE = 30 * 24 * 3600
+
+
+def encode_value(value):
+    """
+    Return a data value as JSON data: [kind, ...] lists, with integers in hexadecimal, which has
+    no digit limit and converts in linear time.
+
+    Args:
+        value: The value.
+
+    Returns:
+        list: The encoded value, or None when the value is not data.
+    """
+    kind = type(value)
+    if kind is int:
+        return ["i", hex(value)]
+    if kind is str or kind is Rope:
+        return ["s", str(value)]
+    if kind is bool:
+        return ["b", value]
+    if value is None:
+        return ["n"]
+    if kind is Tuple:
+        items = list()
+        for item in value:
+            encoded = encode_value(item)
+            if encoded is None:
+                return None
+            items.append(encoded)
+        return ["t", items]
+    return None
+
+
+def decode_value(data):
+    """
+    Return the value of data encoded by encode_value.
+    """
+    kind = data[0]
+    if kind == "i":
+        return int(data[1], 16)
+    if kind == "s" or kind == "b":
+        return data[1]
+    if kind == "n":
+        return None
+    return Tuple([decode_value(item) for item in data[1]])
+
+
+class MemoStore:
+    """
+    An SQLite file of memoized results.
+
+    Attributes:
+        path (str): The file.
+        max_entries (int): The largest number of results kept.
+        max_age (float): The time a result is kept without being used, in seconds.
+        reads (int): Results found in the file.
+        writes (int): Results written to the file.
+        failed (bool): Whether the file could not be used, and the store is no longer used.
+    """
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES, max_age=DEFAULT_MAX_AGE):
+        """
+        Args:
+            path (str): The file, created when it does not exist.
+            max_entries (int): The largest number of results kept.
+            max_age (float): The time a result is kept without being used, in seconds.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.reads = 0
+        self.writes = 0
+        self.failed = False
+        self._connection = None
+        self._used = list()
+        self._pending = list()
+
+    def _connect(self):
+        if self._connection is None:
+            connection = sqlite3.connect(self.path)
+            self._connection = connection
+            connection.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, code TEXT, "
+                               "value TEXT, used REAL)")
+            connection.execute("CREATE INDEX IF NOT EXISTS results_used ON results (used)")
+        return self._connection
+
+    def _fail(self, error):
+        """
+        Stop using the store after an error of the file, with a warning.
+        """
+        print(f"Warning: memo store {self.path} not used: {error}", file=sys.stderr)
+        self.failed = True
+        self._pending = list()
+        self._used = list()
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except sqlite3.Error:
+                pass
+            self._connection = None
+
+    def get(self, key):
+        """
+        Return the result kept under key, or None.
+
+        Args:
+            key (str): The persistent key of the call.
+
+        Returns:
+            list: The encoded result (see encode_value), or None.
+        """
+        if self.failed:
+            return None
+        try:
+            row = self._connect().execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as error:
+            self._fail(error)
+            return None
+        if row is None:
+            return None
+        self.reads += 1
+        self._used.append(key)
+        return json.loads(row[0])
+
+    def put(self, key, code, value):
+        """
+        Keep a result under key. It is written by the next flush.
+
+        Args:
+            key (str): The persistent key of the call.
+            code (str): The code hash of the lambda body.
+            value (list): The encoded result (see encode_value).
+        """
+        if not self.failed:
+            self._pending.append((key, code, json.dumps(value, separators=(",", ":"))))
+
+    def flush(self):
+        """
+        Write the results kept since the last flush, mark the results read as used, and drop the
+        results that are too old or too many.
+        """
+        if not self._pending and not self._used:
+            return
+        try:
+            self._write(time.time())
+        except sqlite3.Error as error:
+            self._fail(error)
+
+    def _write(self, now):
+        connection = self._connect()
+        with connection:
+            connection.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                                   [(key, code, value, now) for key, code, value in self._pending])
+            connection.executemany("UPDATE results SET used = ? WHERE key = ?", [(now, key) for key in self._used])
+            connection.execute("DELETE FROM results WHERE used < ?", (now - self.max_age,))
+            count = connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            if count > self.max_entries:
+                connection.execute("DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY used LIMIT ?)",
+                                   (count - self.max_entries,))
+        self.writes += len(self._pending)
+        self._pending = list()
+        self._used = list()
+
+    def close(self):
+        """
+        Flush the store and close the file.
+        """
+        self.flush()
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
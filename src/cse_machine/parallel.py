@@ -0,0 +1,189 @@
+"""
+Description
+This module evaluates the components of tuples in parallel for the CSE machine. RPAL is pure
+apart from Print, so the components of a tuple such as (Fib 30, Fib 31, Fib 32) can be evaluated
+at the same time, in worker processes (threads would take turns on the interpreter lock).
+
+The linearizer marks the tuples that qualify with a par_tau element: no component holds Print or
+a lambda, and at least two make calls (see Linearizer.split_tuple). When the machine meets one
+(rule 9p), ParallelTuples.evaluate sends each component, with the values of its free variables,
+to a pool of workers, and the tuple is built from their values in order. The program is sent to
+each worker once, when the pool starts; a worker evaluates a component with a CSE machine of its
+own (see CSEMachine.evaluate).
+
+The result is always that of the serial evaluation. The components are evaluated serially, in
+line as without parallel tuples, when:
+    - a free variable is bound to a closure that may reach Print (see Purity in
+      cse_machine/memo.py);
+    - a component fails in its worker (an error, a limit): evaluated serially, the error is
+      reported as it would have been, at the same point;
+    - the components together create more environments than max_frames allows;
+    - the pool cannot be started, or a component cannot be sent to it.
+A par_tau element whose components turn out cheap, creating fewer than MIN_FRAMES environments
+between them, is evaluated serially from then on: sending them to the workers costs more.
+
+Usage
+>>> machine = CSEMachine(parallel=4)
+>>> machine.execute(st_tree)
+>>> machine.parallel_tuples.tuples, machine.parallel_tuples.fallbacks
+"""
+
+import math
+import multiprocessing
+import pickle
+import queue
+
+from cse_machine.memo import MISSING, Purity
+
+# Environments the components of a tuple must create between them to stay parallel
+MIN_FRAMES = 1000
+
+# Errors of starting the pool or sending it a component: no processes, or a program or value that
+# cannot be pickled
+SEND_ERRORS = (OSError, ValueError, pickle.PicklingError, TypeError, AttributeError)
+
+# The machine and program of a worker process, set when the pool starts
+_worker = None
+
+
+def _start_worker(program, options):
+    """
+    Start a worker process: build the CSE machine that evaluates the components.
+    """
+    global _worker
+    from cse_machine.machine import CSEMachine
+    _worker = (CSEMachine(**options), program)
+
+
+def _evaluate(k, env, call_depth, max_frames):
+    """
+    Evaluate a component in a worker process.
+
+    Args:
+        k (int): The control structure of the component.
+        env (Environment): The values of its free variables.
+        call_depth (int): The number of live calls of the machine that made the tuple.
+        max_frames (int): The environments the component may create, or None for no limit.
+
+    Returns:
+        tuple: The value, the number of environments created and the statistics of the
+        evaluation (None when they are not collected).
+    """
+    machine, program = _worker
+    machine.max_frames = math.inf if max_frames is None else max_frames
+    value = machine.evaluate(program, k, env, call_depth)
+    return value, machine.frames_created, machine.stats
+
+
+class ParallelTuples:
+    """
+    The pool of worker processes of a run, and the tuples evaluated with it.
+
+    Attributes:
+        program (Program): The program run.
+        workers (int): The number of worker processes.
+        options (dict): The options of the CSE machines of the workers.
+        purity (Purity): The closures found pure or not.
+        serial (set): The par_tau elements evaluated serially from now on.
+        tuples (int): Tuples whose components were evaluated in parallel.
+        fallbacks (int): Tuples whose components were evaluated serially.
+    """
+
+    def __init__(self, program, workers, options):
+        """
+        Args:
+            program (Program): The program run.
+            workers (int): The number of worker processes.
+            options (dict): The options of the CSE machines of the workers.
+        """
+        self.program = program
+        self.workers = workers
+        self.options = options
+        self.purity = Purity(program.pure_lambdas)
+        self.serial = set()
+        self.tuples = 0
+        self.fallbacks = 0
+        self._pool = None
+        self._failed = False
+
+    def evaluate(self, machine, par_tau):
+        """
+        Evaluate the components of a par_tau element in the worker processes.
+
+        Args:
+            machine (CSEMachine): The machine that made the tuple.
+            par_tau (ControlStructureElement): The par_tau element.
+
+        Returns:
+            list: The values of the components in order, or None when they are to be evaluated
+            serially.
+        """
+        if par_tau in self.serial:
+            return None
+        env = machine.current_enviroment
+        components = par_tau.operands
+        if not all(self.purity.value(env.lookup(name, MISSING))
+                   for component in components for name in component.free_variables):
+            return self._fallback()
+        pool = self._start()
+        if pool is None:
+            return self._fallback()
+
+        budget = None if machine.max_frames == math.inf else machine.max_frames - machine.frames_created
+        results = queue.SimpleQueue()
+        try:
+            for i, component in enumerate(components):
+                args = (component.control_structure, machine._capture_free_variables(component.free_variables),
+                        machine.call_depth, budget)
+                pool.apply_async(_evaluate, args, callback=lambda result, i=i: results.put((i, True, result)),
+                                 error_callback=lambda error, i=i: results.put((i, False, error)))
+        except SEND_ERRORS:
+            # the components sent before are dropped with the pool
+            self.close()
+            return self._fallback()
+        values = [None] * len(components)
+        frames = 0
+        stats = list()
+        for _ in components:
+            i, done, result = results.get()
+            if not done:
+                # the other components may never finish, as they would not serially
+                self.close()
+                return self._fallback()
+            values[i], created, component_stats = result
+            frames += created
+            stats.append(component_stats)
+
+        if machine.frames_created + frames > machine.max_frames:
+            return self._fallback()
+        machine.frames_created += frames
+        if machine.stats is not None:
+            for component_stats in stats:
+                machine.stats.merge(component_stats)
+        if frames < MIN_FRAMES:
+            self.serial.add(par_tau)
+        self.tuples += 1
+        return values
+
+    def close(self):
+        """
+        Stop the worker processes.
+        """
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool = None
+
+    def _start(self):
+        """
+        Return the pool, started on first use, or None when it cannot be started.
+        """
+        if self._pool is None and not self._failed:
+            try:
+                self._pool = multiprocessing.Pool(self.workers, _start_worker, (self.program, self.options))
+            except SEND_ERRORS:
+                self._failed = True
+        return self._pool
+
+    def _fallback(self):
+        self.fallbacks += 1
+        return None
@@ -0,0 +1,83 @@
+"""
+Description
+This module defines the Program class: an RPAL program compiled by the linearizer, ready to be run
+by the CSE machine (see CSEMachine.execute_program) or the virtual machine.
+
+A program is read-only once it is built. It keeps copies of the control structures it was built
+from, which hold their elements in tuples, and the machines never change an element while they
+run: closures, partial applications and results are runtime values (see cse_machine/runtime.py),
+and the inline caches of the variable lookups and the layout ids they are guarded by are kept by
+the running machine, indexed by the site number of the ID element. A program can therefore be run
+any number of times, and by several machines at once (one machine per thread).
+
+Usage
+>>> program = CSEMachine().compile(st_tree)
+>>> for i in range(3):
+...     machine = CSEMachine()
+...     machine.execute_program(program)
+...     print(machine._generate_output())
+"""
+
+from types import MappingProxyType
+
+from cse_machine.control_structure import ControlStructure
+
+
+def frozen_structure(structure):
+    """
+    Return a copy of a control structure whose elements are in a tuple.
+
+    Args:
+        structure (ControlStructure): The control structure, which is left as it is.
+
+    Returns:
+        ControlStructure: The copy.
+    """
+    frozen = ControlStructure(structure.index)
+    frozen.items = frozen.elements = tuple(structure.elements)
+    return frozen
+
+
+class Program:
+    """
+    A compiled RPAL program.
+
+    Attributes:
+        control_structures (tuple[ControlStructure]): The control structures, by index.
+        uncurried (MappingProxyType): The uncurried lambdas found by the linearizer.
+        sites (int): The number of variable lookup sites (ID elements, numbered from 0).
+        codes (dict): The bytecode of the lambda bodies for the virtual machine, by control
+            structure index, or None when the program was compiled for the CSE machine.
+        pure_lambdas (MappingProxyType): The free variables of the lambdas whose bodies cannot
+            reach Print, by control structure index of the body (see cse_machine/memo.py).
+        memoizable (frozenset): The bodies of recursive definitions whose calls may be memoized.
+    """
+
+    __slots__ = ("control_structures", "uncurried", "sites", "codes", "pure_lambdas", "memoizable")
+
+    def __init__(self, control_structures, uncurried, sites, codes=None, pure_lambdas=(), memoizable=()):
+        """
+        Build a program from the output of the linearizer, with frozen copies of its control
+        structures.
+
+        Args:
+            control_structures (list[ControlStructure]): The linearized control structures.
+            uncurried (dict): The uncurried lambdas.
+            sites (int): The number of variable lookup sites.
+            codes (dict): The compiled bytecode, or None.
+            pure_lambdas (dict): The free variables of the pure lambdas, by body index.
+            memoizable (set): The memoizable bodies.
+        """
+        self.control_structures = tuple(frozen_structure(structure) for structure in control_structures)
+        self.uncurried = MappingProxyType(dict(uncurried))
+        self.sites = sites
+        self.codes = None if codes is None else MappingProxyType(codes)
+        self.pure_lambdas = MappingProxyType(dict(pure_lambdas))
+        self.memoizable = frozenset(memoizable)
+
+    def __reduce__(self):
+        # a program is sent to the worker processes that evaluate tuple components in parallel
+        # (see cse_machine/parallel.py); the mapping proxies are rebuilt there
+        codes = None if self.codes is None else dict(self.codes)
+        return Program, (list(self.control_structures), dict(self.uncurried), self.sites, codes,
+                         dict(self.pure_lambdas), self.memoizable)
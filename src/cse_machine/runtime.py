@@ -0,0 +1,595 @@
+"""
+Description
+This module defines the native value representation shared by the execution engines, and the RPAL
+operations on it. Values are plain Python objects; only the values that are not Python data get a
+small record class:
+
+    INT -> int          STR -> str, Rope    bool -> bool        nil -> None
+    tuple -> Tuple      dummy -> DUMMY      Y* -> Y_STAR        lambda -> Closure
+    eta -> Eta          Conc applied to one string -> ConcPartial
+
+A string is a str, or a Rope when it is long and was made by Stern or Conc (see is_string). A long
+tuple of integers keeps them in an array('q') (see Tuple).
+
+The CSE machine and the virtual machine make closures with no compiled body: index is the control
+structure of the lambda body, and a recursive definition they build directly is a
+RecursiveClosure.
+
+The operations follow cse_machine/binop.py and cse_machine/unop.py, including the output format of
+Print.
+
+Usage
+>>> from cse_machine.runtime import format_value, apply_aug
+>>> format_value(apply_aug(machine, Tuple([1, 2]), 3))
+'(1, 2, 3)'
+"""
+
+import decimal
+from array import array
+from itertools import islice
+
+try:
+    import gmpy2
+except ImportError:
+    gmpy2 = None
+
+
+class Dummy:
+    """
+    The RPAL dummy value.
+    """
+    __slots__ = ()
+
+    def __repr__(self):
+        return "dummy"
+
+    def __reduce__(self):
+        return "DUMMY"
+
+
+DUMMY = Dummy()
+
+
+class Closure:
+    """
+    A lambda closed over the environment it was created in.
+
+    Attributes:
+        body: The compiled body of the lambda.
+        env: The environment the lambda was created in.
+        params (list[str]): The bound variables.
+        index (int): The control structure index of the lambda body, as numbered by the linearizer.
+        uncurried (tuple): For a curried lambda (lambda a. lambda b. ... E), the number of
+            parameters and E compiled to bind all of them in one environment; otherwise None.
+    """
+    __slots__ = ("body", "env", "params", "index", "uncurried")
+
+    def __init__(self, body, env, params, index, uncurried=None):
+        self.body = body
+        self.env = env
+        self.params = params
+        self.index = index
+        self.uncurried = uncurried
+
+
+class Eta(Closure):
+    """
+    The fixed point of a lambda, produced by applying Y* to it (CSE rule 12).
+    """
+    __slots__ = ()
+
+
+class RecursiveClosure(Closure):
+    """
+    The closure of a recursive definition rec f = lambda x. E, built by the CSE machine and the
+    virtual machine in an environment where f is bound to the closure itself. It is applied like
+    any other closure, but prints and tests (Isfunction) like the eta it replaces.
+    """
+    __slots__ = ()
+
+
+class YStar:
+    """
+    The Y* combinator as a value.
+    """
+    __slots__ = ()
+
+    def __repr__(self):
+        return "Y*"
+
+    def __reduce__(self):
+        return "Y_STAR"
+
+
+Y_STAR = YStar()
+
+
+# Tuples with fewer components than this keep them in a list; longer tuples whose components are
+# all 64-bit integers keep them in an array('q')
+ARRAY_THRESHOLD = 16
+
+
+def int_array(values):
+    """
+    Return values in an array('q') when they are all integers that fit in 64 bits.
+
+    Args:
+        values (list): The components of a tuple.
+
+    Returns:
+        array: The packed values, or None when a value is not an int or does not fit.
+    """
+    for value in values:
+        if type(value) is not int:
+            return None
+    try:
+        return array("q", values)
+    except OverflowError:
+        return None
+
+
+class Tuple:
+    """
+    An RPAL tuple: the first length items of a buffer that longer tuples may share.
+
+    aug appends to the buffer when the tuple covers all of it and returns a tuple one longer over
+    the same buffer, so the loop T aug x builds an n-tuple in O(n). When the buffer has already
+    grown past the tuple (the tuple was augmented before), aug copies its items first. The items
+    below the length of a tuple never change, so tuples behave as values.
+
+    The buffer is a list, or an array('q') once the tuple has ARRAY_THRESHOLD components that are
+    all 64-bit integers: 8 bytes a component instead of a list slot and an int object. The
+    array is replaced by a list as soon as a component that is not such an integer is appended.
+
+    Attributes:
+        items (list | array): The buffer.
+        length (int): The number of components.
+    """
+    __slots__ = ("items", "length")
+
+    def __init__(self, items, length=None):
+        if length is None:
+            length = len(items)
+            if length >= ARRAY_THRESHOLD and type(items) is list:
+                items = int_array(items) or items
+        self.items = items
+        self.length = length
+
+    def aug(self, value):
+        """
+        Return the tuple with value appended.
+        """
+        items = self.items
+        length = self.length
+        if len(items) != length:
+            items = items[:length]
+        if type(items) is list:
+            items.append(value)
+            if length + 1 == ARRAY_THRESHOLD:
+                items = int_array(items) or items
+        elif type(value) is int and -0x8000000000000000 <= value <= 0x7fffffffffffffff:
+            items.append(value)
+        else:
+            items = items.tolist()
+            items.append(value)
+        return Tuple(items, length + 1)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, i):
+        if 0 <= i < self.length:
+            return self.items[i]
+        raise IndexError("tuple index out of range")
+
+    def __iter__(self):
+        return islice(self.items, self.length)
+
+    def __eq__(self, other):
+        return type(other) is Tuple and equal_values(self, other) is True
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Tuple({list(self)!r})"
+
+
+def equal_values(a, b):
+    """
+    Compare two values as eq does: values of different types cannot be compared, except a str
+    and a Rope, which are both strings. Tuples of the same length are compared component by
+    component, and cannot be compared when a pair of their components cannot.
+
+    Args:
+        a: The left operand.
+        b: The right operand.
+
+    Returns:
+        bool: Whether the values are equal, or None when they cannot be compared.
+    """
+    kind = type(a)
+    if kind is not type(b):
+        if is_string(a) and is_string(b):
+            return a == b
+        return None
+    if kind is not Tuple:
+        return a == b
+    if a.length != b.length:
+        return False
+    items = a.items if len(a.items) == a.length else a.items[:a.length]
+    others = b.items if len(b.items) == b.length else b.items[:b.length]
+    if type(items) is array and type(others) is array:
+        return items == others
+    kinds = list(map(type, items))
+    if kinds == list(map(type, others)) and Tuple not in kinds:
+        # components of the same types, pair by pair: == does not confuse 1 and true
+        return list(items) == list(others)
+    equal = True
+    for x, y in zip(items, others):
+        component = equal_values(x, y)
+        if component is None:
+            return None
+        equal = equal and component
+    return equal
+
+
+# Strings shorter than this are plain str: Stern copies them and Conc joins them
+ROPE_THRESHOLD = 64
+
+
+class Rope:
+    """
+    A long string made by Stern or Conc without copying its characters.
+
+    A rope is either a view, the characters of text from start on (made by Stern), or the
+    concatenation of left and right, each a str or a Rope (made by Conc). Stern of a view is a
+    view one character further into the same text, and Conc of long strings links them, so
+    walking a string with Stern or building one with Conc costs O(1) a step. The characters of a
+    concatenation are joined into a str the first time they are needed (Print, comparisons,
+    Stem and Stern); the rope then becomes a view of the joined text.
+
+    Attributes:
+        text (str): The text of a view, or None for a concatenation.
+        start (int): The offset of a view into its text.
+        left: The first part of a concatenation.
+        right: The second part of a concatenation.
+        length (int): The number of characters.
+    """
+    __slots__ = ("text", "start", "left", "right", "length")
+
+    def __init__(self, text, start, left, right, length):
+        self.text = text
+        self.start = start
+        self.left = left
+        self.right = right
+        self.length = length
+
+    def view(self):
+        """
+        Join the parts of a concatenation, making the rope a view of the result.
+
+        Returns:
+            Rope: The rope.
+        """
+        if self.text is None:
+            # the parts are walked with a stack: a loop of Concs builds a rope as deep as it is long
+            parts = []
+            pending = [self.right, self.left]
+            while pending:
+                part = pending.pop()
+                if type(part) is str:
+                    parts.append(part)
+                elif part.text is not None:
+                    parts.append(part.text[part.start:])
+                else:
+                    pending.append(part.right)
+                    pending.append(part.left)
+            self.text = "".join(parts)
+            self.start = 0
+            self.left = self.right = None
+        return self
+
+    def __str__(self):
+        self.view()
+        return self.text[self.start:] if self.start else self.text
+
+    def __len__(self):
+        return self.length
+
+    def __eq__(self, other):
+        if type(other) is str or type(other) is Rope:
+            return self.length == len(other) and str(self) == str(other)
+        return NotImplemented
+
+    def __lt__(self, other):
+        return str(self) < str(other)
+
+    def __le__(self, other):
+        return str(self) <= str(other)
+
+    def __gt__(self, other):
+        return str(self) > str(other)
+
+    def __ge__(self, other):
+        return str(self) >= str(other)
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __repr__(self):
+        return f"Rope({str(self)!r})"
+
+
+def is_string(value):
+    """
+    Return whether a value is an RPAL string (a str or a Rope).
+    """
+    return type(value) is str or type(value) is Rope
+
+
+def concat(left, right):
+    """
+    Concatenate two strings (Conc).
+
+    Returns:
+        str or Rope: A str when the result is short, otherwise a Rope linking the two.
+    """
+    length = len(left) + len(right)
+    if length < ROPE_THRESHOLD:
+        return str(left) + str(right)
+    if not right:
+        return left
+    if not left:
+        return right
+    return Rope(None, 0, left, right, length)
+
+
+def stern(string):
+    """
+    Return a non-empty string without its first character (Stern).
+
+    Returns:
+        str or Rope: A str when the result is short, otherwise a view of the same characters.
+    """
+    if type(string) is str:
+        if len(string) <= ROPE_THRESHOLD:
+            return string[1:]
+        return Rope(string, 1, None, None, len(string) - 1)
+    string.view()
+    if string.length <= ROPE_THRESHOLD:
+        return string.text[string.start + 1:]
+    return Rope(string.text, string.start + 1, None, None, string.length - 1)
+
+
+def stem(string):
+    """
+    Return the first character of a non-empty string (Stem).
+    """
+    if type(string) is str:
+        return string[0]
+    string.view()
+    return string.text[string.start]
+
+
+# Integers with fewer bits than this are converted with str (about 3000 digits, within the
+# default limit of sys.get_int_max_str_digits)
+STR_BITS = 10000
+
+# Integers with at most this many bits are leaves of the divide-and-conquer conversion
+LEAF_BITS = 128
+
+
+def int_to_str(value, max_digits=None):
+    """
+    Return the decimal digits of an integer of any size.
+
+    str(int) is quadratic in the number of digits and refuses integers with more digits than
+    sys.get_int_max_str_digits(). Large integers are converted with gmpy2 when it is installed,
+    and otherwise with the decimal module: the bits are split in halves until they are small, the
+    halves are converted, and they are joined as hi * 2 ** w + lo with the fast multiplication of
+    decimal (see CPython's _pylong module).
+
+    Args:
+        value (int): The integer.
+        max_digits (int): The largest number of digits to produce, or None for no limit.
+
+    Returns:
+        str: The digits, with a leading "-" for a negative integer.
+
+    Raises:
+        OverflowError: If the integer has more than max_digits digits.
+    """
+    bits = value.bit_length()
+    # an n-bit integer has at least floor((n - 1) * log10(2)) + 1 digits
+    if max_digits is not None and (bits - 1) * 0.30102999566398120 > max_digits:
+        raise OverflowError(f"Integer too large to print (more than {max_digits} digits)")
+    if bits < STR_BITS:
+        text = str(value)
+    elif gmpy2 is not None:
+        text = gmpy2.mpz(value).digits()
+    else:
+        text = str(decimal_digits(abs(value), bits))
+        if value < 0:
+            text = "-" + text
+    if max_digits is not None and len(text) - (value < 0) > max_digits:
+        raise OverflowError(f"Integer too large to print (more than {max_digits} digits)")
+    return text
+
+
+def decimal_digits(value, bits):
+    """
+    Convert a non-negative integer to a Decimal by splitting its bits (see int_to_str).
+    """
+    powers = {}
+
+    def power(w):
+        # 2 ** w as a Decimal, shared by the halves of the same width
+        result = powers.get(w)
+        if result is None:
+            if w <= LEAF_BITS:
+                result = decimal.Decimal(1 << w)
+            else:
+                half = w >> 1
+                result = power(half) * power(w - half)
+            powers[w] = result
+        return result
+
+    def convert(n, w):
+        if w <= LEAF_BITS:
+            return decimal.Decimal(n)
+        half = w >> 1
+        hi = n >> half
+        return convert(hi, w - half) * power(half) + convert(n - (hi << half), half)
+
+    with decimal.localcontext() as context:
+        context.prec = decimal.MAX_PREC
+        context.Emax = decimal.MAX_EMAX
+        context.traps[decimal.Inexact] = True
+        return convert(value, bits)
+
+
+class ConcPartial:
+    """
+    Conc applied to its first argument only.
+
+    Attributes:
+        value (str): The first argument.
+    """
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+
+def format_value(value, max_digits=None):
+    """
+    Render a value the way Print does.
+
+    Args:
+        value: The value to render.
+        max_digits (int): The largest number of digits of an integer, or None for no limit.
+
+    Returns:
+        str: The text of the value.
+
+    Raises:
+        OverflowError: If an integer has more than max_digits digits.
+    """
+    if type(value) is int:
+        return int_to_str(value, max_digits)
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    if value is None:
+        return "nil"
+    if type(value) is Tuple:
+        if type(value.items) is array:
+            return "(" + ", ".join(map(str, value)) + ")"
+        return "(" + ", ".join(format_value(item, max_digits) for item in value) + ")"
+    if type(value) is Eta or type(value) is RecursiveClosure:
+        return "eta"
+    if type(value) is Closure:
+        return "[lambda closure: " + "".join(value.params) + ": " + str(value.index) + "]"
+    if type(value) is ConcPartial:
+        return str(value.value)
+    return str(value)
+
+
+def apply_aug(machine, rator, rand):
+    """
+    Apply aug to two values.
+
+    Args:
+        machine: The engine running the program.
+        rator: The tuple, or nil.
+        rand: The value to append.
+
+    Returns:
+        Tuple: The augmented tuple.
+    """
+    if rator is None:
+        return Tuple([rand])
+    if type(rator) is Tuple:
+        if rand is not None and isinstance(rand, (Closure, Dummy, YStar, ConcPartial)):
+            return machine._error_handler.handle_error("Cannot augment a non tuple (2).")
+        return rator.aug(rand)
+    if rand is None:
+        return rator
+    if isinstance(rator, (Closure, Dummy, YStar, ConcPartial)) or isinstance(rand, (Closure, Dummy, YStar, ConcPartial)):
+        return machine._error_handler.handle_error("Cannot augment a non tuple (2).")
+    return Tuple([rator, rand])
+
+
+def apply_print(machine, operand):
+    """
+    Append the text of the operand to the print queue of the engine.
+
+    Returns:
+        str: "dummy", the result of Print in the CSE machine.
+    """
+    try:
+        text = format_value(operand, machine.max_digits)
+    except OverflowError as error:
+        return machine._error_handler.handle_error(f"CSE : {error}")
+    machine._print_queue.append(text.replace("\\n", "\n").replace("\\t", "\t"))
+    return "dummy"
+
+
+def apply_order(machine, operand):
+    if type(operand) is Tuple:
+        return len(operand)
+    if operand is None:
+        return 0
+    return machine._error_handler.handle_error("CSE : Invalid unary operation")
+
+
+def apply_stern(machine, operand):
+    if is_string(operand) and len(operand) >= 1:
+        return stern(operand)
+    return machine._error_handler.handle_error("CSE : Invalid unary operation")
+
+
+def apply_stem(machine, operand):
+    if is_string(operand) and len(operand) >= 1:
+        return stem(operand)
+    return machine._error_handler.handle_error("CSE : Invalid unary operation")
+
+
+def apply_itos(machine, operand):
+    if isinstance(operand, int) and not isinstance(operand, bool):
+        try:
+            return int_to_str(operand, machine.max_digits)
+        except OverflowError as error:
+            return machine._error_handler.handle_error(f"CSE : {error}")
+    return machine._error_handler.handle_error("CSE : Invalid unary operation")
+
+
+def apply_neg(machine, operand):
+    if isinstance(operand, int):
+        return -operand
+    return machine._error_handler.handle_error("CSE : Invalid unary operation")
+
+
+def apply_not(machine, operand):
+    if isinstance(operand, bool):
+        return not operand
+    return machine._error_handler.handle_error("CSE : Invalid unary operation")
+
+
+# Unary operators and inbuilt functions on native values, called as function(machine, operand)
+UNARY_OPERATIONS = {
+    "Print"       : apply_print,
+    "Isstring"    : lambda machine, operand: is_string(operand),
+    "Isinteger"   : lambda machine, operand: type(operand) is int,
+    "Istruthvalue": lambda machine, operand: type(operand) is bool,
+    "Isfunction"  : lambda machine, operand: type(operand) is Closure,
+    "Null"        : lambda machine, operand: operand is None,
+    "Istuple"     : lambda machine, operand: type(operand) is Tuple or operand is None,
+    "Order"       : apply_order,
+    "Stern"       : apply_stern,
+    "Stem"        : apply_stem,
+    "ItoS"        : apply_itos,
+    "neg"         : apply_neg,
+    "not"         : apply_not,
+}
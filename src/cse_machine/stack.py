@@ -6,11 +6,15 @@ This module can be imported and used to create a custom stack class for the CSE
 """
 
 from utils.stack import Stack
-from cse_machine.environment import Environment
+from utils.control_structure_element import EnvironmentMarker
 
 class STACK(Stack):
     """
     A custom stack class that extends the Stack class and allows accessing the nearest Environment object.
+
+    The environments of the environment markers on the stack are kept on a parallel stack, so the
+    nearest one is found in constant time. The other items may be any value, native values
+    included (see cse_machine/runtime.py).
     """
 
     def __init__(self):
@@ -18,12 +22,22 @@ class STACK(Stack):
         Initialize an empty stack.
         """
         super().__init__()
+        self.environments = []
+
+    def push(self, item):
+        self.items.append(item)
+        if type(item) is EnvironmentMarker:
+            self.environments.append(item.env)
+
+    def pop(self):
+        item = self.items.pop()
+        if type(item) is EnvironmentMarker:
+            self.environments.pop()
+        return item
 
     def current_environment(self):
         """
         Return the nearest Environment object from the stack without removing it.
         """
-        for item in reversed(self.items):
-            if item.type == "env_marker":
-                return item.env
-    
\ No newline at end of file
+        if self.environments:
+            return self.environments[-1]
@@ -0,0 +1,251 @@
+"""
+Description
+This module defines the MachineStatistics class, which collects run statistics for the CSE machine.
+
+Usage
+Create the CSE machine with collect_stats=True. The machine then records rule counts and
+environment (frame) allocation figures, and report() renders them as text.
+"""
+
+import sys
+import weakref
+from collections import Counter
+
+
+class MachineStatistics:
+    """
+    Collects execution statistics for a single run of the CSE machine.
+
+    Attributes:
+        rule_counts (Counter): Number of times each CSE rule was applied.
+        rule_sequences (Counter): Number of times each sequence of two and of three consecutive
+            rules was applied, the histogram that superinstructions are picked from.
+        lookup_hits (int): Variable lookups answered by the inline cache of their ID element.
+        lookup_misses (int): Variable lookups that searched the environment chain.
+        lookup_hops (int): Parent hops taken by all variable lookups.
+        tail_calls (int): Calls in tail position, which drop the frame of the caller.
+        peak_control_depth (int): Highest number of elements on the control seen at a call.
+        peak_stack_depth (int): Highest number of elements on the stack seen at a call.
+        environments_created (int): Number of environments (frames) created during the run.
+        live_environments (int): Number of environments that are still reachable.
+        peak_live_environments (int): Highest value of live_environments seen during the run.
+        retained_bytes (int): Approximate bytes held by the live environments.
+        peak_retained_bytes (int): Highest value of retained_bytes seen during the run.
+        tier_ups (list): The control structures promoted to bytecode, as (index, calls) pairs.
+        compiled_structures (int): Number of control structures compiled to bytecode.
+        compile_seconds (float): Time spent compiling control structures to bytecode.
+        memo (MemoTable): The memo table of the run, or None when calls are not memoized.
+        parallel (ParallelTuples): The parallel tuples of the run, or None when tuples are not
+            parallel.
+    """
+
+    def __init__(self):
+        """
+        Initialize empty statistics.
+        """
+        self.rule_counts = Counter()
+        self.rule_sequences = Counter()
+        self._recent_rules = ()
+        self.lookup_hits = 0
+        self.lookup_misses = 0
+        self.lookup_hops = 0
+        self.tail_calls = 0
+        self.peak_control_depth = 0
+        self.peak_stack_depth = 0
+        self.environments_created = 0
+        self.live_environments = 0
+        self.peak_live_environments = 0
+        self.retained_bytes = 0
+        self.peak_retained_bytes = 0
+        self.tier_ups = list()
+        self.compiled_structures = 0
+        self.compile_seconds = 0.0
+        self.memo = None
+        self.parallel = None
+
+    def count_rule(self, rule):
+        """
+        Record one application of the given CSE rule.
+
+        Args:
+            rule (str): The rule number as shown in the CSE table.
+        """
+        self.rule_counts[rule] += 1
+        recent = self._recent_rules
+        if recent:
+            self.rule_sequences[(recent[-1], rule)] += 1
+            if len(recent) == 2:
+                self.rule_sequences[recent + (rule,)] += 1
+        self._recent_rules = (recent[-1], rule) if recent else (rule,)
+
+    def count_lookup(self, hit, hops):
+        """
+        Record one variable lookup through an inline cache.
+
+        Args:
+            hit (bool): Whether the cache of the ID element was valid.
+            hops (int): The number of parent hops to the frame binding the variable.
+        """
+        if hit:
+            self.lookup_hits += 1
+        else:
+            self.lookup_misses += 1
+        self.lookup_hops += hops
+
+    def track_depth(self, control_depth, stack_depth):
+        """
+        Record the depth of the control and the stack at a call.
+
+        Args:
+            control_depth (int): The number of elements on the control.
+            stack_depth (int): The number of elements on the stack.
+        """
+        if control_depth > self.peak_control_depth:
+            self.peak_control_depth = control_depth
+        if stack_depth > self.peak_stack_depth:
+            self.peak_stack_depth = stack_depth
+
+    def track_environment(self, env):
+        """
+        Start tracking a newly created environment until it is garbage collected.
+
+        Args:
+            env (Environment): The environment to track.
+        """
+        size = frame_size(env)
+        self.environments_created += 1
+        self.live_environments += 1
+        self.retained_bytes += size
+        if self.live_environments > self.peak_live_environments:
+            self.peak_live_environments = self.live_environments
+        if self.retained_bytes > self.peak_retained_bytes:
+            self.peak_retained_bytes = self.retained_bytes
+        weakref.finalize(env, self._release_environment, size)
+
+    def _release_environment(self, size):
+        self.live_environments -= 1
+        self.retained_bytes -= size
+
+    def record_tier_up(self, index, calls):
+        """
+        Record the promotion of a hot control structure to bytecode.
+
+        Args:
+            index (int): The control structure index.
+            calls (int): The number of calls that made it hot.
+        """
+        self.tier_ups.append((index, calls))
+
+    def record_compile(self, index, seconds):
+        """
+        Record the compilation of a control structure to bytecode.
+
+        Args:
+            index (int): The control structure index.
+            seconds (float): The time the compilation took.
+        """
+        self.compiled_structures += 1
+        self.compile_seconds += seconds
+
+    def merge(self, other):
+        """
+        Add the counts of another run to these: the rules applied, the lookups, the tail calls
+        and the environments created by a worker process for a component of a tuple (see
+        cse_machine/parallel.py). The peaks are those of another machine and are left out.
+
+        Args:
+            other (MachineStatistics): The statistics of the other run.
+        """
+        self.rule_counts.update(other.rule_counts)
+        self.rule_sequences.update(other.rule_sequences)
+        self.lookup_hits += other.lookup_hits
+        self.lookup_misses += other.lookup_misses
+        self.lookup_hops += other.lookup_hops
+        self.tail_calls += other.tail_calls
+        self.environments_created += other.environments_created
+
+    def steps(self):
+        """
+        Return the total number of rules applied.
+        """
+        return sum(self.rule_counts.values())
+
+    def frequent_sequences(self, length=3, count=5):
+        """
+        Return the most frequent rule sequences of the given length.
+
+        Args:
+            length (int): The number of rules in a sequence, 2 or 3.
+            count (int): The number of sequences to return.
+
+        Returns:
+            list: (sequence, applications) pairs, most frequent first.
+        """
+        sequences = [item for item in self.rule_sequences.items() if len(item[0]) == length]
+        return sorted(sequences, key=lambda item: -item[1])[:count]
+
+    def report(self):
+        """
+        Render the statistics as text.
+
+        Returns:
+            str: The formatted statistics.
+        """
+        lines = ["", "RUN STATISTICS", ""]
+        lines.append(f"steps                  : {self.steps()}")
+        for rule, count in sorted(self.rule_counts.items(), key=lambda item: -item[1]):
+            lines.append(f"  rule {rule:<17}: {count}")
+        for sequence, count in self.frequent_sequences():
+            lines.append(f"  sequence {' '.join(sequence):<13}: {count}")
+        lookups = self.lookup_hits + self.lookup_misses
+        if lookups:
+            lines.append(f"inline cache hits      : {self.lookup_hits} of {lookups} lookups "
+                         f"({self.lookup_misses} misses, {self.lookup_hops / lookups:.2f} hops per lookup)")
+        if self.tail_calls:
+            lines.append(f"tail calls             : {self.tail_calls}")
+        if self.peak_control_depth:
+            lines.append(f"peak control depth     : {self.peak_control_depth}")
+            lines.append(f"peak stack depth       : {self.peak_stack_depth}")
+        lines.append(f"environments created   : {self.environments_created}")
+        lines.append(f"peak live environments : {self.peak_live_environments}")
+        lines.append(f"peak retained bytes    : {self.peak_retained_bytes}")
+        if self.tier_ups:
+            hot = ", ".join(f"δ_{index}" for index, calls in self.tier_ups)
+            lines.append(f"tier-ups               : {len(self.tier_ups)} ({hot})")
+            lines.append(f"compiled structures    : {self.compiled_structures}")
+            lines.append(f"compile time           : {self.compile_seconds * 1000:.3f} ms")
+        if self.memo is not None:
+            memo = self.memo
+            calls = memo.hits + memo.misses
+            lines.append(f"memo hits              : {memo.hits} of {calls} calls ({memo.misses} misses)")
+            lines.append(f"memo results kept      : {len(memo.results)} of {memo.size} "
+                         f"({memo.evictions} evicted)")
+            if memo.memo_store is not None:
+                lines.append(f"memo store             : {memo.memo_store.reads} results read, "
+                             f"{memo.memo_store.writes} written ({memo.memo_store.path})")
+        if self.parallel is not None:
+            parallel = self.parallel
+            lines.append(f"parallel tuples        : {parallel.tuples} in {parallel.workers} workers "
+                         f"({parallel.fallbacks} serial)")
+        return "\n".join(lines) + "\n"
+
+
+def frame_size(env):
+    """
+    Approximate the number of bytes held by an environment and the values bound in it.
+
+    Args:
+        env (Environment): The environment to measure, or a [parent, value, ...] list.
+
+    Returns:
+        int: The approximate size in bytes.
+    """
+    if isinstance(env, list):
+        size = sys.getsizeof(env)
+        for value in env[1:]:
+            size += sys.getsizeof(value)
+        return size
+    size = sys.getsizeof(env) + sys.getsizeof(env._environment)
+    for value in env._environment.values():
+        size += sys.getsizeof(value)
+    return size
@@ -8,7 +8,92 @@
 
 
 from cse_machine.control_structure import ControlStructure
-from utils.control_structure_element import ControlStructureElement
+from cse_machine.program import Program
+from cse_machine.analysis import free_variables, infer_types, parallel_component
+from cse_machine.binop import SPECIALIZED_BINARY_OPERATIONS
+from cse_machine.unop import SPECIALIZED_UNARY_OPERATIONS
+from cse_machine.utils import element_val
+from utils.control_structure_element import (ControlStructureElement, TAG_INVALID, TAG_LEAF, TAG_LAMBDA,
+                                             TAG_ENV_MARKER, TAG_BINOP, TAG_UNOP, TAG_BETA, TAG_TAU, TAG_GAMMA,
+                                             TAG_REC_LAMBDA, TAG_FUSED_BINOP, TAG_FUSED_INBUILT, TAG_FUSED_BETA,
+                                             TAG_SPECIALIZED_BINOP, TAG_SPECIALIZED_UNOP, TAG_PAR_TAU)
+
+# Superinstructions: element patterns that are fused into a single element, so that the CSE
+# machine applies them in one step. They were picked from the rule sequence histogram of the
+# run statistics (see benchmarks/rule_sequences.py):
+#   "binop"       - an operator applied to two leaves (ID ID binop, INT ID binop). Rules 1 1 6
+#                   is the most frequent sequence of three in every benchmark workload.
+#   "inbuilt"     - gamma applied to an inbuilt function (Null T, Order T, Print x), with its
+#                   argument when that is a leaf: rules 1 7, frequent in tuple loops.
+#   "conditional" - delta delta beta. Rule 8 follows every condition; fused, a conditional is
+#                   one element on the control instead of three.
+SUPERINSTRUCTIONS = ("binop", "inbuilt", "conditional")
+
+# Operators that are fused with their operands (Conc consumes its gammas and is left alone)
+FUSED_OPERATORS = {"+", "-", "/", "*", "**", "eq", "ne", "gr", "ge", "le", "ls",
+                   ">", "<", ">=", "<=", "or", "&", "aug"}
+
+# Inbuilt functions that are fused with the gamma that applies them
+FUSED_INBUILT_FUNCTIONS = {"Print", "Isstring", "Isinteger", "Istruthvalue", "Isfunction", "Null",
+                           "Istuple", "Order", "Stern", "Stem", "ItoS"}
+
+# Components of a tuple that make at least this many calls of variables are worth evaluating in
+# another process, and a tuple is evaluated in parallel when at least PARALLEL_COMPONENTS are
+PARALLEL_CALLS = 1
+PARALLEL_COMPONENTS = 2
+
+# Specialized element types by (operator, operand types)
+SPECIALIZATIONS = dict()
+for name, (op, operand_type, function, result_type) in SPECIALIZED_BINARY_OPERATIONS.items():
+    SPECIALIZATIONS[(op, operand_type, operand_type)] = name
+for name, (op, operand_type, function, result_type) in SPECIALIZED_UNARY_OPERATIONS.items():
+    SPECIALIZATIONS[(op, operand_type)] = name
+
+# Elements that are a whole operand on their own
+LEAVES = {"ID", "INT", "STR", "bool", "nil"}
+
+# Binary operators of the control structures (CSE rule 6), with Conc
+BINARY_OPERATORS = {"+", "-", "/", "*", "**", "eq", "ne", "gr", "ge", "le", "ls",
+                    ">", "<", ">=", "<=", "or", "&", "aug", "Conc"}
+
+# Unary operators and inbuilt functions of the control structures (CSE rule 7)
+UNARY_OPERATORS = {"neg", "not", "Print", "Isstring", "Isinteger", "Istruthvalue", "Isfunction", "Null",
+                   "Istuple", "Order", "Stern", "Stem", "ItoS", "$ConcPartial"}
+
+# Element tags by element type (see element_tag)
+ELEMENT_TAGS = {"ID": TAG_LEAF, "INT": TAG_LEAF, "STR": TAG_LEAF, "bool": TAG_LEAF, "nil": TAG_LEAF,
+                "dummy": TAG_LEAF, "Y*": TAG_LEAF, "lambda": TAG_LAMBDA, "rec_lambda": TAG_REC_LAMBDA,
+                "env_marker": TAG_ENV_MARKER, "fused_binop": TAG_FUSED_BINOP, "fused_beta": TAG_FUSED_BETA,
+                "fused_inbuilt": TAG_FUSED_INBUILT, "par_tau": TAG_PAR_TAU}
+ELEMENT_TAGS.update(dict.fromkeys(SPECIALIZED_BINARY_OPERATIONS, TAG_SPECIALIZED_BINOP))
+ELEMENT_TAGS.update(dict.fromkeys(SPECIALIZED_UNARY_OPERATIONS, TAG_SPECIALIZED_UNOP))
+
+
+def element_tag(element):
+    """
+    Return the tag of a control structure element: the kind of element the CSE machine handles
+    with one rule (see utils/control_structure_element.py).
+
+    Args:
+        element (ControlStructureElement): The element.
+
+    Returns:
+        int: The tag.
+    """
+    tag = ELEMENT_TAGS.get(element.type)
+    if tag is not None:
+        return tag
+    if element.value in BINARY_OPERATORS:
+        return TAG_BINOP
+    if element.value in UNARY_OPERATORS:
+        return TAG_UNOP
+    if element.type == "beta":
+        return TAG_BETA
+    if element.type == "tau":
+        return TAG_TAU
+    if element.type == "gamma":
+        return TAG_GAMMA
+    return TAG_INVALID
 
 
 class Linearizer:
@@ -17,16 +102,53 @@ class Linearizer:
 
     Usage:
     >>> from cse_machine.data_structures.control_structure import ControlStructure
-    >>> from utils.control_structure_element import ControlStructureElement
+    >>> from utils.control_structure_element import (ControlStructureElement, TAG_INVALID, TAG_LEAF, TAG_LAMBDA,
+                                             TAG_ENV_MARKER, TAG_BINOP, TAG_UNOP, TAG_BETA, TAG_TAU, TAG_GAMMA,
+                                             TAG_REC_LAMBDA, TAG_FUSED_BINOP, TAG_FUSED_INBUILT, TAG_FUSED_BETA,
+                                             TAG_SPECIALIZED_BINOP, TAG_SPECIALIZED_UNOP)
     >>> linearizer = Linearizer()
     >>> st_tree =... # input syntax tree
     >>> linearizer.linearize(st_tree)
     """
-    def __init__(self):
+    def __init__(self, superinstructions=SUPERINSTRUCTIONS, type_inference=True, direct_recursion=True,
+                 parallel_tuples=False):
         """
         Initialize the linearizer.
+
+        Args:
+            superinstructions (tuple): The element patterns to fuse (see SUPERINSTRUCTIONS).
+            type_inference (bool): Emit specialized elements (INT_ADD, INT_EQ, ...) for the
+                operations whose operand types are proven by infer_types.
+            direct_recursion (bool): Emit rec_lambda elements for recursive definitions of
+                lambdas (see find_recursive_closures).
+            parallel_tuples (bool): Emit par_tau elements for the tuples whose components may
+                be evaluated in parallel (see split_tuple).
         """
         self.control_structures = []
+        self.free_variables = dict()
+        self.uncurried = dict()
+        self.superinstructions = superinstructions
+        self.type_inference = type_inference
+        self.direct_recursion = direct_recursion
+        self.parallel_tuples = parallel_tuples
+        self.types = dict()
+        self.sites = 0
+        self.pure_lambdas = dict()
+        self.memoizable = set()
+
+    def compile(self, st_tree):
+        """
+        Linearize the input syntax tree into a read-only Program.
+
+        Args:
+            st_tree (SyntaxTreeNode): The input syntax tree.
+
+        Returns:
+            Program: The compiled program.
+        """
+        control_structures = self.linearize(st_tree)
+        return Program(control_structures, self.uncurried, self.sites, pure_lambdas=self.pure_lambdas,
+                       memoizable=self.memoizable)
         
     def linearize(self,st_tree):
         """
@@ -38,17 +160,35 @@ class Linearizer:
         Returns:
             list[ControlStructure]: The linearized control structures.
         """
+        self.control_structures = []
+        self.uncurried = dict()
+        self.sites = 0
+        self.pure_lambdas = dict()
+        self.memoizable = set()
+        self.components = list()
+        self.free_variables = free_variables(st_tree)
+        if self.type_inference:
+            self.types = infer_types(st_tree)
         self.preorder_traversal(st_tree, 0)
+        self.number_components()
+        self.find_uncurried()
+        if self.direct_recursion:
+            self.find_recursive_closures()
+        self.find_pure_lambdas()
+        if self.superinstructions:
+            self.fuse()
+        self.tag()
         
         return self.control_structures
     
-    def preorder_traversal(self, root , index):
+    def preorder_traversal(self, root , index, spine=1):
         """
         Perform a preorder traversal on the syntax tree.
 
         Args:
             root (SyntaxTreeNode): The root of the syntax tree.
             index (int): The index of the current control structure.
+            spine (int): The number of gammas applied in a row when root is a gamma in rator position.
         """
         
         if len(self.control_structures) <= index:
@@ -60,19 +200,24 @@ class Linearizer:
         
         if root.data == "lambda":
             
+            free = self.free_variables.get(id(root))
             if root.children[0].data == ",": 
                 var_list = []
                 for child in root.children[0].children:
                     var_list.append(self.filter(child.data)[1])
-                self.control_structures[index].push(ControlStructureElement("lambda", "lambda", var_list, len(self.control_structures)))
+                self.control_structures[index].push(ControlStructureElement("lambda", "lambda", var_list, len(self.control_structures), free_variables=free))
             else:
-                self.control_structures[index].push(ControlStructureElement("lambda", "lambda", [self.filter(root.children[0].data)[1]], len(self.control_structures)))
+                self.control_structures[index].push(ControlStructureElement("lambda", "lambda", [self.filter(root.children[0].data)[1]], len(self.control_structures), free_variables=free))
             self.preorder_traversal(root.children[1], len(self.control_structures))
             
         elif root.data == "tau":
             self.control_structures[index].push(ControlStructureElement("tau", len(root.children)))
+            starts = []
             for child in root.children:
+                starts.append(len(self.control_structures[index].elements))
                 self.preorder_traversal(child, index)
+            if self.parallel_tuples:
+                self.split_tuple(root, index, starts)
 
         elif root.data == "->":
             self.control_structures[index].push(ControlStructureElement("delta", "delta",None, len(self.control_structures)))
@@ -82,13 +227,232 @@ class Linearizer:
             self.control_structures[index].push(ControlStructureElement("beta", "beta"))
             self.preorder_traversal(root.children[0], index)
         
+        elif root.data == "gamma":
+            rator, rand = root.children
+            if rator.data == "gamma":
+                self.control_structures[index].push(ControlStructureElement("gamma", "gamma"))
+                self.preorder_traversal(rator, index, spine + 1)
+                self.preorder_traversal(rand, index)
+                return
+
+            # the innermost gamma of an application spine (f a b c) records its length, and a
+            # tuple argument (f (a, b)) is left on the stack as separate values
+            arity = None
+            if rand.data == "tau" and (rator.children or self.filter(rator.data)[0] == "ID"):
+                arity = len(rand.children)
+            self.control_structures[index].push(ControlStructureElement("gamma", "gamma", spine=spine if spine > 1 else None, arity=arity))
+            self.preorder_traversal(rator, index)
+            if arity:
+                for child in rand.children:
+                    self.preorder_traversal(child, index)
+            else:
+                self.preorder_traversal(rand, index)
+
         else:
-            self.control_structures[index].push(ControlStructureElement(self.filter(root.data)[0], self.filter(root.data)[1]))
+            self.control_structures[index].push(ControlStructureElement(self.specialize(root), self.filter(root.data)[1]))
                 
             self.preorder_traversal(root.children[0], index)
             if len(root.children) > 1:
                 self.preorder_traversal(root.children[1], index)
     
+    def specialize(self, root):
+        """
+        Return the element type for an operator node: the specialized type when the types of its
+        operands are proven (see SPECIALIZATIONS), otherwise the operator itself.
+
+        Args:
+            root (SyntaxTreeNode): The operator node.
+
+        Returns:
+            str: The element type.
+        """
+        kind = self.filter(root.data)[0]
+        if not self.types:
+            return kind
+        key = (kind,) + tuple(self.types.get(id(child)) for child in root.children)
+        return SPECIALIZATIONS.get(key, kind)
+
+    def split_tuple(self, root, index, starts):
+        """
+        Replace the tuple just linearized at the end of control structure index by a par_tau
+        element when its components may be evaluated in parallel: none holds Print or a lambda,
+        and at least PARALLEL_COMPONENTS make PARALLEL_CALLS calls (see parallel_component).
+
+        The par_tau element takes the place of the tau element and the components after it. Its
+        value is the number of components, and its operands are a delta element for each, whose
+        free_variables are those of the component. The components get control structures of
+        their own, numbered after all the others by number_components, so that the lambdas keep
+        the numbers they have without parallel tuples.
+
+        Args:
+            root (Node): The tau node.
+            index (int): The control structure of the tuple.
+            starts (list[int]): The position of the first element of each component.
+        """
+        components = [parallel_component(child) for child in root.children]
+        if None in components or sum(calls >= PARALLEL_CALLS for calls, names in components) < PARALLEL_COMPONENTS:
+            return
+        elements = self.control_structures[index].elements
+        operands = []
+        for start, end, (calls, names) in zip(starts, starts[1:] + [len(elements)], components):
+            delta = ControlStructureElement("delta", "delta", free_variables=names)
+            self.components.append((delta, elements[start:end]))
+            operands.append(delta)
+        del elements[starts[0] - 1:]
+        elements.append(ControlStructureElement("par_tau", len(root.children), operands=tuple(operands)))
+
+    def number_components(self):
+        """
+        Give the components of the par_tau elements their control structures (see split_tuple).
+        """
+        for delta, elements in self.components:
+            structure = ControlStructure(len(self.control_structures))
+            for element in elements:
+                structure.push(element)
+            self.control_structures.append(structure)
+            delta.control_structure = structure.index
+
+    def find_uncurried(self):
+        """
+        Find the curried lambdas (lambda a. lambda b. ... E) and record their uncurried form.
+
+        self.uncurried maps the control structure index of the outermost lambda to the list of
+        parameters and the index of the control structure of E, so that a saturated call can
+        bind every parameter in a single environment.
+        """
+        for structure in self.control_structures:
+            for element in structure.elements:
+                if element.type != "lambda" or len(element.bounded_variable) != 1:
+                    continue
+                params = [element.bounded_variable[0]]
+                k = element.control_structure
+                body = self.control_structures[k].elements
+                while len(body) == 1 and body[0].type == "lambda" and len(body[0].bounded_variable) == 1:
+                    params.append(body[0].bounded_variable[0])
+                    k = body[0].control_structure
+                    body = self.control_structures[k].elements
+                if len(params) > 1:
+                    self.uncurried[element.control_structure] = (params, k)
+
+    def find_recursive_closures(self):
+        """
+        Replace Y* applied to a recursive definition of a lambda (rec f = lambda x. E, which is
+        "γ Y* λ_k[f]" with δ_k holding a single lambda) by a rec_lambda element. Its operands
+        are the λ_k[f] element and the lambda of δ_k; the machine builds the closure of the
+        lambda directly, in an environment where f is bound to the closure itself, so the
+        recursive calls need neither an eta nor rule 13. Other definitions (a tuple of
+        functions, or a body that is not a lambda) keep Y*.
+        """
+        for structure in self.control_structures:
+            elements = structure.elements
+            i = 0
+            while i + 2 < len(elements):
+                definition = elements[i + 2]
+                if (elements[i].type == "gamma" and elements[i + 1].type == "Y*" and definition.type == "lambda"
+                        and len(definition.bounded_variable) == 1):
+                    body = self.control_structures[definition.control_structure].elements
+                    if len(body) == 1 and body[0].type == "lambda":
+                        elements[i:i + 3] = [ControlStructureElement("rec_lambda", "rec_lambda", operands=(definition, body[0]))]
+                i += 1
+
+    def find_pure_lambdas(self):
+        """
+        Find the lambdas whose bodies cannot reach Print: no control structure nested in the
+        body (lambdas, conditional arms) holds a Print element. Calling one of them can only
+        print through the values of its free variables and arguments, which the memo table of
+        the CSE machine checks when it runs (see cse_machine/memo.py).
+
+        self.pure_lambdas maps the body index of each such lambda to its free variables, and
+        self.memoizable holds the bodies of the pure recursive definitions (rec_lambda elements),
+        with the innermost body of a curried one.
+        """
+        structures = self.control_structures
+        prints = [False] * len(structures)
+        lambdas = list()
+        # a nested control structure is numbered after the structure it is nested in (the
+        # components of par_tau elements are numbered last, but they hold no Print)
+        for structure in reversed(structures):
+            for element in structure.elements:
+                nested = element.operands if element.type in ("rec_lambda", "par_tau") else (element,)
+                for child in nested:
+                    if child.type == "lambda":
+                        lambdas.append(child)
+                    if child.control_structure is not None and prints[child.control_structure]:
+                        prints[structure.index] = True
+                if element.type == "Print":
+                    prints[structure.index] = True
+        for lambda_ in lambdas:
+            if not prints[lambda_.control_structure]:
+                self.pure_lambdas[lambda_.control_structure] = lambda_.free_variables
+        for structure in structures:
+            for element in structure.elements:
+                if element.type == "rec_lambda":
+                    k = element.operands[1].control_structure
+                    if k in self.pure_lambdas:
+                        self.memoizable.add(k)
+                        if k in self.uncurried:
+                            self.memoizable.add(self.uncurried[k][1])
+
+    def fuse(self):
+        """
+        Replace the element patterns named in self.superinstructions by fused elements.
+
+        The elements are in prefix order, so an element that starts an operand and is a leaf is
+        the whole operand. The fused elements are:
+            fused_binop   - value is the operator, operands are the (left, right) leaves, and
+                            operator is the specialized element type or None
+            fused_inbuilt - value is the inbuilt function, operands are its leaf argument or ()
+            fused_beta    - operands are the (then, else) deltas of the conditional
+        """
+        for structure in self.control_structures:
+            elements = structure.elements
+            fused = []
+            i = 0
+            while i < len(elements):
+                element = elements[i]
+                following = elements[i + 1:i + 3]
+                if ("conditional" in self.superinstructions and element.type == "delta"
+                        and len(following) == 2 and following[0].type == "delta" and following[1].type == "beta"):
+                    fused.append(ControlStructureElement("fused_beta", "beta", operands=(element, following[0])))
+                    i += 3
+                elif ("binop" in self.superinstructions
+                        and (element.type in FUSED_OPERATORS or element.type in SPECIALIZED_BINARY_OPERATIONS)
+                        and len(following) == 2 and following[0].type in LEAVES and following[1].type in LEAVES):
+                    specialized = element.type if element.type in SPECIALIZED_BINARY_OPERATIONS else None
+                    fused.append(ControlStructureElement("fused_binop", element.value, operator=specialized,
+                                                         operands=tuple(following)))
+                    i += 3
+                elif ("inbuilt" in self.superinstructions and element.type == "gamma"
+                        and following and following[0].type in FUSED_INBUILT_FUNCTIONS):
+                    if len(following) == 2 and following[1].type in LEAVES:
+                        fused.append(ControlStructureElement("fused_inbuilt", following[0].value, operands=(following[1],)))
+                        i += 3
+                    else:
+                        fused.append(ControlStructureElement("fused_inbuilt", following[0].value, operands=()))
+                        i += 2
+                else:
+                    fused.append(element)
+                    i += 1
+            elements[:] = fused
+
+    def tag(self):
+        """
+        Set the tag of every element, which the CSE machine dispatches on (see element_tag), and
+        number the variable lookup sites: the ID elements, including the leaves of fused
+        elements. The CSE machine keeps the inline cache of each site in a list indexed by it.
+        """
+        for structure in self.control_structures:
+            for element in structure.elements:
+                element.tag = element_tag(element)
+                if element.type == "ID":
+                    element.site = self.sites
+                    self.sites += 1
+                elif element.type == "fused_binop" or element.type == "fused_inbuilt":
+                    for operand in element.operands:
+                        if operand.type == "ID":
+                            operand.site = self.sites
+                            self.sites += 1
+
     ################################################################################################
     # helper functions
     ################################################################################################
@@ -130,13 +494,17 @@ class Linearizer:
     # helper functions for debugging purposes (print control structures)
     ################################################################################################
     
-    def print_control_structures(self):
+    def print_control_structures(self, control_structures=None):
         """
         Print the control structures.
+
+        Args:
+            control_structures (list[ControlStructure]): The control structures to print, by
+                default the last ones linearized.
         """
         print()
         print('Control Structures',end="\n\n")
-        for structure in self.control_structures:
+        for structure in control_structures or self.control_structures:
             print(f"δ_{structure.index} = ",end="")
             for element in structure.elements:
                 if element.type == "lambda":
@@ -146,7 +514,9 @@ class Linearizer:
                 elif element.type == "tau":
                     print(f"{element.type}[{element.value}]",end=" ")
                 elif element.type == "gamma":
-                    print("γ",end=" ")
+                    print(f"γ({element.arity})" if element.arity else "γ",end=" ")
+                elif element.operands is not None or element.type in SPECIALIZATIONS.values():
+                    print(element_val(element),end=" ")
                 else:
                     print(element.value,end=" ")
             print("\n")
\ No newline at end of file
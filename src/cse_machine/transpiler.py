@@ -0,0 +1,617 @@
+"""
+RPAL to Python Transpiler for Executing RPAL Programs.
+
+Description:
+This file contains the PythonTranspiler, which translates the Standardized Tree (ST) into the source
+of a Python function (nested defs for the lambdas, straight-line statements for the expressions),
+and the TranspiledMachine engine, which compiles that source with compile() and runs it.
+
+Values are the native values of cse_machine/runtime.py. A transpiled lambda is a Closure whose body
+is a Python function of the argument. Every intermediate result is assigned to a temporary in the
+evaluation order of the CSE machine (the rand of an application before the rator, the right
+operand of an operator before the left one), so Print output comes out in the same order.
+
+Every RPAL call nests a Python call, so the Python recursion limit is raised while the program runs
+to allow max_call_depth live calls (see cse_machine/limits.py); a let counts as a call, as on the
+CSE machine. Inbuilt functions are not values: Print, Conc, ... fail when they are not applied.
+
+The code object of a program can be cached with marshal, keyed by a hash of the RPAL source. On a
+cache hit the interpreter skips the whole front end (scanner, parser, standardizer).
+
+Example Usage:
+   machine = TranspiledMachine()
+   machine.execute(st_tree)
+   print(machine._generate_output())
+"""
+
+import hashlib
+import importlib.util
+import marshal
+import os
+import sys
+
+from cse_machine.analysis import lambda_indices
+from cse_machine.binop import apply_binary_operations
+from cse_machine.error_handler import CseErrorHandler
+from cse_machine.limits import (DEFAULT_MAX_CALL_DEPTH, DEFAULT_MAX_DIGITS, DEFAULT_MAX_FRAMES, call_depth_error,
+                                frame_limit, frame_limit_error, python_recursion_limit, recursion_limit_error)
+from cse_machine.runtime import (DUMMY, Y_STAR, Closure, Eta, YStar, ConcPartial, Tuple, UNARY_OPERATIONS,
+                                 apply_aug, concat, is_string)
+from cse_machine.stats import MachineStatistics
+from cse_machine.stlinearizer import Linearizer
+from cse_machine.utils import BINDABLE_TYPES, raw
+
+# Bump when the generated code changes, so that stale cache entries are not used
+TRANSPILER_VERSION = 6
+
+# Name of the generated function
+PROGRAM_NAME = "rpal_program"
+
+# Operators with an integer fast path, as Python operators
+INTEGER_OPERATORS = {
+    "+": "+", "-": "-", "*": "*", "/": "//",
+    "gr": ">", "ge": ">=", "ls": "<", "le": "<=",
+}
+
+
+class PythonTranspiler:
+    """
+    Translates a Standardized Tree into Python source.
+
+    The source defines one function, rpal_program(rt), which runs the program on the runtime
+    support of a TranspiledMachine (rt) and returns the value of the program.
+    """
+
+    def __init__(self):
+        self._linearizer = Linearizer()  # decodes the tokens of the tree
+
+    def translate(self, st_tree):
+        """
+        Translate the Standardized Tree.
+
+        Args:
+            st_tree (Node): The root of the Standardized Tree.
+
+        Returns:
+            str: The Python source.
+        """
+        self._indices = lambda_indices(st_tree)
+        self._names = 0
+        self._lines = list()
+        self._indent = 1
+        self._inbuilts = set()
+
+        result = self._translate(st_tree, dict())
+        self._emit(f"return {result}")
+
+        prologue = [
+            f"def {PROGRAM_NAME}(rt):",
+            "    _call = rt.call",
+            "    _spine = rt.call_spine",
+            "    _frame = rt.frame",
+            "    _leave = rt.leave",
+            "    _bind = rt.bind",
+            "    _inbuilt_value = rt.inbuilt_value",
+            "    _truth = rt.truth",
+            "    _unpack = rt.unpack",
+            "    _binop = rt.binop",
+            "    _aug = rt.aug",
+            "    _conc = rt.conc",
+            "    _eta = rt.eta",
+            "    _unbound = rt.unbound",
+            "    _Closure = rt.Closure",
+            "    _Tuple = rt.Tuple",
+            "    _DUMMY = rt.DUMMY",
+            "    _YSTAR = rt.YSTAR",
+        ]
+        for name in sorted(self._inbuilts):
+            prologue.append(f"    _{name} = rt.inbuilt[{name!r}]")
+        return "\n".join(prologue + self._lines) + "\n"
+
+    ################################################################################################
+    # node translators; each one emits statements and returns an atom (a name or a literal)
+    ################################################################################################
+
+    def _translate(self, node, scope):
+        if not node.children:
+            return self._translate_leaf(node, scope)
+        if node.data == "lambda":
+            return self._translate_lambda(node, scope)
+        if node.data == "gamma":
+            return self._translate_gamma(node, scope)
+        if node.data == "->":
+            return self._translate_conditional(node, scope)
+        if node.data == "tau":
+            values = [self._translate(child, scope) for child in reversed(node.children)][::-1]
+            return self._assign(f"_Tuple([{', '.join(values)}])")
+        if len(node.children) == 1:
+            operand = self._translate(node.children[0], scope)
+            return self._assign(f"{self._inbuilt(node.data)}({operand})")
+        return self._translate_binary(node, scope)
+
+    def _translate_leaf(self, node, scope):
+        kind, value = self._linearizer.filter(node.data)
+        if kind == "ID":
+            if value in scope:
+                return scope[value]
+            return self._assign(f"_unbound({value!r})")
+        if kind in UNARY_OPERATIONS or kind == "Conc":
+            return self._assign(f"_inbuilt_value({kind!r})")
+        if kind in ("INT", "STR", "bool", "nil"):
+            return repr(value)
+        if kind == "dummy":
+            return "_DUMMY"
+        if kind == "Y*":
+            return "_YSTAR"
+        raise ValueError(f"Cannot translate token: {node.data}")
+
+    def _translate_lambda(self, node, scope):
+        params, function = self._translate_function(node, scope)
+        uncurried = self._translate_uncurried(node, scope)
+        return self._assign(f"_Closure({function}, None, {params!r}, {self._indices[id(node)]}, {uncurried})")
+
+    def _translate_function(self, node, scope):
+        """
+        Emit the def of a lambda.
+
+        Returns:
+            tuple: The bound variables and the name of the def.
+        """
+        binder = node.children[0]
+        if binder.data == ",":
+            params = [self._linearizer.filter(child.data)[1] for child in binder.children]
+        else:
+            params = [self._linearizer.filter(binder.data)[1]]
+        scope = dict(scope)
+        names = [self._bind(scope, param) for param in params]
+        function = self._new_name("_f")
+        if len(params) == 1:
+            self._emit(f"def {function}({names[0]}):")
+            self._indent += 1
+        else:
+            self._emit(f"def {function}(_arg):")
+            self._indent += 1
+            self._emit(f"{', '.join(names)}, = _unpack(_arg, {len(names)})")
+        self._emit(f"return {self._translate(node.children[1], scope)}")
+        self._indent -= 1
+        return params, function
+
+    def _translate_uncurried(self, node, scope):
+        """
+        Emit a def binding all the parameters of a curried lambda (lambda a. lambda b. ... E) at
+        once, for saturated calls (see CSErule4_uncurried). It takes the arguments in one tuple,
+        so that call_spine calls it like any other function: a call spreading its arguments
+        (body(*args)) goes through the C stack, which deep recursion overflows.
+
+        Returns:
+            str: The (number of parameters, def) tuple, or "None" if the lambda is not curried.
+        """
+        params = []
+        while node.data == "lambda" and node.children[0].data != ",":
+            params.append(self._linearizer.filter(node.children[0].data)[1])
+            node = node.children[1]
+        if len(params) < 2:
+            return "None"
+        scope = dict(scope)
+        names = [self._bind(scope, param) for param in params]
+        function = self._new_name("_u")
+        self._emit(f"def {function}(_args):")
+        self._indent += 1
+        self._emit(f"{', '.join(names)}, = _args")
+        self._emit(f"return {self._translate(node, scope)}")
+        self._indent -= 1
+        return f"({len(params)}, {function})"
+
+    def _translate_gamma(self, node, scope):
+        rator, rand = node.children
+
+        if not rator.children:
+            kind = self._linearizer.filter(rator.data)[0]
+            if kind in UNARY_OPERATIONS or kind == "Conc":
+                # Conc applied to one argument gives Conc partially applied (see CSErule6)
+                argument = self._translate(rand, scope)
+                return self._assign(f"{self._inbuilt(kind)}({argument})")
+            if kind == "Y*":
+                return self._assign(f"_eta({self._translate(rand, scope)})")
+
+        elif rator.data == "gamma" and not rator.children[0].children \
+                and self._linearizer.filter(rator.children[0].data)[0] == "Conc":
+            right = self._translate(rand, scope)
+            left = self._translate(rator.children[1], scope)
+            return self._assign(f"_conc({left}, {right})")
+
+        elif rator.data == "lambda":
+            # a lambda applied on the spot (let and where) binds its variables in place
+            value = self._translate(rand, scope)
+            binder = rator.children[0]
+            scope = dict(scope)
+            self._emit("_frame()")
+            if binder.data == ",":
+                names = [self._bind(scope, self._linearizer.filter(child.data)[1]) for child in binder.children]
+                self._emit(f"{', '.join(names)}, = _unpack({value}, {len(names)})")
+            else:
+                if value.isidentifier() and value not in ("True", "False", "None"):
+                    # literals can be bound, names may hold dummy or Conc partially applied
+                    value = f"_bind({value})"
+                self._emit(f"{self._bind(scope, self._linearizer.filter(binder.data)[1])} = {value}")
+            result = self._translate(rator.children[1], scope)
+            self._emit("_leave()")
+            return result
+
+        elif rator.data == "gamma" and not self._inbuilt_spine(rator):
+            rands = []
+            while node.data == "gamma":
+                rands.append(self._translate(node.children[1], scope))
+                node = node.children[0]
+            function = self._translate(node, scope)
+            return self._assign(f"_spine({function}, {', '.join(reversed(rands))})")
+
+        argument = self._translate(rand, scope)
+        function = self._translate(rator, scope)
+        return self._assign(f"_call({function}, {argument})")
+
+    def _translate_conditional(self, node, scope):
+        condition = self._name(self._translate(node.children[0], scope))
+        result = self._new_name("_t")
+        # the CSE machine compares with == (CSErule8); _truth handles the values that are not bools
+        self._emit(f"if {condition} is True or {condition} is not False and _truth({condition}):")
+        self._indent += 1
+        self._emit(f"{result} = {self._translate(node.children[1], scope)}")
+        self._indent -= 1
+        self._emit("else:")
+        self._indent += 1
+        self._emit(f"{result} = {self._translate(node.children[2], scope)}")
+        self._indent -= 1
+        return result
+
+    def _translate_binary(self, node, scope):
+        op = node.data
+        right = self._translate(node.children[1], scope)
+        left = self._translate(node.children[0], scope)
+
+        if op in INTEGER_OPERATORS:
+            checks = [f"type({atom}) is int" for atom in (left, right) if not self._is_int_literal(atom)]
+            expression = f"{left} {INTEGER_OPERATORS[op]} {right}"
+            if checks:
+                expression += f" if {' and '.join(checks)} else _binop({left}, {right}, {op!r})"
+            return self._assign(expression)
+        if op == "aug":
+            return self._assign(f"_aug({left}, {right})")
+        if op in ("eq", "ne"):
+            # values of the same type are compared directly, tuples by apply_eq (see equal_values)
+            if self._is_int_literal(right):
+                check = f"type({left}) is int"
+            elif self._is_int_literal(left):
+                check = f"type({right}) is int"
+            else:
+                check = f"type({left}) is type({right}) and type({left}) is not _Tuple"
+            comparison = "==" if op == "eq" else "!="
+            return self._assign(f"{left} {comparison} {right} if {check} else _binop({left}, {right}, {op!r})")
+        if op in ("or", "&", "**"):
+            # ** checks its exponent, see apply_power
+            return self._assign(f"_binop({left}, {right}, {op!r})")
+        raise ValueError(f"Cannot translate operator: {op}")
+
+    ################################################################################################
+    # helper functions
+    ################################################################################################
+
+    def _emit(self, line):
+        self._lines.append("    " * self._indent + line)
+
+    def _new_name(self, prefix):
+        self._names += 1
+        return f"{prefix}{self._names}"
+
+    def _assign(self, expression):
+        name = self._new_name("_t")
+        self._emit(f"{name} = {expression}")
+        return name
+
+    def _name(self, atom):
+        """
+        Return the atom as a name, assigning a literal to a temporary.
+        """
+        return atom if atom.isidentifier() and atom not in ("True", "False", "None") else self._assign(atom)
+
+    def _bind(self, scope, variable):
+        """
+        Give an RPAL variable a Python name of its own in the scope; names are never reused, so
+        that nested defs always see the binding they were made in.
+        """
+        scope[variable] = self._new_name(f"v_{variable}_")
+        return scope[variable]
+
+    def _inbuilt(self, name):
+        self._inbuilts.add(name)
+        return f"_{name}"
+
+    def _inbuilt_spine(self, node):
+        """
+        Return whether an application spine starts with an inbuilt function, which is applied to
+        its first argument and not called like a lambda.
+        """
+        while node.data == "gamma":
+            node = node.children[0]
+        if node.children:
+            return False
+        kind = self._linearizer.filter(node.data)[0]
+        return kind in UNARY_OPERATIONS or kind == "Conc"
+
+    def _is_int_literal(self, atom):
+        return atom.lstrip("-").isdigit()
+
+
+class TranspiledMachine:
+    """
+    Engine running RPAL programs translated to Python.
+
+    The machine is also the runtime support (rt) of the generated code.
+
+    Attributes:
+        _error_handler (CseErrorHandler): Error handler instance for managing errors during execution.
+        source (str): The generated Python source.
+        code (code): The compiled program.
+        frames (int): The number of environments created so far.
+        max_frames (float): The limit on frames (math.inf for no limit).
+        depth (int): The number of live calls and lets.
+        max_call_depth (int): The limit on depth.
+        _print_queue (list): List to store the print data as queue generated during execution.
+        trace (bool): Whether the generated source is printed when an error occurs.
+        stats (MachineStatistics): Run statistics, or None when statistics are not collected.
+        max_digits (int): The limit on the digits of an integer converted to text.
+    """
+
+    caches_code = True
+
+    Closure = Closure
+    Tuple = Tuple
+    DUMMY = DUMMY
+    YSTAR = Y_STAR
+
+    def __init__(self, trace=False, flat_closures=True, collect_stats=False, max_call_depth=DEFAULT_MAX_CALL_DEPTH,
+                 max_frames=DEFAULT_MAX_FRAMES, max_digits=DEFAULT_MAX_DIGITS):
+        """
+        Initialize the TranspiledMachine.
+
+        Args:
+            trace (bool): Print the generated source when an error occurs.
+            flat_closures (bool): Unused; the generated defs close over Python variables.
+            collect_stats (bool): Collect run statistics (environments created only).
+            max_call_depth (int): The largest number of live calls (see cse_machine/limits.py).
+            max_frames (int): The largest number of environments created by calls, or None.
+            max_digits (int): The largest number of digits of an integer printed or converted
+                by ItoS.
+        """
+        self._error_handler = CseErrorHandler(self)
+        self._transpiler = PythonTranspiler()
+        self.source = None
+        self.code = None
+        self.frames = 0
+        self.max_frames = frame_limit(max_frames)
+        self.depth = 0
+        self.max_call_depth = max_call_depth
+        self.max_digits = max_digits
+        self._cache_file = None
+        self._print_queue = list()
+        self.trace = trace
+        self.stats = MachineStatistics() if collect_stats else None
+        self.inbuilt = self._inbuilt_functions()
+
+    def execute(self, st_tree):
+        """
+        Translate, compile and execute the given Standardized Tree (ST).
+
+        Args:
+            st_tree (Node): The root node of the Standardized Tree (ST) to execute.
+        """
+        self.source = self._transpiler.translate(st_tree)
+        self.code = compile(self.source, "<rpal>", "exec")
+        if self._cache_file:
+            self._write_cache(self._cache_file)
+        self.run()
+
+    def execute_cached(self, rpal_source, cache_dir):
+        """
+        Execute the program from the cache if it was translated before.
+
+        On a miss, the program is cached by the next call of execute.
+
+        Args:
+            rpal_source (str): The RPAL source of the program.
+            cache_dir (str): The cache directory.
+
+        Returns:
+            bool: Whether the program was found in the cache and executed.
+        """
+        key = hashlib.sha256(rpal_source.encode()).hexdigest()
+        self._cache_file = os.path.join(cache_dir, f"{key}.v{TRANSPILER_VERSION}.marshal")
+        try:
+            with open(self._cache_file, "rb") as cache:
+                magic, self.source, self.code = marshal.load(cache)
+        except (OSError, EOFError, ValueError, TypeError):
+            return False
+        if magic != importlib.util.MAGIC_NUMBER:
+            return False
+        self._cache_file = None
+        self.run()
+        return True
+
+    def run(self):
+        """
+        Run the compiled program.
+        """
+        namespace = dict()
+        exec(self.code, namespace)
+        self.depth = 0
+        limit = sys.getrecursionlimit()
+        recursion_limit = python_recursion_limit(self.max_call_depth)
+        sys.setrecursionlimit(recursion_limit)
+        try:
+            namespace[PROGRAM_NAME](self)
+        except RecursionError:
+            self._error_handler.handle_error(recursion_limit_error(recursion_limit))
+        finally:
+            sys.setrecursionlimit(limit)
+            if self.stats:
+                self.stats.environments_created = self.frames
+
+    ################################################################################################
+    # runtime support of the generated code
+    ################################################################################################
+
+    def call(self, rator, rand):
+        """
+        Apply a value to an argument (CSE rules 4, 10, 11, 12 and 13).
+        """
+        kind = type(rator)
+        if kind is Closure:
+            if type(rand) not in BINDABLE_TYPES and len(rator.params) == 1:
+                return self._error_handler.handle_error("CSE : Invalid type")
+            if self.frames >= self.max_frames:
+                return self._error_handler.handle_error(frame_limit_error(self.max_frames))
+            if self.depth >= self.max_call_depth:
+                return self._error_handler.handle_error(call_depth_error(self.max_call_depth))
+            self.frames += 1
+            self.depth += 1
+            value = rator.body(rand)
+            self.depth -= 1
+            return value
+        if kind is Tuple:
+            if type(rand) is not int or not 0 < rand <= rator.length:
+                return self._error_handler.handle_error("CSE : Invalid index")
+            return rator.items[rand - 1]
+        if kind is Eta:
+            return self.call(self.unfold(rator), rand)
+        if kind is ConcPartial:
+            return self.conc(rator.value, rand)
+        if kind is YStar:
+            return self.eta(rand)
+        return self._error_handler.handle_error("CSE : Invalid control structure")
+
+    def call_spine(self, rator, *rands):
+        """
+        Apply a value to several arguments (f a b c), binding them in one environment when it
+        is a curried lambda with no more parameters than there are arguments.
+        """
+        if type(rator) is Eta:
+            rator = self.unfold(rator)
+        i = 0
+        if type(rator) is Closure and rator.uncurried and rator.uncurried[0] <= len(rands):
+            m, body = rator.uncurried
+            if not BINDABLE_TYPES.issuperset(map(type, rands[:m])):
+                return self._error_handler.handle_error("CSE : Invalid type")
+            self.frame()
+            rator = body(rands if m == len(rands) else rands[:m])
+            self.depth -= 1
+            i = m
+        while i < len(rands):
+            rator = self.call(rator, rands[i])
+            i += 1
+        return rator
+
+    def unfold(self, eta):
+        """
+        Apply the lambda of an eta to the eta itself (CSE rule 13).
+        """
+        return self.call(Closure(eta.body, eta.env, eta.params, eta.index, eta.uncurried), eta)
+
+    def frame(self):
+        """
+        Count a new environment and enter it (see leave).
+        """
+        if self.frames >= self.max_frames:
+            self._error_handler.handle_error(frame_limit_error(self.max_frames))
+        if self.depth >= self.max_call_depth:
+            self._error_handler.handle_error(call_depth_error(self.max_call_depth))
+        self.frames += 1
+        self.depth += 1
+
+    def leave(self):
+        """
+        Leave the environment of a let.
+        """
+        self.depth -= 1
+
+    def bind(self, value):
+        """
+        Return a value bound to a variable, which the CSE machine cannot do for every value.
+        """
+        if type(value) not in BINDABLE_TYPES:
+            return self._error_handler.handle_error("CSE : Invalid type")
+        return value
+
+    def truth(self, value):
+        if value == True:
+            return True
+        if value == False:
+            return False
+        return self._error_handler.handle_error("CSE : Invalid type for condition")
+
+    def unpack(self, value, n):
+        if type(value) is Tuple and value.length == n:
+            return value
+        return self._error_handler.handle_error("CSE : Invalid number of arguments")
+
+    def binop(self, rator, rand, op):
+        return apply_binary_operations(self, rator, rand, op)
+
+    def aug(self, rator, rand):
+        return apply_aug(self, rator, rand)
+
+    def conc(self, rator, rand):
+        if is_string(rator) and is_string(rand):
+            return concat(rator, rand)
+        return self._error_handler.handle_error("CSE : Invalid type for concatenation")
+
+    def eta(self, lambda_):
+        if type(lambda_) is not Closure:
+            return self._error_handler.handle_error("CSE : expected lambda")
+        return Eta(lambda_.body, lambda_.env, lambda_.params, lambda_.index, lambda_.uncurried)
+
+    def inbuilt_value(self, name):
+        # an inbuilt function that is not applied fails on the CSE machine, see ClosureCompiler._inbuilt
+        return self._error_handler.handle_error("CSE : Invalid control structure")
+
+    def unbound(self, name):
+        return self._error_handler.handle_error(f"CSE : Variable [{name}] not found in the environment")
+
+    ##############################################################################################################
+    # helper functions
+    ##############################################################################################################
+
+    def _inbuilt_functions(self):
+        """
+        Return the inbuilt functions as functions of one value, applied by the generated code.
+        """
+        def bind(operation):
+            return lambda value: operation(self, value)
+
+        def conc(value):
+            if not is_string(value):
+                return self._error_handler.handle_error("CSE : Invalid type for concatenation")
+            return ConcPartial(value)
+
+        inbuilt = {name: bind(operation) for name, operation in UNARY_OPERATIONS.items()}
+        inbuilt["Conc"] = conc
+        return inbuilt
+
+    def _write_cache(self, cache_file):
+        try:
+            # only the user may write the code that later runs are to execute
+            os.makedirs(os.path.dirname(cache_file), mode=0o700, exist_ok=True)
+            with open(cache_file, "wb") as cache:
+                marshal.dump((importlib.util.MAGIC_NUMBER, self.source, self.code), cache)
+        except OSError:
+            pass  # the cache is an optimization only
+
+    def _print_cse_table(self):
+        print()
+        print("Generated Python", end="\n\n")
+        print(self.source)
+
+    def _generate_output(self):
+        return "".join(self._print_queue)+"\n"
+
+    def _generate_raw_output(self):
+        return raw(self._generate_output())
@@ -6,6 +6,8 @@ Usage
 This module can be imported and used to apply uninary operations to operands in the CSE machine.
 """
 
+from cse_machine.runtime import Closure, Tuple, format_value, int_to_str, is_string, stem, stern
+
 
 def apply_unary_operations(cse_machine, rator, unop):
     """
@@ -13,38 +15,18 @@ def apply_unary_operations(cse_machine, rator, unop):
 
     Args:
         cse_machine (CSEMachine): The CSE machine instance.
-        rator_e (RatorExpr): The operand expression.
+        rator (any): The operand value.
         unop (str): The unary operation to apply.
 
     Returns:
-        Expr: The result of the operation.
+        any: The result of the operation.
 
     Raises:
         ValueError: If the unary operation is not recognized.
     """
 
-    # Extract the operator from the RatorExpr
-    rator_value = rator.value
-
-    # Dictionary mapping binary operators to their corresponding functions
-    unary_operators = {
-            "Print"       : lambda cse_machine, operand: apply_print(cse_machine, operand),
-            "Isstring"    : lambda cse_machine, operand: operand.type == "STR",
-            "Isinteger"   : lambda cse_machine, operand: operand.type == "INT" ,
-            "Istruthvalue": lambda cse_machine, operand: operand.type == "bool",
-            "Isfunction"  : lambda cse_machine, operand: operand.type == "lambda",
-            "Null"        : lambda cse_machine, operand: operand.type == "nil",
-            "Istuple"     : lambda cse_machine, operand: isinstance(operand.value, list) or operand.type == "nil",
-            "Order"       : lambda cse_machine, operand: apply_order(cse_machine, operand),
-            "Stern"       : lambda cse_machine, operand: apply_stern(cse_machine, operand.value),
-            "Stem"        : lambda cse_machine, operand: apply_stem(cse_machine, operand.value),
-            "ItoS"        : lambda cse_machine, operand: str(operand.value) if isinstance(operand.value, int) and not isinstance(operand.value, bool) else cse_machine._error_handler.handle_error("CSE : Invalid unary operation"),
-            "neg"         : lambda cse_machine, operand: -operand.value if isinstance(operand.value, int) else cse_machine._error_handler.handle_error("CSE : Invalid unary operation"),
-            "not"         : lambda cse_machine, operand: not operand.value if isinstance(operand.value, bool) else cse_machine._error_handler.handle_error("CSE : Invalid unary operation"),
-        }
-    
-    # Get the operation function corresponding to the binary operator
-    operation_function = unary_operators.get(unop)
+    # Get the operation function corresponding to the unary operator
+    operation_function = UNARY_OPERATIONS.get(unop)
 
     if operation_function:
         # Apply the operation function with the provided operands
@@ -60,53 +42,19 @@ def apply_print(cse_machine, operand):
 
     Args:
         cse_machine (CSEMachine): The CSE machine instance.
-        operand (Expr): The operand expression.
+        operand (any): The operand value.
 
     Returns:
-        Expr: A dummy value.
+        str: A dummy value.
 
     """
     
-    element = operand.value
-    
-    # Define the covertToString function
-    def covert_to_string(element):
-        if isinstance(element, list):
-            out = ""
-            return convert_list(element,out)
-        elif element == "lambda":
-            x = "".join(x for x in operand.bounded_variable)
-            k = str(operand.control_structure)
-            return "[lambda closure: " + x + ": " + k + "]"
-        elif isinstance(element, bool):
-            return "true" if element else "false"
-        elif isinstance(element, str):
-            return element
-        elif isinstance(element, int):
-            return str(element)
-        elif element == None:
-            return "nil"
-        else:
-            raise TypeError("Unknown element type.")
-        
-    def convert_list(element,out):
-        if isinstance(element, list):
-            out += "("
-            for el in element:
-                out = convert_list(el,out)
-            out = out[:-2] +  ")"
-        else:
-            if isinstance(element.value, list):
-                out += "("
-                for el in element.value:
-                    out = convert_list(el,out)
-                out = out[:-2] +  "), "
-            else:
-                out += covert_to_string(element.value) + ", "
-        return out
-    
-    # convert the element to a string
-    cse_machine._print_queue.append(covert_to_string(element).replace("\\n", "\n").replace("\\t", "\t"))
+    # convert the value to a string (integers up to the digit limit of the machine)
+    try:
+        text = format_value(operand, cse_machine.max_digits)
+    except OverflowError as error:
+        return cse_machine._error_handler.handle_error(f"CSE : {error}")
+    cse_machine._print_queue.append(text.replace("\\n", "\n").replace("\\t", "\t"))
     
     # Return a dummy value
     return "dummy"
@@ -119,18 +67,18 @@ def apply_order(cse_machine, operand):
 
     Args:
         cse_machine (CSEMachine): The CSE machine instance.
-        operand (Expr): The operand expression.
+        operand (any): The operand value.
 
     Returns:
-        int: The ASCII value of the first character of the operand.
+        int: The number of components of the tuple.
 
     Raises:
-        ValueError: If the operand is not a string.
+        ValueError: If the operand is not a tuple.
     """
     
-    if isinstance(operand.value, list):
-        return len(operand.value)
-    elif operand.type == "nil":
+    if type(operand) is Tuple:
+        return operand.length
+    elif operand is None:
         return 0
     else:
         cse_machine._error_handler.handle_error("CSE : Invalid unary operation")
@@ -151,8 +99,8 @@ def apply_stern(cse_machine, operand):
         ValueError: If the operand is not a string or is empty.
     """
     
-    if isinstance(operand, str) and len(operand) >= 1:
-        return operand[1:]
+    if is_string(operand) and len(operand) >= 1:
+        return stern(operand)
     else:
         cse_machine._error_handler.handle_error("CSE : Invalid unary operation")
 
@@ -172,8 +120,85 @@ def apply_stem(cse_machine, operand):
         ValueError: If the operand is not a string or is empty.
     """
     
-    if isinstance(operand, str) and len(operand) >= 1:
-        return operand[0]
+    if is_string(operand) and len(operand) >= 1:
+        return stem(operand)
     else:
         cse_machine._error_handler.handle_error("CSE : Invalid unary operation")
-        
\ No newline at end of file
+
+# Function to apply the ItoS unary operator
+def apply_itos(cse_machine, operand):
+    """
+    Apply the ItoS unary operation to an operand.
+
+    Args:
+        cse_machine (CSEMachine): The CSE machine instance.
+        operand (int): The operand value.
+
+    Returns:
+        str: The decimal digits of the operand.
+    """
+    if isinstance(operand, int) and not isinstance(operand, bool):
+        try:
+            return int_to_str(operand, cse_machine.max_digits)
+        except OverflowError as error:
+            return cse_machine._error_handler.handle_error(f"CSE : {error}")
+    cse_machine._error_handler.handle_error("CSE : Invalid unary operation")
+
+# Function to apply the neg unary operator
+def apply_neg(cse_machine, operand):
+    """
+    Apply the neg unary operation to an operand.
+
+    Args:
+        cse_machine (CSEMachine): The CSE machine instance.
+        operand (int): The operand value.
+
+    Returns:
+        int: The negated operand.
+    """
+    if isinstance(operand, int):
+        return -operand
+    cse_machine._error_handler.handle_error("CSE : Invalid unary operation")
+
+# Function to apply the not unary operator
+def apply_not(cse_machine, operand):
+    """
+    Apply the not unary operation to an operand.
+
+    Args:
+        cse_machine (CSEMachine): The CSE machine instance.
+        operand (bool): The operand value.
+
+    Returns:
+        bool: The negated truth value.
+    """
+    if isinstance(operand, bool):
+        return not operand
+    cse_machine._error_handler.handle_error("CSE : Invalid unary operation")
+
+# Unary operators and inbuilt functions and the functions that apply them, as called by
+# apply_unary_operations: function(cse_machine, operand)
+UNARY_OPERATIONS = {
+        "Print"       : apply_print,
+        "Isstring"    : lambda cse_machine, operand: is_string(operand),
+        "Isinteger"   : lambda cse_machine, operand: type(operand) is int,
+        "Istruthvalue": lambda cse_machine, operand: type(operand) is bool,
+        "Isfunction"  : lambda cse_machine, operand: type(operand) is Closure,
+        "Null"        : lambda cse_machine, operand: operand is None,
+        "Istuple"     : lambda cse_machine, operand: type(operand) is Tuple or operand is None,
+        "Order"       : apply_order,
+        "Stern"       : apply_stern,
+        "Stem"        : apply_stem,
+        "ItoS"        : apply_itos,
+        "neg"         : apply_neg,
+        "not"         : apply_not,
+    }
+
+# Operations specialized by type inference (see infer_types in cse_machine/analysis.py). The
+# operand is proven to have the operand type, so the function is applied without the checks of
+# apply_unary_operations.
+# element type: (operator, operand type, function, result type)
+SPECIALIZED_UNARY_OPERATIONS = {
+        "INT_NEG" : ("neg", "INT",  lambda a: -a,    "INT"),
+        "BOOL_NOT": ("not", "bool", lambda a: not a, "bool"),
+    }
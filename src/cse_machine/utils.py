@@ -1,13 +1,27 @@
 ####################################################################################################
 # cse machine helpers functions
 ####################################################################################################
-def var_lookup(cse_machine , var_name):
+from cse_machine.environment import Environment
+from cse_machine.runtime import DUMMY, Y_STAR, Closure, Eta, RecursiveClosure, ConcPartial, Rope, Tuple, int_to_str
+from utils.control_structure_element import EnvironmentMarker
+from cse_machine.binop import SPECIALIZED_BINARY_OPERATIONS
+from cse_machine.unop import SPECIALIZED_UNARY_OPERATIONS
+
+def var_lookup(cse_machine , var_name, site=None):
     """
     Searches the current environment for a variable with the given name.
 
+    With a site (the ID element being looked up) the search goes through the inline cache of
+    the element: the number of parent hops of the last lookup, guarded by the layout id of the
+    environment it was made in. When the current environment has the same layout the variable
+    is that many hops away, and the frames in between are not searched. The caches are kept by
+    the machine (lookup_caches, indexed by the site number of the element), so the compiled
+    program is not changed by a run.
+
     Args:
         cse_machine (CSE_Machine): The CSE machine that is currently running.
         var_name (str): The name of the variable to search for.
+        site (ControlStructureElement): The ID element the name comes from, or None.
 
     Returns:
         Any: The value of the variable, or None if the variable was not found.
@@ -16,41 +30,154 @@ def var_lookup(cse_machine , var_name):
         CSEError: If the variable was not found and no default value was provided.
     """
     env_pointer = cse_machine.current_enviroment
+    if site is not None:
+        shape = env_pointer.shape
+        if shape is None:
+            shape = env_pointer.layout(cse_machine.layouts)
+        cache = cse_machine.lookup_caches[site.site]
+        if cache is not None and cache[0] == shape:
+            for _ in range(cache[1]):
+                env_pointer = env_pointer.parent
+            if cse_machine.stats:
+                cse_machine.stats.count_lookup(True, cache[1])
+            return env_pointer._environment[var_name]
+    hops = 0
     while env_pointer:
         if var_name in env_pointer._environment:
             out = env_pointer._environment[var_name]
+            if site is not None:
+                cse_machine.lookup_caches[site.site] = (shape, hops)
+                if cse_machine.stats:
+                    cse_machine.stats.count_lookup(False, hops)
             return out
         env_pointer = env_pointer.parent
+        hops += 1
     else:
         cse_machine._error_handler.handle_error(f"CSE : Variable [{var_name}] not found in the environment")
 
+# Types of the values that can be bound to a variable
+BINDABLE_TYPES = {int, bool, str, Rope, Tuple, type(None), Closure, Eta, RecursiveClosure}
+
+# Result of Environment.lookup for a variable that is not bound (nil is None)
+UNBOUND = object()
+
+# Values of the literal elements that are not held in their value
+LITERALS = {"dummy": DUMMY, "Y*": Y_STAR}
+
+def literal_value(element):
+    """
+    Return the value of a literal element (INT, STR, bool, nil, dummy or Y*).
+
+    Args:
+        element (ControlStructureElement): The literal element.
+
+    Returns:
+        any: The value.
+    """
+    return LITERALS.get(element.type, element.value)
+
+def bind_variable(cse_machine, env, name, rand):
+    """
+    Bind a value popped from the stack to a variable of a new environment.
+
+    Args:
+        cse_machine (CSE_Machine): The CSE machine that is currently running.
+        env (Environment): The new environment.
+        name (str): The name of the variable.
+        rand (any): The value to bind.
+
+    Raises:
+        CSEError: If the value cannot be bound to a variable.
+    """
+    if type(rand) in BINDABLE_TYPES:
+        env._environment[name] = rand
+    else:
+        cse_machine._error_handler.handle_error("CSE : Invalid type")
+
+def capture_free_variables(cse_machine, names):
+    """
+    Build the flat closure environment for a lambda with the given free variables.
+
+    Only the referenced values are copied, so the closure does not keep the frames of the
+    current environment chain alive. Names that are not bound are skipped; referencing them
+    later still fails in the usual way.
+
+    Args:
+        cse_machine (CSE_Machine): The CSE machine that is currently running.
+        names (tuple): The free variables of the lambda.
+
+    Returns:
+        Environment: The closure environment.
+    """
+    primitive_environment = cse_machine.primitive_environment
+    if not names:
+        return primitive_environment
+    # The current chain can be shared as it is when every value it holds is referenced
+    current = cse_machine.current_enviroment
+    env = current
+    while env is not primitive_environment and all(name in names for name in env._environment):
+        env = env.parent
+    if env is primitive_environment:
+        return current
+    closure_env = Environment(next(cse_machine.environment_ids))
+    for name in names:
+        value = current.lookup(name, UNBOUND)
+        if value is not UNBOUND:
+            closure_env.add_var(name, value)
+    closure_env.parent = primitive_environment
+    if cse_machine.stats:
+        cse_machine.stats.track_environment(closure_env)
+    return closure_env
+
+def recursive_closure(cse_machine, definition, lambda_):
+    """
+    Build the closure of a recursive definition rec f = lambda x. E directly, instead of going
+    through Y* and an eta: the environment of the closure binds f to the closure itself.
+
+    The closure is a RecursiveClosure, so that it prints and tests (Isfunction) like the eta
+    it replaces.
+
+    Args:
+        cse_machine (CSE_Machine): The CSE machine that is currently running.
+        definition (ControlStructureElement): The lambda f element that Y* is applied to.
+        lambda_ (ControlStructureElement): The lambda x element, the body of the definition.
+
+    Returns:
+        RecursiveClosure: The closure.
+    """
+    if cse_machine.flat_closures and definition.free_variables is not None:
+        parent = capture_free_variables(cse_machine, definition.free_variables)
+    else:
+        parent = cse_machine.current_enviroment
+    env = Environment(next(cse_machine.environment_ids))
+    closure = RecursiveClosure(None, env, lambda_.bounded_variable, lambda_.control_structure)
+    env.add_var(definition.bounded_variable[0], closure)
+    env.parent = parent
+    if cse_machine.stats:
+        cse_machine.stats.track_environment(env)
+    return closure
+
 ####################################################################################################
 # Printer helper functions
 ################################################################################################
     
 def convert_list(element,out):
-    """Convert a list to a string.
+    """Convert a tuple to a string.
 
     Args:
-        element (list): The list to convert.
-        out (str): The string to append the converted list to.
+        element (Tuple): The tuple to convert.
+        out (str): The string to append the converted tuple to.
 
     Returns:
-        str: The string with the converted list appended to it.
+        str: The string with the converted tuple appended to it.
     """
-    if isinstance(element, list):
-        out += "("
-        for el in element:
-            out = convert_list(el,out)
-        out = out[:-1] +  ")"
-    else:
-        if isinstance(element.value, list):
-            out += "("
-            for el in element.value:
-                out = convert_list(el,out)
-            out = out[:-1] +  "),"
+    out += "("
+    for el in element:
+        if type(el) is Tuple:
+            out = convert_list(el,out) + ","
         else:
-            out += str(element.value) + ","
+            out += str(value_val(el)) + ","
+    out = out[:-1] +  ")"
     return out
 
 def raw(string):
@@ -76,7 +203,10 @@ def add_table_data_decorator(table_entry):
     def decorator(func):
         @functools.wraps(func)
         def wrapper(self, *args, **kwargs):
-            self._add_table_data(table_entry)
+            if self.trace:
+                self._add_table_data(table_entry)
+            if self.stats:
+                self.stats.count_rule(table_entry)
             return func(self, *args, **kwargs)
         return wrapper
     return decorator
@@ -96,9 +226,9 @@ def print_cse_table(cse_machine):
     print("\nRULE | CONTROL" +  " " * (control_width-6) + "|"+" "*(stack_width-5)+" STACK " + "| ENV")
     print("-" * total_width)
     for data in table_data:
-        rule = f"{data[0]:<2} |"
+        rule = f"{data[0]:<3}|"
         control = " ".join(str(element_val(element)) for element in data[1])
-        stack = " ".join(str(element_val(element)) for element in data[2][::-1])
+        stack = " ".join(str(value_val(value)) for value in data[2][::-1])
         env = f" {data[-1][0]}"
         l = len(control)
         control_str = f"{control[max(0, l - control_width):]:<{control_width}}"
@@ -112,6 +242,31 @@ def print_cse_table(cse_machine):
 # helper functions for cse table
 ################################################################################################
         
+def value_val(value):
+    """Get the text of a value on the stack.
+
+    Args:
+        value (any): The value (or environment marker).
+
+    Returns:
+        Any: The text of the value.
+    """
+    kind = type(value)
+    if kind is Tuple:
+        return convert_list(value,"")
+    elif kind is EnvironmentMarker:
+        return f"e{value.env.index}"
+    elif kind is Closure or kind is RecursiveClosure:
+        return f"λ_{value.index}{value.params}"
+    elif kind is Eta:
+        return f"η_{value.index}[{value.params}]"
+    elif kind is ConcPartial:
+        return value.value
+    elif kind is int:
+        return int_to_str(value)
+    else:
+        return value
+
 def element_val(element):
     """Get the value of a given element.
 
@@ -121,22 +276,28 @@ def element_val(element):
     Returns:
         Any: The value of the element.
     """
-    if element.type == "tuple":
-        output = ""
-        return convert_list(element.value,output)
-    elif element.type == "env_marker":
+    if element.type == "env_marker":
         return f"e{element.env.index}"
     elif element.type == "lambda":
         return f"λ_{element.control_structure}{element.bounded_variable}"
     elif element.type == "delta":
         return f"δ_{element.control_structure}"
     elif element.type == "gamma":
-        return "γ"
+        return f"γ({element.arity})" if element.arity else "γ"
     elif element.type == "beta":
         return "β"
-    elif element.type == "eta":
-        return f"η_{element.control_structure}[{element.bounded_variable}]"
     elif element.type == "tau":
         return f"tau[{element.value}]"
+    elif element.type == "fused_binop":
+        return f"{element.operator or element.value}({element.operands[0].value},{element.operands[1].value})"
+    elif element.type == "fused_inbuilt":
+        return f"γ{element.value}({element.operands[0].value})" if element.operands else f"γ{element.value}"
+    elif element.type in SPECIALIZED_BINARY_OPERATIONS or element.type in SPECIALIZED_UNARY_OPERATIONS:
+        return element.type
+    elif element.type == "rec_lambda":
+        definition, lambda_ = element.operands
+        return f"rec λ_{definition.control_structure}{definition.bounded_variable}"
+    elif element.type == "fused_beta":
+        return f"β(δ_{element.operands[0].control_structure},δ_{element.operands[1].control_structure})"
     else:
         return element.value 
\ No newline at end of file
@@ -0,0 +1,450 @@
+"""
+Bytecode Virtual Machine for Executing RPAL Programs.
+
+Description:
+This file contains the VirtualMachine class, an alternative execution engine to the CSEMachine. The
+control structures produced by the linearizer are compiled to bytecode (see cse_machine/bytecode.py)
+and run by a single loop over call frames of (code, pc, env). A call pushes a frame instead of copying
+the elements of a δ onto a control stack, a call in tail position replaces the frame, a return pops
+it, and conditionals are jumps.
+
+The machine works on the same values and environments as the CSE machine, so both engines give the
+same results and the same output. Every frame has an environment marker on the value stack, below the
+values of its code, like the CSE machine: an inbuilt function used as a value (Print or Conc not
+applied to its arguments) takes the marker as an operand instead of a value of the caller, and fails
+with the same error.
+
+Example Usage:
+   vm = VirtualMachine()
+   vm.execute(st_tree)
+   print(vm._generate_output())
+"""
+
+import itertools
+
+from cse_machine.bytecode import (BytecodeCompiler, CodeCache, OPNAMES, LOAD_CONST, LOAD_NAME, MAKE_CLOSURE,
+                                  BUILD_TUPLE, APPLY, BINARY, UNARY, CONC, JUMP_IF_FALSE, JUMP, MAKE_REC_CLOSURE)
+from cse_machine.error_handler import CseErrorHandler
+from cse_machine.environment import Environment, PRIMITIVE_ENVIRONMENT
+from cse_machine.limits import (DEFAULT_MAX_CALL_DEPTH, DEFAULT_MAX_FRAMES, DEFAULT_MAX_DIGITS, frame_limit,
+                                 call_depth_error, frame_limit_error)
+from cse_machine.program import Program
+from cse_machine.stats import MachineStatistics
+from cse_machine.stlinearizer import Linearizer
+from cse_machine.utils import raw, bind_variable, capture_free_variables, recursive_closure
+from cse_machine.binop import apply_binary_operations, apply_aug
+from cse_machine.unop import apply_unary_operations
+from cse_machine.runtime import Closure, Eta, RecursiveClosure, YStar, ConcPartial, Tuple, is_string
+from utils.control_structure_element import EnvironmentMarker
+
+
+class VirtualMachine:
+    """
+    Bytecode virtual machine for executing RPAL programs.
+
+    Attributes:
+        _error_handler (CseErrorHandler): Error handler instance for managing errors during execution.
+        control_structures (list): List of control structures extracted from the Standardized Tree (ST).
+        uncurried (dict): The uncurried lambdas found by the linearizer.
+        codes (dict): The compiled Code of each lambda body, by control structure index.
+        current_enviroment (Environment): The environment of the running frame.
+        environment_ids (itertools.count): The numbers of the environments created by the machine.
+        stack (list): The value stack.
+        _print_queue (list): List to store the print data as queue generated during execution.
+        trace (bool): Whether the bytecode is printed when an error occurs.
+        flat_closures (bool): Whether closures capture only their free variables.
+        stats (MachineStatistics): Run statistics, or None when statistics are not collected.
+        call_depth (int): The number of live calls below the code being run (set by a CSE machine
+            that runs a hot body here).
+        frames_created (int): The number of environments created by calls.
+        max_call_depth (int): The limit on live calls.
+        max_frames (float): The limit on frames_created (math.inf for no limit).
+        max_digits (int): The limit on the digits of an integer converted to text.
+    """
+
+    def __init__(self, trace=False, flat_closures=True, collect_stats=False, max_call_depth=DEFAULT_MAX_CALL_DEPTH,
+                 max_frames=DEFAULT_MAX_FRAMES, max_digits=DEFAULT_MAX_DIGITS):
+        """
+        Initialize the VirtualMachine with necessary components.
+
+        Args:
+            trace (bool): Print the bytecode when an error occurs.
+            flat_closures (bool): Build flat closures from the free variables of each lambda.
+            collect_stats (bool): Collect run statistics (opcode counts instead of rule counts).
+            max_call_depth (int): The largest number of live calls (see cse_machine/limits.py).
+            max_frames (int): The largest number of environments created by calls, or None.
+            max_digits (int): The largest number of digits of an integer printed or converted
+                by ItoS.
+        """
+        self._error_handler = CseErrorHandler(self)
+        self._linearizer = Linearizer()
+        self._compiler = BytecodeCompiler()
+
+        self.primitive_environment = PRIMITIVE_ENVIRONMENT
+        self.environment_ids = itertools.count(1)
+        self.current_enviroment = self.primitive_environment
+
+        self.control_structures = None
+        self.uncurried = dict()
+        self.codes = dict()
+        self.stack = list()
+
+        self._print_queue = list()
+        self.trace = trace
+        self.flat_closures = flat_closures
+        self.stats = MachineStatistics() if collect_stats else None
+
+        # Resource limits
+        self.call_depth = 0
+        self.frames_created = 0
+        self.max_call_depth = max_call_depth
+        self.max_frames = frame_limit(max_frames)
+        self.max_digits = max_digits
+
+    def compile(self, st_tree):
+        """
+        Compile the given Standardized Tree (ST) into a program with the bytecode of every lambda
+        body (see cse_machine/program.py).
+
+        Args:
+            st_tree (Node): The root node of the Standardized Tree (ST).
+
+        Returns:
+            Program: The read-only program, which execute_program runs.
+        """
+        control_structures = self._linearizer.linearize(st_tree)
+        uncurried = self._linearizer.uncurried
+        codes = self._compiler.compile(control_structures, uncurried)
+        return Program(control_structures, uncurried, self._linearizer.sites, codes)
+
+    def execute(self, st_tree):
+        """
+        Compile and execute the given Standardized Tree (ST).
+
+        Args:
+            st_tree (Node): The root node of the Standardized Tree (ST) to execute.
+        """
+        self.execute_program(self.compile(st_tree))
+
+    def execute_program(self, program):
+        """
+        Execute a compiled program. The program is only read, so it can be executed again, and by
+        other machines at the same time.
+
+        Args:
+            program (Program): The program, compiled by a virtual machine.
+        """
+        self.control_structures = program.control_structures
+        self.uncurried = program.uncurried
+        self.codes = program.codes
+
+        # reset the state of the previous run
+        self.environment_ids = itertools.count(1)
+        self.current_enviroment = self.primitive_environment
+        self.stack = list()
+        self._print_queue = list()
+        self.call_depth = 0
+        self.frames_created = 0
+        if self.stats is not None:
+            self.stats = MachineStatistics()
+
+        try:
+            self.run(self.codes[0])
+        except IndexError:
+            # an inbuilt function used as a value took more operands than the stack holds
+            self._error_handler.handle_error("CSE : Missing operand")
+
+    def attach(self, machine):
+        """
+        Run code on behalf of a CSE machine (tiered execution): share its control structures,
+        environment numbering, print queue and statistics. Control structures are compiled the
+        first time they are run.
+
+        Args:
+            machine (CSEMachine): The machine.
+        """
+        self.control_structures = machine.control_structures
+        self.uncurried = machine.uncurried
+        self.primitive_environment = machine.primitive_environment
+        self.environment_ids = machine.environment_ids
+        self._print_queue = machine._print_queue
+        self.stats = machine.stats
+        self.codes = CodeCache(self._compiler, self.control_structures, self.stats)
+
+    def run(self, code):
+        """
+        Run the given code in the current environment until it returns.
+
+        Args:
+            code (Code): The code to run.
+        """
+        codes = self.codes
+        uncurried = self.uncurried
+        stats = self.stats
+        stack = self.stack
+        push = stack.append
+        pop = stack.pop
+        error = self._error_handler.handle_error
+        # the live calls of this run are its frames, on top of the calls that are already live
+        max_frames = self.max_call_depth - self.call_depth
+
+        frames = []
+        ops = code.ops
+        args = code.args
+        pc = 0
+        env = self.current_enviroment
+        push(EnvironmentMarker(env))
+
+        while True:
+            if pc == len(ops):
+                # return to the caller: the value of the code is on top of its environment marker
+                if len(stack) < 2:
+                    error("CSE : Invalid environment")
+                value = pop()
+                marker = pop()
+                if type(marker) is not EnvironmentMarker or marker.env is not env:
+                    error("CSE : Invalid environment")
+                push(value)
+                if not frames:
+                    break
+                code, pc, env = frames.pop()
+                ops = code.ops
+                args = code.args
+                self.current_enviroment = env
+                continue
+
+            op = ops[pc]
+            arg = args[pc]
+            pc += 1
+            if stats:
+                stats.count_rule(OPNAMES[op])
+
+            if op == LOAD_NAME:
+                e = env
+                while e:
+                    if arg in e._environment:
+                        var = e._environment[arg]
+                        break
+                    e = e.parent
+                else:
+                    error(f"CSE : Variable [{arg}] not found in the environment")
+                push(var)
+
+            elif op == LOAD_CONST:
+                push(arg)
+
+            elif op == JUMP_IF_FALSE:
+                val = pop()
+                if val == True:
+                    pass
+                elif val == False:
+                    pc = arg
+                else:
+                    error("CSE : Invalid type for condition")
+
+            elif op == JUMP:
+                pc = arg
+
+            elif op == BINARY:
+                rator = pop()
+                rand = pop()
+                if arg == "aug":
+                    push(apply_aug(self, rator, rand))
+                else:
+                    push(apply_binary_operations(self, rator, rand, arg))
+
+            elif op == MAKE_CLOSURE:
+                if self.flat_closures and arg.free_variables is not None:
+                    closure_env = capture_free_variables(self, arg.free_variables)
+                else:
+                    closure_env = env
+                push(Closure(None, closure_env, arg.bounded_variable, arg.control_structure))
+
+            elif op == MAKE_REC_CLOSURE:
+                push(recursive_closure(self, *arg.operands))
+
+            elif op == APPLY:
+                rator = stack[-1]
+                kind = type(rator)
+                if kind is RecursiveClosure:
+                    kind = Closure
+                spine, arity = arg
+
+                if arity and kind is not Eta:
+                    pop()
+                    if kind is Closure and len(rator.params) == arity:
+                        # the tuple argument was left on the stack as separate values (rule 11s)
+                        new_env = Environment(next(self.environment_ids))
+                        for var in rator.params:
+                            new_env.add_var(var, pop())
+                        k = rator.index
+                        new_env.parent = rator.env
+                        self._enter_frame(frames, max_frames, code, pc, env)
+                        if stats:
+                            stats.track_environment(new_env)
+                        push(EnvironmentMarker(new_env))
+                        code = codes[k]
+                        ops = code.ops
+                        args = code.args
+                        pc = 0
+                        env = self.current_enviroment = new_env
+                        continue
+                    # build the tuple after all and apply as usual
+                    tup = []
+                    for i in range(arity):
+                        tup.append(pop())
+                    push(Tuple(tup))
+                    push(rator)
+
+                if kind is Closure:
+                    pop()
+                    new_env = Environment(next(self.environment_ids))
+                    var_list = rator.params
+                    k = rator.index
+                    if len(var_list) > 1:
+                        # rule 11
+                        rand = pop()
+                        if type(rand) is not Tuple or len(var_list) != rand.length:
+                            error("CSE : Invalid number of arguments")
+                        items = rand.items
+                        for i in range(len(var_list)):
+                            new_env.add_var(var_list[i], items[i])
+                    else:
+                        if spine and k in uncurried and len(uncurried[k][0]) <= spine:
+                            # saturated call of a curried lambda (rule 4u): the following
+                            # APPLY instructions are consumed with their arguments
+                            params, k = uncurried[k]
+                            for name in params:
+                                bind_variable(self, new_env, name, pop())
+                            pc += len(params) - 1
+                        else:
+                            bind_variable(self, new_env, var_list[0], pop())
+                    new_env.parent = rator.env
+                    self._enter_frame(frames, max_frames, code, pc, env)
+                    if stats:
+                        stats.track_environment(new_env)
+                    push(EnvironmentMarker(new_env))
+                    code = codes[k]
+                    ops = code.ops
+                    args = code.args
+                    pc = 0
+                    env = self.current_enviroment = new_env
+
+                elif kind is Tuple:
+                    # rule 10
+                    pop()
+                    index = pop()
+                    if type(index) is not int or not 0 < index <= rator.length:
+                        error("CSE : Invalid index")
+                    push(rator.items[index - 1])
+
+                elif kind is Eta:
+                    # rule 13: apply the lambda of the eta to the eta itself, then run this
+                    # APPLY again on the resulting closure
+                    pc -= 1
+                    pop()
+                    new_env = Environment(next(self.environment_ids))
+                    bind_variable(self, new_env, rator.params[0], rator)
+                    new_env.parent = rator.env
+                    self._enter_frame(frames, max_frames, code, pc, env)
+                    if stats:
+                        stats.track_environment(new_env)
+                    push(EnvironmentMarker(new_env))
+                    code = codes[rator.index]
+                    ops = code.ops
+                    args = code.args
+                    pc = 0
+                    env = self.current_enviroment = new_env
+
+                elif kind is YStar:
+                    # rule 12
+                    pop()
+                    lambda_ = pop()
+                    if type(lambda_) is not Closure and type(lambda_) is not RecursiveClosure:
+                        error("CSE : expected lambda")
+                    push(Eta(None, lambda_.env, lambda_.params, lambda_.index))
+
+                elif kind is ConcPartial:
+                    pop()
+                    rand = pop()
+                    if not is_string(rand):
+                        error("CSE : Invalid type for concatenation")
+                    push(apply_binary_operations(self, rator.value, rand, "Conc"))
+
+                else:
+                    error("CSE : Invalid control structure")
+
+            elif op == UNARY:
+                push(apply_unary_operations(self, pop(), arg))
+
+            elif op == BUILD_TUPLE:
+                tup = []
+                for i in range(arg):
+                    tup.append(pop())
+                push(Tuple(tup))
+
+            elif op == CONC:
+                rator = pop()
+                rand = pop()
+                if is_string(rator) and is_string(rand):
+                    push(apply_binary_operations(self, rator, rand, "Conc"))
+                elif is_string(rator) and arg < 2:
+                    push(rand)
+                    push(ConcPartial(rator))
+                else:
+                    error("CSE : Invalid type for concatenation")
+
+        self.current_enviroment = env
+
+    ##############################################################################################################
+    # helper functions
+    ##############################################################################################################
+
+    def _enter_frame(self, frames, max_frames, code, pc, env):
+        """
+        Leave the frame (code, pc, env) for a call: save it to return to, count the environment of
+        the call and enforce the call depth and frame limits.
+
+        A call in tail position, the last instruction of the frame (or followed only by jumps to
+        the end, as at the end of the then arm of a conditional) with the environment marker of
+        the frame below its arguments, replaces the frame instead: the frame has nothing left to
+        do but return the value of the call, so its marker is dropped and it is not saved, as the
+        CSE machine drops the marker of a tail call outside the primitive environment (see
+        CSEMachine._enter). Tail-recursive loops run in bounded space.
+
+        Args:
+            frames (list): The saved frames of the run.
+            max_frames (int): The limit on saved frames.
+            code (Code): The code of the frame.
+            pc (int): The instruction after the call.
+            env (Environment): The environment of the frame.
+        """
+        stack = self.stack
+        ops = code.ops
+        end = pc
+        while end < len(ops) and ops[end] == JUMP:
+            end = code.args[end]
+        if end == len(ops) and type(stack[-1]) is EnvironmentMarker and stack[-1].env is env \
+                and env is not self.primitive_environment:
+            stack.pop()
+            if self.stats:
+                self.stats.tail_calls += 1
+        else:
+            if len(frames) >= max_frames:
+                self._error_handler.handle_error(call_depth_error(self.max_call_depth))
+            frames.append((code, pc, env))
+        self.frames_created += 1
+        if self.frames_created > self.max_frames:
+            self._error_handler.handle_error(frame_limit_error(self.max_frames))
+
+    def _print_cse_table(self):
+        self._linearizer.print_control_structures(self.control_structures)
+        print("Bytecode", end="\n\n")
+        for code in self.codes.values():
+            print(code.disassemble(), end="\n\n")
+
+    def _generate_output(self):
+        return "".join(self._print_queue)+"\n"
+
+    def _generate_raw_output(self):
+        return raw(self._generate_output())
@@ -17,13 +17,24 @@ from screener.screener import Screener
 from parser.parser import Parser
 from standerized_tree.build_standard_tree import StandardTree
 from cse_machine.machine import CSEMachine
+from cse_machine.memo_store import MemoStore
+from cse_machine.vm import VirtualMachine
+from cse_machine.closures import ClosureMachine
+from cse_machine.transpiler import TranspiledMachine
 
-from cse_machine.environment import Environment
 import utils.token_printer as Token_printer
 import utils.tree_list as Tree_list
 import utils.tree_printer as Tree_printer
 import utils.file_handler as File_handler
 
+# Execution engines that can run the standardized tree
+ENGINES = {
+    "cse": CSEMachine,          # the CSE machine, applying the CSE rules
+    "bytecode": VirtualMachine, # the linearized control structures compiled to bytecode
+    "closure": ClosureMachine,  # the standardized tree compiled to nested Python closures
+    "python": TranspiledMachine,# the standardized tree translated to Python source
+}
+
 
 class Evaluator:
     """
@@ -38,14 +49,48 @@ class Evaluator:
         parse_tree (Node): The root node of the parse tree representing the program's Abstract Syntax Tree (AST).
     """
 
-    def __init__(self):
+    def __init__(self, engine="cse", trace=False, collect_stats=False, flat_closures=True, cache_dir=None,
+                 tier_threshold=None, max_call_depth=None, max_frames=None, max_digits=None,
+                 memo_size=None, memo_store=None, parallel=None):
+        """
+        Initialize the Evaluator.
+
+        Args:
+            engine (str): The execution engine, one of the keys of ENGINES.
+            trace (bool): Record the CSE table while executing (needed for print_cse_table).
+            collect_stats (bool): Collect run statistics (needed for print_stats).
+            flat_closures (bool): Let closures capture only their free variables.
+            cache_dir (str): Directory where engines that compile programs cache them, or None.
+            tier_threshold (int): Calls after which the CSE machine runs a lambda body as bytecode, or None.
+            max_call_depth (int): The largest number of live calls, or None for the engine default.
+            max_frames (int): The largest number of environments created by calls, or None for no limit.
+            max_digits (int): The largest number of digits of an integer converted to text, or None for the default.
+            memo_size (int): Results the CSE machine keeps of the calls of pure recursive functions, or None to not memoize.
+            memo_store (str): SQLite file where the CSE machine keeps those results across runs, or None.
+            parallel (int): Worker processes the CSE machine evaluates the components of tuples in, or None.
+        """
         # Initialize scanner, screener, and parser objects
 
         self.scanner = Scanner()  # Initialize the scanner object
         self.screener = Screener()  # Initialize the screener object
         self.parser = Parser()  # Initialize the parser object
         self.standard_tree = StandardTree()  # Initialize the standard tree builder object
-        self.cse_machine = CSEMachine()  # Initialize the CSE machine object
+        engine_options = dict(trace=trace, flat_closures=flat_closures, collect_stats=collect_stats)
+        if tier_threshold is not None:
+            engine_options["tier_threshold"] = tier_threshold
+        if max_call_depth is not None:
+            engine_options["max_call_depth"] = max_call_depth
+        if max_frames is not None:
+            engine_options["max_frames"] = max_frames
+        if max_digits is not None:
+            engine_options["max_digits"] = max_digits
+        if memo_size is not None:
+            engine_options["memo_size"] = memo_size
+        if memo_store is not None:
+            engine_options["memo_store"] = MemoStore(memo_store)
+        if parallel is not None:
+            engine_options["parallel"] = parallel
+        self.cse_machine = ENGINES[engine](**engine_options)  # Initialize the execution engine
 
         self.str_content = None  # Initialize the string content
         self.tokens = list()  # Initialize a list to store tokens
@@ -54,6 +99,7 @@ class Evaluator:
         self.parse_st_tree = None  # Initialize the parse st tree
         self.raw_output = None  # Initialize the raw output
         self.output = None # Initialize the output
+        self.cache_dir = cache_dir  # Initialize the compiled program cache
 
     def interpret(self, file_name):
         """
@@ -62,41 +108,45 @@ class Evaluator:
         Args:
             file_name (str): The name of the file to interpret.
         """
+        front_end = False
         try:
             # Read content from the file
             self.str_content = File_handler.read_file_content(file_name)
 
-            # Tokenize the content
-            self.tokens = self.scanner.token_scan(self.str_content)
+            # engines that cache their compiled programs skip the front end on a cache hit
+            if not (self.cache_dir and getattr(self.cse_machine, "caches_code", False)
+                    and self.cse_machine.execute_cached(self.str_content, self.cache_dir)):
+
+                # Tokenize the content
+                front_end = True
+                self.tokens = self.scanner.token_scan(self.str_content)
 
-            # Filter tokens
-            self.filtered_tokens = self.screener.screener(self.tokens)
+                # Filter tokens
+                self.filtered_tokens = self.screener.screener(self.tokens)
 
-            # Parse the filtered tokens
-            self.parser.parse(self.filtered_tokens)
-            self.parse_ast_tree = self.parser.get_ast_tree()
+                # Parse the filtered tokens
+                self.parser.parse(self.filtered_tokens)
+                self.parse_ast_tree = self.parser.get_ast_tree()
 
-            # convert the ast tree to standard tree
-            self.standard_tree.build_standard_tree(self.parse_ast_tree)
-            self.parse_st_tree = self.standard_tree.get_standard_tree()
+                # convert the ast tree to standard tree
+                self.standard_tree.build_standard_tree(self.parse_ast_tree)
+                self.parse_st_tree = self.standard_tree.get_standard_tree()
 
-            # evaluate the standard tree
-            self.cse_machine.execute(self.parse_st_tree)
+                # evaluate the standard tree
+                self.cse_machine.execute(self.parse_st_tree)
 
             # get the raw output and formatted output
             self.raw_output = self.cse_machine._generate_raw_output()
             self.output = self.cse_machine._generate_output()
 
-            # Reset the environment index
-            Environment().reset_index()
-            
-
         except FileNotFoundError:
             print(f"File '{file_name}' not found.")
         
         except Exception as e:
             print(f"An error occurred in {e}")
-            if self.scanner.status == False:
+            if not front_end:
+                pass  # a cached program failed while it ran
+            elif self.scanner.status == False:
                 print("Scanning failed.")
             elif self.parser.status == False:
                 print("Parsing failed.")
@@ -133,6 +183,15 @@ class Evaluator:
         """
         self.cse_machine._print_cse_table()
 
+    def print_stats(self):
+        """
+        Print the run statistics collected by the CSE machine.
+        """
+        if self.cse_machine.stats:
+            print(self.cse_machine.stats.report(), end="")
+        else:
+            print("Statistics were not collected.")
+
     def print_AST(self):
         """
         Prints the Abstract Syntax Tree (AST) of the program.
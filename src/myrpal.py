@@ -18,6 +18,18 @@
 # -l : Print the source code for the given RPAL program.
 # -n: Default behavior, evaluate the program and print the output.
 
+# Runtime Switches (may be combined with any of the switches above):
+# -stats: Print the run statistics of the CSE machine after the output.
+# -engine <name>: Execute the program with the given engine: cse (default), bytecode, closure or python.
+# -tier <calls>: Run a lambda body of the CSE machine as bytecode once it has been called this many times.
+# -depth <calls>: Stop with an error when more than this many calls are live at once (default 5000000).
+# -frames <n>: Stop with an error when more than this many environments have been created (default: no limit).
+# -digits <n>: Stop with an error when Print or ItoS converts an integer of more than this many digits (default 10000000).
+# -memo <n>: Memoize the calls of recursive functions that cannot Print, keeping the last n results (cse engine only).
+# -memostore <file>: Also keep those results in an SQLite file, where later runs find them (cse engine only).
+# -parallel <n>: Evaluate the components of tuples that call functions and cannot Print in n worker processes (cse engine only).
+#   The python engine caches the compiled program in the cache directory of the user (see user_cache_dir), and -ct prints the generated source.
+
 # Examples:
 # To interpret an RPAL program:
 # python myrpal.py file_name
@@ -33,13 +45,61 @@
 # -ct: python myrpal.py -ct file_name
 # -l: python myrpal.py -l file_name
 # -n: python myrpal.py -n file_name
+# -stats: python myrpal.py -stats file_name
+# -engine: python myrpal.py -engine bytecode file_name
+# -tier: python myrpal.py -tier 50 file_name
+# -depth: python myrpal.py -depth 100000 file_name
+# -frames: python myrpal.py -frames 1000000 file_name
+# -digits: python myrpal.py -digits 100000 file_name
+# -memo: python myrpal.py -memo 100000 file_name
+# -memostore: python myrpal.py -memostore memo.sqlite file_name
+# -parallel: python myrpal.py -parallel 4 file_name
 
 import sys
 import platform
 import subprocess # Import the subprocess module
 import os         # Import os for path manipulation
 
-from interpreter.interpreter import Evaluator
+from interpreter.interpreter import Evaluator, ENGINES
+
+def user_cache_dir():
+    """
+    Return the directory where the python engine caches compiled programs: rpal in the cache
+    directory of the user ($XDG_CACHE_HOME, %LOCALAPPDATA% or ~/.cache). The cached code is run,
+    so it is never read from a directory that comes with the program.
+    """
+    base = os.environ.get("XDG_CACHE_HOME") or os.environ.get("LOCALAPPDATA") \
+        or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "rpal")
+
+
+# Output switches that need the front end to run (these bypass the compiled program cache)
+FRONT_END_SWITCHES = {"-ast", "-st", "-t", "-ft"}
+
+# Switches that change how the program is run rather than what is printed,
+# mapped to whether they take a value
+RUNTIME_SWITCHES = {"-stats": False, "-engine": True, "-tier": True, "-depth": True, "-frames": True, "-digits": True,
+                    "-memo": True, "-memostore": True, "-parallel": True}
+
+def split_runtime_switches(argv):
+    """
+    Separate the runtime switches from the other command line arguments.
+
+    Args:
+        argv (list): Command line arguments passed to the interpreter.
+
+    Returns:
+        tuple: The remaining arguments and a dictionary of the runtime switches given.
+    """
+    remaining = list()
+    options = dict()
+    args = iter(argv)
+    for arg in args:
+        if arg in RUNTIME_SWITCHES:
+            options[arg] = next(args, None) if RUNTIME_SWITCHES[arg] else True
+        else:
+            remaining.append(arg)
+    return remaining, options
 
 def main():
     """
@@ -56,91 +116,144 @@ def main():
 
     """
 
+    # Separate the runtime switches from the output switches
+    argv, options = split_runtime_switches(sys.argv)
+
     # Check if there are enough command-line arguments
-    if len(sys.argv) < 2:
+    if len(argv) < 2:
         print("[Version 1.0 by Chehan & Eshin 4/19/2025]")
-        print("Usage: python main.py [-ast] [-t] [-ft] [-st] [-r] [-rast] [-ct] [-l] [-noout] file_name ")
+        print("Usage: python main.py [-ast] [-t] [-ft] [-st] [-r] [-rast] [-ct] [-l] [-noout] [-stats] [-engine name] [-tier calls] [-depth calls] [-frames n] [-digits n] [-memo n] [-memostore file] [-parallel n] file_name ")
+        return
+
+    engine = options.get("-engine", "cse")
+    if engine not in ENGINES:
+        print(f"Unknown engine '{engine}'. Available engines: {', '.join(ENGINES)}")
         return
 
     # Get the filename from the command-line arguments
-    if len(sys.argv) >= 4:
-        file_name = sys.argv[3]
-    elif len(sys.argv) >= 3:
-        file_name = sys.argv[2]
+    if len(argv) >= 4:
+        file_name = argv[3]
+    elif len(argv) >= 3:
+        file_name = argv[2]
     else:
-        file_name = sys.argv[1]
+        file_name = argv[1]
 
     # Create an instance of the Evaluator class
-    evaluator = Evaluator()
+    # (the CSE table is only recorded when it is going to be printed)
+    tier_threshold = options.get("-tier")
+    if tier_threshold is not None:
+        if engine != "cse" or not tier_threshold.isdigit() or int(tier_threshold) < 1:
+            print("-tier takes a positive number of calls and works with the cse engine only")
+            return
+        tier_threshold = int(tier_threshold)
+
+    memo_size = options.get("-memo")
+    if memo_size is not None:
+        if engine != "cse" or not memo_size.isdigit() or int(memo_size) < 1:
+            print("-memo takes a positive number of results and works with the cse engine only")
+            return
+        memo_size = int(memo_size)
+
+    memo_store = options.get("-memostore")
+    if memo_store is not None and (engine != "cse" or not memo_store):
+        print("-memostore takes a file name and works with the cse engine only")
+        return
+
+    parallel = options.get("-parallel")
+    if parallel is not None:
+        if engine != "cse" or not parallel.isdigit() or int(parallel) < 1:
+            print("-parallel takes a positive number of worker processes and works with the cse engine only")
+            return
+        parallel = int(parallel)
+
+    limits = dict()
+    for switch, option in (("-depth", "max_call_depth"), ("-frames", "max_frames"), ("-digits", "max_digits")):
+        value = options.get(switch)
+        if value is not None:
+            if not value.isdigit() or int(value) < 1:
+                print(f"{switch} takes a positive number")
+                return
+            limits[option] = int(value)
+
+    cache_dir = None
+    if not FRONT_END_SWITCHES.intersection(argv):
+        cache_dir = user_cache_dir()
+    evaluator = Evaluator(engine=engine, trace="-ct" in argv, collect_stats="-stats" in options,
+                          cache_dir=cache_dir, tier_threshold=tier_threshold, memo_size=memo_size,
+                          memo_store=memo_store, parallel=parallel, **limits)
 
     # Interpret the file
     evaluator.interpret(file_name)
 
     # Check if the -ast switch is provided
-    if len(sys.argv) >= 4:
-        if sys.argv[1] == "-ast" and sys.argv[2] == "-st":
+    if len(argv) >= 4:
+        if argv[1] == "-ast" and argv[2] == "-st":
             handle_ast_option(evaluator)
             handle_st_option(evaluator)
             handle_default_behavior(evaluator)
-        elif sys.argv[1] == "-st" and sys.argv[2] == "-ast":
+        elif argv[1] == "-st" and argv[2] == "-ast":
             handle_ast_option(evaluator)
             handle_st_option(evaluator)
             handle_default_behavior(evaluator)
-    elif len(sys.argv) >= 3:
-        if sys.argv[1] == "-ast":
+    elif len(argv) >= 3:
+        if argv[1] == "-ast":
             # Print the Abstract Syntax Tree
             handle_ast_option(evaluator)
             handle_default_behavior(evaluator)
-        elif sys.argv[1] == "-t":
+        elif argv[1] == "-t":
             # Print the tokens
             handle_tokens_option(evaluator)
             handle_default_behavior(evaluator)
-        elif sys.argv[1] == "-ft":
+        elif argv[1] == "-ft":
             # Print the filtered tokens
             handle_filtered_tokens_option(evaluator)
             handle_default_behavior(evaluator)
-        elif sys.argv[1] == "-st":
+        elif argv[1] == "-st":
             # Print the standard tree
             handle_st_option(evaluator)
             handle_default_behavior(evaluator)
 
-        elif sys.argv[1] == "-r":
+        elif argv[1] == "-r":
             # Print the original RPAL evaluation
             try:
                 handle_original_rpal_eval(file_name)
             except:
                 print("Error in original RPAL evaluation\n(file should be in rpal_source folder)")
-        elif sys.argv[1] == "-rast":
+        elif argv[1] == "-rast":
             # Print the original RPAL evaluation and AST
             try:
                 handle_original_rpal_ast(file_name)
             except:
                 print(
                     "Error in original RPAL evaluation\n(file should be in rpal_source file)")
-        elif sys.argv[1] == "-rst":
+        elif argv[1] == "-rst":
             # Print the original RPAL evaluation and ST
             try:
                 handle_original_rpal_st(file_name)
             except:
                 print("Error in original RPAL evaluation\n(file should be in rpal_source file)")
-        elif sys.argv[1] == "-ct":
+        elif argv[1] == "-ct":
             # Print the CSE table
             try:
                 handle_cse_table_option(evaluator)
                 handle_default_behavior(evaluator)
             except:
                 print("Error in printing CSE table")
-        elif sys.argv[1] == "-l":
+        elif argv[1] == "-l":
             # Print the lexical analysis
             handle_get_source_code(evaluator)
             handle_default_behavior(evaluator)
-        elif sys.argv[1] == "-n":
+        elif argv[1] == "-n":
             handle_default_behavior(evaluator)
 
     else:
         # Default behavior: Evaluate the program
         handle_default_behavior(evaluator)
 
+    # Print the run statistics if requested
+    if "-stats" in options:
+        handle_stats_option(evaluator)
+
 ################################################################################################
 # switch handlers for different options for different switches in the command line arguments 
 ################################################################################################
@@ -190,6 +303,20 @@ def handle_default_behavior(evaluator):
     evaluator.print_output()
 
 
+def handle_stats_option(evaluator):
+    """
+    Prints the run statistics for the given file.
+
+    Args:
+        evaluator (Evaluator): An instance of the Evaluator class.
+
+    Returns:
+        None
+
+    """
+    evaluator.print_stats()
+
+
 def handle_tokens_option(evaluator):
     """
     Prints the tokens for the given file.
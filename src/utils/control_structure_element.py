@@ -1,10 +1,72 @@
+# Integer tags of the control structure elements, one for each kind of element the CSE machine
+# handles differently. The machine dispatches on them (see CSEMachine.execute); the linearizer
+# sets them (see element_tag in cse_machine/stlinearizer.py).
+TAG_INVALID = 0             # no rule applies (delta)
+TAG_LEAF = 1                # rule 1: ID, INT, STR, bool, nil, dummy, Y*
+TAG_LAMBDA = 2              # rule 2
+TAG_ENV_MARKER = 3          # rule 5
+TAG_BINOP = 4               # rule 6
+TAG_UNOP = 5                # rule 7
+TAG_BETA = 6                # rule 8
+TAG_TAU = 7                 # rule 9
+TAG_GAMMA = 8               # rules 4, 9s, 10, 11, 12, 13 and Conc, by the value applied
+TAG_REC_LAMBDA = 9          # rule 12r
+TAG_FUSED_BINOP = 10        # rule 6f
+TAG_FUSED_INBUILT = 11      # rule 7f
+TAG_FUSED_BETA = 12         # rule 8f
+TAG_SPECIALIZED_BINOP = 13  # rule 6t
+TAG_SPECIALIZED_UNOP = 14   # rule 7t
+TAG_MEMO = 15               # rule 5m
+TAG_PAR_TAU = 16            # rule 9p
+
+TAG_COUNT = 17
+
+
 class ControlStructureElement:
     """A class representing an element of a control structure in a syntax tree.
     """
-    def __init__(self, type, value, bounded_variable=None,control_structure=None, env=None , operator=None):
+    __slots__ = ("type", "value", "bounded_variable", "control_structure", "env", "operator", "free_variables",
+                 "spine", "arity", "operands", "site", "tag")
+
+    def __init__(self, type, value, bounded_variable=None,control_structure=None, env=None , operator=None, free_variables=None, spine=None, arity=None, operands=None, site=None, tag=TAG_INVALID):
         self.type = type
         self.value = value
         self.bounded_variable = bounded_variable
         self.control_structure = control_structure
         self.env = env
-        self.operator = operator
\ No newline at end of file
+        self.operator = operator
+        self.free_variables = free_variables
+        self.spine = spine
+        self.arity = arity
+        self.operands = operands
+        self.site = site
+        self.tag = tag
+
+
+class EnvironmentMarker:
+    """An environment marker, pushed onto both the control and the stack of the CSE machine when a
+    lambda body is entered. It reads like a control structure element of type "env_marker".
+    """
+    __slots__ = ("env",)
+
+    type = "env_marker"
+    value = "env_marker"
+    tag = TAG_ENV_MARKER
+
+    def __init__(self, env):
+        self.env = env
+
+
+class MemoMarker:
+    """A memo marker, pushed onto the control of the CSE machine below the environment marker of a
+    memoized call: once the call returns, the value on top of the stack is its result, which is
+    kept in the memo table under key (see cse_machine/memo.py).
+    """
+    __slots__ = ("key",)
+
+    type = "memo"
+    value = "memo"
+    tag = TAG_MEMO
+
+    def __init__(self, key):
+        self.key = key
@@ -0,0 +1,35 @@
+"""
+Description
+Shared fixtures of the tests: the interpreter sources are in src, and rpal runs a program on an
+engine and returns what it printed.
+"""
+
+import io
+import os
+import sys
+from contextlib import redirect_stdout
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from interpreter.interpreter import Evaluator
+
+
+@pytest.fixture
+def rpal(tmp_path):
+    """
+    Return a function running an RPAL program on an engine, with the options of Evaluator, and
+    returning the output, error messages included.
+    """
+    def run(source, engine="cse", **options):
+        file_name = tmp_path / "program.rpal"
+        file_name.write_text(source)
+        output = io.StringIO()
+        evaluator = Evaluator(engine=engine, **options)
+        with redirect_stdout(output):
+            evaluator.interpret(str(file_name))
+            if evaluator.get_output() is not None:
+                evaluator.print_output()
+        return output.getvalue()
+    return run
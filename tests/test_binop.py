@@ -0,0 +1,20 @@
+"""
+Description
+Tests of the binary operators (see cse_machine/binop.py) on every engine.
+"""
+
+import pytest
+
+from interpreter.interpreter import ENGINES
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("source", ["Print (2 ** (-1))", "let f x = x ** (-2) in Print (f 3)",
+                                    "let x = 0 in let y = -1 in Print (x ** y)"])
+def test_negative_exponent(rpal, engine, source):
+    assert rpal(source, engine=engine) == "An error occurred in CSE : Negative exponent\n"
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_power(rpal, engine):
+    assert rpal("let f x = x ** 3 in Print (2 ** 10, 0 ** 0, f (-2))", engine=engine) == "(1024, 1, -8)\n"
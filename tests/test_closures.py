@@ -0,0 +1,45 @@
+"""
+Description
+Tests of the closure-compiling engine (see cse_machine/closures.py): it must print what the CSE
+machine prints, and reach the call depths it reaches.
+"""
+
+import pytest
+
+# Inbuilt functions used as values or partially applied
+BUILTINS = [
+    "let c = Conc 'ab' in Print (c 'cd', c 'ef')",
+    "let f g = g 1 in Print (f Print)",
+    "let f x = 1 in Print (f dummy)",
+    "Print (1, Conc 'a')",
+    "Print ((Conc 'ab') 'cd', Conc 'a' 'b')",
+    "Print 1 2",
+]
+
+DEEP = "let rec f n = n eq 0 -> 0 | 1 + f (n - 1) in Print (f {})"
+
+
+@pytest.mark.parametrize("source", BUILTINS)
+def test_builtins(rpal, source):
+    assert rpal(source, engine="closure") == rpal(source)
+
+
+def test_inbuilt_value_fails(rpal):
+    assert rpal("Print (Isstring)", engine="closure") == "An error occurred in CSE : Invalid control structure\n"
+
+
+def test_deep_recursion(rpal):
+    assert rpal(DEEP.format(200000), engine="closure") == "200000\n"
+
+
+def test_max_call_depth(rpal):
+    # the let rec, then f 1000 ... f 0
+    source = DEEP.format(1000)
+    assert rpal(source, engine="closure", max_call_depth=1002) == rpal(source, max_call_depth=1002) == "1000\n"
+    assert rpal(source, engine="closure", max_call_depth=1001) == rpal(source, max_call_depth=1001)
+
+
+def test_tuple_components_bound(rpal):
+    # the CSE machine binds the components of a tuple whatever they are
+    source = "let f (a, b) = a in Print (f (1, dummy))"
+    assert rpal(source, engine="closure") == rpal(source) == "1\n"
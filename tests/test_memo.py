@@ -0,0 +1,59 @@
+"""
+Description
+Tests of the memoization of calls of pure recursive functions (see cse_machine/memo.py): a
+memoized run must print what a plain run prints, whatever the size of the memo table.
+"""
+
+import io
+from contextlib import redirect_stdout
+
+import pytest
+
+from interpreter.interpreter import Evaluator
+
+PROGRAMS = [
+    ("let Add3 a b c = a + b + c\nin let rec Loop n acc = n eq 0 -> acc | Loop (n - 1) (Add3 acc n 1)\n"
+     "in Print (Loop 150 0)", "11475\n"),
+    ("let rec Fib n = n ls 2 -> n | Fib (n - 1) + Fib (n - 2) in Print (Fib 20)", "6765\n"),
+    ("let rec C (n, k) = k eq 0 or k eq n -> 1 | C (n - 1, k - 1) + C (n - 1, k) in Print (C (16, 8))",
+     "12870\n"),
+    # mutual recursion through a tuple of functions, the way RPAL writes it without rec ... and
+    ("let rec EO = (fn n. n eq 0 -> true | (EO 2) (n - 1)), (fn n. n eq 0 -> false | (EO 1) (n - 1))\n"
+     "in Print ((EO 1) 100, (EO 2) 7, (EO 1) 7)", "(true, true, false)\n"),
+]
+
+
+@pytest.mark.parametrize("memo_size", [1, 2, 100000])
+@pytest.mark.parametrize("source, expected", PROGRAMS)
+def test_memo_sizes(rpal, source, expected, memo_size):
+    assert rpal(source) == expected
+    assert rpal(source, memo_size=memo_size) == expected
+
+
+def test_calls_answered_from_the_table(tmp_path):
+    source, expected = PROGRAMS[1]
+    file_name = tmp_path / "fib.rpal"
+    file_name.write_text(source)
+    evaluator = Evaluator(memo_size=100)
+    with redirect_stdout(io.StringIO()):
+        evaluator.interpret(str(file_name))
+    memo = evaluator.cse_machine.memo
+    # Fib 20 makes 21 distinct calls, each run once; the calls made again are answered from the table
+    assert (memo.misses, memo.hits) == (21, 18)
+
+
+def peak_control_depth(file_name, source, **options):
+    file_name.write_text(source)
+    evaluator = Evaluator(collect_stats=True, **options)
+    with redirect_stdout(io.StringIO()):
+        evaluator.interpret(str(file_name))
+    return evaluator.cse_machine.stats.peak_control_depth
+
+
+def test_tail_calls_not_memoized(rpal, tmp_path):
+    # a memo marker for every call of the loop would pile up on the control
+    loop = "let rec Loop (i, acc) = i eq 0 -> acc | Loop (i - 1, acc + 1) in Print (Loop ({}, 0))"
+    assert rpal(loop.format(10000), memo_size=10) == "10000\n"
+    file_name = tmp_path / "loop.rpal"
+    assert (peak_control_depth(file_name, loop.format(10000), memo_size=10)
+            == peak_control_depth(file_name, loop.format(10), memo_size=10))
@@ -0,0 +1,74 @@
+"""
+Description
+Tests of the memo store (see cse_machine/memo_store.py): the results kept by one run are found by
+later runs, and only by the calls they are the results of. A file that cannot be used is left out
+with a warning.
+"""
+
+import io
+from contextlib import redirect_stdout
+
+import pytest
+
+from cse_machine.memo_store import decode_value, encode_value
+from cse_machine.runtime import ROPE_THRESHOLD, Closure, Rope, Tuple, concat
+from interpreter.interpreter import Evaluator
+
+FIB = "let rec Fib n = n ls 2 -> n | Fib (n - 1) + Fib (n - 2) in Print (Fib 20)"
+
+# The same body with the parameters bound in the other order: f (5, 3) is 2 in one, -2 in the other
+FIRST = "let rec f (a, b) = a gr 100 -> f (a - 1, b) | a - b in Print (f (5, 3))"
+SECOND = "let rec f (b, a) = a gr 100 -> f (a - 1, b) | a - b in Print (f (5, 3))"
+
+
+def run(source, tmp_path, store):
+    file_name = tmp_path / "program.rpal"
+    file_name.write_text(source)
+    evaluator = Evaluator(memo_store=store)
+    with redirect_stdout(io.StringIO()):
+        evaluator.interpret(str(file_name))
+    return evaluator.get_output(), evaluator.cse_machine.memo_store
+
+
+def test_programs_sharing_a_store(rpal, tmp_path):
+    store = str(tmp_path / "memo.sqlite")
+    assert rpal(FIRST, memo_store=store) == "2\n"
+    assert rpal(SECOND, memo_store=store) == "-2\n"
+    assert rpal(FIRST, memo_store=store) == "2\n"
+
+
+@pytest.mark.parametrize("value", [0, -12, 10 ** 400, "", "text", True, False, None,
+                                   Tuple([1, "a", Tuple([None, False]), Tuple([])])])
+def test_round_trip(value):
+    assert decode_value(encode_value(value)) == value
+
+
+def test_round_trip_rope():
+    rope = concat("a" * ROPE_THRESHOLD, "b" * ROPE_THRESHOLD)
+    assert type(rope) is Rope
+    assert decode_value(encode_value(rope)) == "a" * ROPE_THRESHOLD + "b" * ROPE_THRESHOLD
+
+
+def test_functions_not_kept():
+    assert encode_value(Tuple([1, Closure(None, None, ["x"], 1)])) is None
+
+
+def test_reuse_across_runs(tmp_path):
+    store = str(tmp_path / "memo.sqlite")
+    output, first = run(FIB, tmp_path, store)
+    assert output == "6765\n"
+    assert first.writes > 0 and first.reads == 0
+    output, second = run(FIB, tmp_path, store)
+    assert output == "6765\n"
+    assert second.reads == 1 and second.writes == 0
+
+
+@pytest.mark.parametrize("name", ["not_a_database.sqlite", "missing/memo.sqlite"])
+def test_bad_path(tmp_path, capsys, name):
+    path = tmp_path / name
+    if name == "not_a_database.sqlite":
+        path.write_text("not a database " * 100)
+    output, store = run(FIB, tmp_path, str(path))
+    assert output == "6765\n"
+    assert store.failed
+    assert capsys.readouterr().err.count("Warning: memo store") == 1
@@ -0,0 +1,63 @@
+"""
+Description
+Tests of the parallel evaluation of the components of tuples (see cse_machine/parallel.py): a
+parallel run must print what a serial run prints, and report the work of the workers.
+"""
+
+import io
+import multiprocessing
+import pickle
+from contextlib import redirect_stdout
+
+import pytest
+
+from interpreter.interpreter import Evaluator
+
+FIB_TUPLE = "let rec Fib n = n ls 2 -> n | Fib (n - 1) + Fib (n - 2) in Print (Fib 16, Fib 17)"
+
+
+def run(file_name, **options):
+    evaluator = Evaluator(collect_stats=True, **options)
+    with redirect_stdout(io.StringIO()):
+        evaluator.interpret(str(file_name))
+    return evaluator.cse_machine, evaluator.get_output()
+
+
+def test_worker_statistics(tmp_path):
+    file_name = tmp_path / "program.rpal"
+    file_name.write_text(FIB_TUPLE)
+    serial, output = run(file_name)
+    parallel, parallel_output = run(file_name, parallel=2)
+    assert parallel_output == output
+    assert parallel.parallel_tuples.tuples == 1
+    assert parallel.stats.environments_created == serial.stats.environments_created
+    # each worker also pops the environment marker its machine starts with (rule 5)
+    assert parallel.stats.steps() == serial.stats.steps() + 2
+
+
+class UnpicklablePool:
+    def __init__(self, *args):
+        pass
+
+    def apply_async(self, *args, **options):
+        raise pickle.PicklingError("cannot pickle")
+
+    def terminate(self):
+        pass
+
+
+@pytest.mark.parametrize("error", [pickle.PicklingError, TypeError, AttributeError])
+def test_pool_cannot_start(rpal, monkeypatch, error):
+    def pool(*args):
+        raise error("cannot pickle")
+    monkeypatch.setattr(multiprocessing, "Pool", pool)
+    assert rpal(FIB_TUPLE, parallel=2) == rpal(FIB_TUPLE)
+
+
+def test_component_cannot_be_sent(tmp_path, monkeypatch):
+    monkeypatch.setattr(multiprocessing, "Pool", UnpicklablePool)
+    file_name = tmp_path / "program.rpal"
+    file_name.write_text(FIB_TUPLE)
+    machine, output = run(file_name, parallel=2)
+    assert output == run(file_name)[1]
+    assert (machine.parallel_tuples.tuples, machine.parallel_tuples.fallbacks) == (0, 1)
@@ -0,0 +1,92 @@
+"""
+Description
+Tests of compiled programs (see cse_machine/program.py): a program is only read by the machines
+that run it, so it gives the same output every time it runs, from any thread.
+"""
+
+import threading
+from functools import partial
+
+import pytest
+
+from cse_machine.machine import CSEMachine
+from cse_machine.program import Program
+from cse_machine.stlinearizer import Linearizer
+from cse_machine.vm import VirtualMachine
+from lexical_analyzer.scanner import Scanner
+from parser.parser import Parser
+from screener.screener import Screener
+from standerized_tree.build_standard_tree import StandardTree
+
+SOURCE = """
+let rec Fib n = n ls 2 -> n | Fib (n - 1) + Fib (n - 2)
+in let rec Squares n = n eq 0 -> nil | Squares (n - 1) aug (n * n)
+in let Show f = Print (f 10, Conc 'fib' (ItoS (Fib 15)))
+in Show Squares
+"""
+
+EXPECTED = "((0, 1, 4, 9, 16, 25, 36, 49, 64, 81, 100), fib610)\n"
+
+# The machines, with the inline caches of the variable lookups on the CSE machine
+MACHINES = [CSEMachine, partial(CSEMachine, flat_closures=False), VirtualMachine]
+
+
+def standard_tree(source):
+    parser = Parser()
+    parser.parse(Screener().screener(Scanner().token_scan(source)))
+    standard_tree = StandardTree()
+    standard_tree.build_standard_tree(parser.get_ast_tree())
+    return standard_tree.get_standard_tree()
+
+
+def run(machine_class, program):
+    machine = machine_class()
+    machine.execute_program(program)
+    return machine._generate_output()
+
+
+@pytest.mark.parametrize("machine_class", MACHINES)
+def test_run_again(machine_class):
+    program = machine_class().compile(standard_tree(SOURCE))
+    assert [run(machine_class, program) for _ in range(3)] == [EXPECTED] * 3
+
+
+@pytest.mark.parametrize("machine_class", MACHINES)
+def test_run_in_threads(machine_class):
+    program = machine_class().compile(standard_tree(SOURCE))
+    outputs = [None] * 8
+
+    def worker(i):
+        for _ in range(5):
+            output = run(machine_class, program)
+            if outputs[i] not in (None, output):
+                output = "different outputs"
+            outputs[i] = output
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(outputs))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert outputs == [EXPECTED] * len(outputs)
+
+
+def test_structures_copied():
+    linearizer = Linearizer()
+    control_structures = linearizer.linearize(standard_tree(SOURCE))
+    elements = [list(structure.elements) for structure in control_structures]
+    program = Program(control_structures, linearizer.uncurried, linearizer.sites)
+    assert [structure.elements for structure in control_structures] == elements
+    assert [list(structure.elements) for structure in program.control_structures] == elements
+    assert all(type(structure.elements) is tuple for structure in program.control_structures)
+
+
+def test_layouts_kept_by_the_machine():
+    program = CSEMachine().compile(standard_tree(SOURCE))
+    machines = [CSEMachine(flat_closures=False) for _ in range(2)]
+    for machine in machines:
+        machine.execute_program(program)
+    layouts = [machine.layouts for machine in machines]
+    assert layouts[0] and layouts[0] == layouts[1] and layouts[0] is not layouts[1]
+    machines[0].execute_program(program)
+    assert machines[0].layouts == layouts[1]
@@ -0,0 +1,140 @@
+"""
+Description
+Tests of the native values (see cse_machine/runtime.py): tuples, and the ropes that long strings
+are made of, and the text of big integers.
+"""
+
+import sys
+from array import array
+
+import pytest
+
+from cse_machine.environment import Environment
+from cse_machine.runtime import ROPE_THRESHOLD, Rope, Tuple, concat, equal_values, int_to_str, stem, stern
+from cse_machine.stack import STACK
+from interpreter.interpreter import ENGINES
+from utils.control_structure_element import EnvironmentMarker
+
+
+def test_equal_tuples(rpal):
+    source = "Print ((1, 2) eq (1, 2), (1, 2) eq (1, 3), (1, 'a') ne (1, 'b'), (1, 2) eq (1, 2, 3))"
+    assert rpal(source) == "(true, false, true, false)\n"
+
+
+@pytest.mark.parametrize("source, operator", [("Print (1 eq true)", "eq"), ("Print ((1, 2) eq (true, 2))", "eq"),
+                                              ("Print ((1, (2, 3)) ne (1, (2, true)))", "ne")])
+def test_components_of_different_types(rpal, source, operator):
+    # a tuple is compared component by component, with the check eq makes on other values
+    expected = f"An error occurred in Illegal Operands for '{operator}'\n"
+    assert rpal(source) == rpal(source, engine="python") == expected
+
+
+def test_array_and_list_components():
+    numbers = Tuple(array("q", [1, 2, 3]))
+    assert equal_values(numbers, Tuple([1, 2, 3], 3)) is True
+    assert equal_values(numbers, Tuple([1, 2, 4], 3)) is False
+    assert equal_values(numbers, Tuple([True, 2, 3], 3)) is None
+    assert numbers == Tuple([1, 2, 3], 3)
+    assert numbers != Tuple([True, 2, 3], 3)
+
+
+def test_stack_of_native_values():
+    stack = STACK()
+    env = Environment(1)
+    for item in (1, "a", True, None, Tuple([1, 2]), EnvironmentMarker(env), 2):
+        stack.push(item)
+    assert stack.current_environment() is env
+    assert stack.pop() == 2
+    assert stack.pop().env is env
+    assert stack.current_environment() is None
+    assert stack.pop() == Tuple([1, 2])
+
+
+def test_short_concatenation_is_a_string():
+    assert concat("ab", "cd") == "abcd"
+    assert type(concat("ab", "cd")) is str
+
+
+def test_long_concatenation_is_a_rope():
+    left, right = "a" * ROPE_THRESHOLD, "b" * ROPE_THRESHOLD
+    rope = concat(left, right)
+    assert type(rope) is Rope and len(rope) == 2 * ROPE_THRESHOLD
+    assert rope.text is None
+    assert str(rope) == left + right
+    # joined once, the rope is a view of the text
+    assert rope.text == left + right and rope.left is None
+    assert concat(rope, "") is rope and concat("", rope) is rope
+
+
+def test_deep_rope_flattened():
+    # a loop of Concs builds a rope as deep as it is long
+    rope = "x" * ROPE_THRESHOLD
+    for _ in range(100000):
+        rope = concat(rope, "y")
+    assert str(rope) == "x" * ROPE_THRESHOLD + "y" * 100000
+
+
+def test_stem_and_stern_of_a_rope():
+    rope = concat("ab" * ROPE_THRESHOLD, "cd" * ROPE_THRESHOLD)
+    rest = stern(rope)
+    assert type(rest) is Rope and str(rest) == "b" + "ab" * (ROPE_THRESHOLD - 1) + "cd" * ROPE_THRESHOLD
+    assert stem(rope) == "a" and stem(rest) == "b"
+    short = rope
+    while len(short) > ROPE_THRESHOLD:
+        short = stern(short)
+    assert type(stern(short)) is str and stern(short) == ("cd" * (ROPE_THRESHOLD // 2))[1:]
+
+
+def test_rope_equals_string():
+    text = "ab" * ROPE_THRESHOLD
+    rope = concat("ab" * (ROPE_THRESHOLD // 2), "ab" * (ROPE_THRESHOLD // 2))
+    assert rope == text and text == rope and rope == concat(text[:1], text[1:])
+    assert rope != text[:-1] + "c" and rope != text[:-1]
+    assert hash(rope) == hash(text)
+    assert equal_values(rope, text) is True and equal_values(text, rope) is True
+
+
+ROPES = """
+let rec Rep n s = n eq 0 -> '' | Conc s (Rep (n - 1) s) in
+let rec Len s = s eq '' -> 0 | 1 + Len (Stern s) in
+let S = Rep 200 'ab' in
+Print (Len S, Stem S, Stem (Stern S), S eq Conc (Rep 100 'ab') (Rep 100 'ab'), S eq 'ab',
+       Stern (Stern (Rep 40 'ab')) eq Rep 39 'ab', Conc (Rep 40 'x') 'y' ne Conc 'x' (Rep 40 'x'),
+       Isstring S, Stern (Conc (Rep 40 'x') 'y'))
+"""
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_ropes(rpal, engine):
+    assert rpal(ROPES, engine=engine) == f"(400, a, b, true, false, true, true, true, {'x' * 39}y)\n"
+
+
+BIG_INTEGERS = """
+let rec Fact n = n eq 0 -> 1 | n * Fact (n - 1) in
+Print (2 ** 1000, Fact 200, -(3 ** 500), ItoS (2 ** 12000))
+"""
+
+
+def factorial(n):
+    result = 1
+    for i in range(2, n + 1):
+        result *= i
+    return result
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_big_integers(rpal, engine):
+    # 302, 375 and 239 digits, and 3613 digits, past the bits converted with str
+    expected = f"({2 ** 1000}, {factorial(200)}, {-(3 ** 500)}, {2 ** 12000})\n"
+    assert rpal(BIG_INTEGERS, engine=engine) == expected
+
+
+def test_integer_past_the_python_digit_limit():
+    value = -(7 ** 20000)
+    text = int_to_str(value)
+    limit = sys.get_int_max_str_digits()
+    sys.set_int_max_str_digits(0)
+    try:
+        assert text == str(value) and len(text) == 16903
+    finally:
+        sys.set_int_max_str_digits(limit)
@@ -0,0 +1,66 @@
+"""
+Description
+Tests of the python engine (see cse_machine/transpiler.py): it must print what the CSE machine
+prints, and reach the call depths it reaches.
+"""
+
+import pytest
+
+import myrpal
+from test_closures import BUILTINS, DEEP
+
+
+@pytest.mark.parametrize("source", BUILTINS)
+def test_builtins(rpal, source):
+    assert rpal(source, engine="python") == rpal(source)
+
+
+def test_inbuilt_value_fails(rpal):
+    assert rpal("Print (Isstring)", engine="python") == "An error occurred in CSE : Invalid control structure\n"
+
+
+def test_let_binds_like_cse(rpal):
+    for source in ("let x = dummy in Print 1", "let f (a, b) = a in Print (f (1, dummy))"):
+        assert rpal(source, engine="python") == rpal(source)
+
+
+# A curried recursive function, called with all its arguments at once (see call_spine)
+DEEP_CURRIED = "let rec f n m = n eq 0 -> m | 1 + f (n - 1) m in Print (f {} 0)"
+
+
+@pytest.mark.parametrize("deep", [DEEP, DEEP_CURRIED])
+def test_deep_recursion(rpal, deep):
+    assert rpal(deep.format(200000), engine="python") == "200000\n"
+
+
+def test_deep_recursion_limit(rpal):
+    expected = "An error occurred in CSE : Call depth limit exceeded (more than 50000 nested calls)\n"
+    assert rpal(DEEP_CURRIED.format(200000), engine="python", max_call_depth=50000) == expected
+
+
+def test_max_call_depth(rpal):
+    # the let rec, then f 1000 ... f 0
+    source = DEEP.format(1000)
+    assert rpal(source, engine="python", max_call_depth=1002) == rpal(source, max_call_depth=1002) == "1000\n"
+    assert rpal(source, engine="python", max_call_depth=1001) == rpal(source, max_call_depth=1001)
+
+
+def test_cache_outside_the_program_directory(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    assert myrpal.user_cache_dir() == str(tmp_path / "cache" / "rpal")
+
+
+def test_cached_program(rpal, tmp_path):
+    source = DEEP.format(10)
+    cache_dir = str(tmp_path / "cache")
+    assert rpal(source, engine="python", cache_dir=cache_dir) == "10\n"
+    assert rpal(source, engine="python", cache_dir=cache_dir) == "10\n"
+
+
+def test_cached_program_error(rpal, tmp_path):
+    # the front end does not run on a cache hit, so it is not reported as failed
+    source = "Print (1 / 0)"
+    cache_dir = str(tmp_path / "cache")
+    expected = rpal(source, engine="python")
+    assert rpal(source, engine="python", cache_dir=cache_dir) == expected
+    assert rpal(source, engine="python", cache_dir=cache_dir) == expected
@@ -0,0 +1,67 @@
+"""
+Description
+Tests of the bytecode virtual machine (see cse_machine/vm.py): it must print what the CSE
+machine prints, errors included.
+"""
+
+import pytest
+
+# Inbuilt functions used as values: the CSE machine fails with a CSE error, not a Python one
+BUILTINS_AS_VALUES = [
+    "let c = Conc 'ab' in Print (c 'cd', c 'ef')",
+    "let f x = x in Print (f, Print, 1)",
+    "let f g = g 1 in Print (f Print)",
+    "let f g = g 'a' 'b' in Print (f Conc)",
+    "Print (Conc, 1)",
+    "Print (Print, Print)",
+    "Print (1, Conc 'a')",
+]
+
+
+@pytest.mark.parametrize("source", BUILTINS_AS_VALUES)
+def test_builtins_as_values(rpal, source):
+    expected = rpal(source)
+    assert rpal(source, engine="bytecode") == expected
+    assert "pop from empty list" not in expected
+
+
+TAIL_LOOP = "let rec loop i acc = i eq 0 -> acc | loop (i - 1) (acc + 1) in Print (loop 100000 0)"
+
+
+@pytest.mark.parametrize("options", [dict(engine="bytecode"), dict(tier_threshold=10)])
+def test_tail_calls(rpal, options):
+    # a tail call replaces the frame of the caller, so the loop never has more than a few live calls
+    assert rpal(TAIL_LOOP, max_call_depth=10, **options) == rpal(TAIL_LOOP, max_call_depth=10) == "100000\n"
+
+
+# Tail calls at the end of a then arm, which jumps over the else arm to the end of the body
+THEN_ARM_LOOPS = [
+    "let rec loop n = n gr 0 -> loop (n - 1) | 0 in Print (loop 100000)",
+    "let rec loop n = n gr 0 -> (n gr 5 -> loop (n - 2) | loop (n - 1)) | 0 in Print (loop 100000)",
+]
+
+
+@pytest.mark.parametrize("source", THEN_ARM_LOOPS)
+@pytest.mark.parametrize("options", [dict(engine="bytecode"), dict(tier_threshold=10)])
+def test_tail_calls_in_then_arm(rpal, source, options):
+    assert rpal(source, max_call_depth=10, **options) == rpal(source, max_call_depth=10) == "0\n"
+
+
+@pytest.mark.parametrize("options", [dict(engine="bytecode"), dict(tier_threshold=10)])
+def test_calls_not_in_tail_position(rpal, options):
+    source = "let rec f n = n eq 0 -> 0 | 1 + f (n - 1) in Print (f 1000)"
+    assert rpal(source, max_call_depth=100, **options) == rpal(source, max_call_depth=100)
+    assert "Call depth limit exceeded" in rpal(source, max_call_depth=100, **options)
+
+
+# A hot body entered in tail position from the CSE machine, with more of the program to run after it
+TIER_TAIL_CALLS = ("let rec loop i acc = i eq 0 -> acc | loop (i - 1) (acc + 1) in\n"
+                   "let rec count n = n eq 0 -> 'done' | (n eq -1 -> 'never' | count (n - 1)) in\n"
+                   "let f x = loop x 0 in Print (loop 1000 0, count 500, f 20, f 30)")
+
+
+@pytest.mark.parametrize("tier_threshold", [1, 2, 5, 100])
+def test_tier_up_in_tail_position(rpal, tier_threshold):
+    expected = "(1000, done, 20, 30)\n"
+    assert rpal(TIER_TAIL_CALLS, max_call_depth=2) == expected
+    assert rpal(TIER_TAIL_CALLS, tier_threshold=tier_threshold, max_call_depth=2) == expected